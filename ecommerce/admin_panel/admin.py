@@ -6,7 +6,9 @@ from .models import (
     Address,
     EmailTemplate,
     NewsLetter,
+    UserEventDailyCounter,
     UserEventTracking,
+    CounterDelta,
 )
 from django.contrib.auth.models import Permission
 
@@ -124,3 +126,30 @@ class UserEventTrackingAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "event_type", "ip_address", "session_id")
     list_filter = ("event_type", "device_type", "event_time", "user")
     ordering = ("-event_time",)  # Order by event_time descending
+
+
+@admin.register(UserEventDailyCounter)
+class UserEventDailyCounterAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "date",
+        "event_type",
+        "device_type",
+        "object_info",
+        "count",
+    )
+    search_fields = ("event_type", "object_info")
+    list_filter = ("event_type", "device_type", "date")
+    ordering = ("-date",)
+
+
+@admin.register(CounterDelta)
+class CounterDeltaAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "model_label",
+        "field_name",
+        "object_id",
+        "amount",
+        "created_at",
+    )
@@ -0,0 +1,105 @@
+"""
+Write-behind counters.
+
+Hot counters (coupon usage, product views) are not updated in place on every
+request, since concurrent requests would queue on the same row lock.
+``increment`` appends a CounterDelta row instead, and ``flush_counters``
+periodically folds the pending deltas into a single ``F()`` UPDATE per
+counter row. Deltas are stored in the database, so increments that have
+not been flushed survive a crash or restart. ``reconcile_coupon_counts``
+recomputes coupon usage from orders to repair any drift.
+"""
+
+from collections import Counter
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import Coupon, CounterDelta
+
+
+def increment(model, field_name, object_id, amount=1):
+    """Record that ``model.field_name`` of the given row grew by ``amount``."""
+    CounterDelta.objects.create(
+        model_label=model._meta.label_lower,
+        field_name=field_name,
+        object_id=object_id,
+        amount=amount,
+    )
+
+
+def flush_counters(batch_size=5000):
+    """
+    Apply pending counter deltas and return the number of deltas applied.
+
+    Each batch sums the deltas per counter row, runs one UPDATE per row and
+    deletes the applied deltas in the same transaction. Rows already locked by
+    a concurrent flush are skipped where the database supports it.
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+
+    total_deltas = 0
+    while True:
+        with transaction.atomic():
+            deltas = list(
+                CounterDelta.objects.select_for_update(skip_locked=skip_locked)
+                .order_by("id")
+                .values_list("id", "model_label", "field_name", "object_id", "amount")[
+                    :batch_size
+                ]
+            )
+            if not deltas:
+                break
+
+            totals = Counter()
+            for _, model_label, field_name, object_id, amount in deltas:
+                totals[(model_label, field_name, object_id)] += amount
+
+            for (model_label, field_name, object_id), amount in totals.items():
+                if amount:
+                    model = apps.get_model(model_label)
+                    model._base_manager.filter(pk=object_id).update(
+                        **{field_name: F(field_name) + amount}
+                    )
+
+            CounterDelta.objects.filter(id__in=[delta[0] for delta in deltas]).delete()
+
+        total_deltas += len(deltas)
+
+    return total_deltas
+
+
+def reconcile_coupon_counts():
+    """
+    Reset Coupon.count to the number of orders placed with each coupon,
+    minus the increments still waiting to be flushed. Returns the number of
+    coupons that were corrected.
+
+    The pending deltas and then the coupons are locked, in the order
+    ``flush_counters`` takes them, so a flush cannot move increments from
+    one to the other between the reads and the write.
+    """
+    with transaction.atomic():
+        pending = Counter()
+        for object_id, amount in (
+            CounterDelta.objects.select_for_update()
+            .filter(model_label=Coupon._meta.label_lower, field_name="count")
+            .values_list("object_id", "amount")
+        ):
+            pending[object_id] += amount
+        counts = dict(Coupon.objects.select_for_update().values_list("id", "count"))
+        used = dict(
+            Coupon.objects.annotate(used=Count("user_orders")).values_list(
+                "id", "used"
+            )
+        )
+
+        corrected = 0
+        for coupon_id, count in counts.items():
+            expected = used.get(coupon_id, 0) - pending[coupon_id]
+            if count != expected:
+                Coupon.objects.filter(id=coupon_id).update(count=expected)
+                corrected += 1
+
+    return corrected
@@ -0,0 +1,99 @@
+"""
+Process-local index of the coupons that are valid right now.
+
+Applying a coupon (including users guessing codes) is answered from memory.
+The index reloads itself when:
+
+- a Coupon is saved or deleted in any process (a version key in the cache is
+  bumped, see ``admin_panel.signals``),
+- the next validity window boundary passes, i.e. a loaded coupon expires or
+  an upcoming one starts.
+
+The other processes only see the version key through a shared cache
+(``CACHE_URL``). With the per-process memory cache, a coupon deactivated in
+one worker would stay redeemable in the others, so every lookup queries the
+database instead.
+
+Coupons returned by the index are shared between requests and must be
+treated as read-only.
+"""
+
+import threading
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from ecommerce.cache import cache_is_shared
+
+from .models import Coupon
+
+
+COUPON_INDEX_VERSION_KEY = "coupon_index:version"
+
+
+class CouponIndex:
+    """Currently valid coupons keyed by code, each list sorted by validity window."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._coupons = {}
+        self._version = None
+        self._next_boundary = None
+
+    def _is_stale(self, now):
+        if self._version is None:
+            return True
+        if self._next_boundary is not None and now >= self._next_boundary:
+            return True
+        return cache.get(COUPON_INDEX_VERSION_KEY, 0) != self._version
+
+    def _load(self, now):
+        version = cache.get_or_set(COUPON_INDEX_VERSION_KEY, 0, None)
+        coupons = {}
+        boundaries = []
+        for coupon in Coupon.objects.filter(
+            is_active=True, deleted_at__isnull=True, end_date__gt=now
+        ).order_by("start_date", "end_date", "id"):
+            if coupon.start_date <= now:
+                coupons.setdefault(coupon.code, []).append(coupon)
+                boundaries.append(coupon.end_date)
+            else:
+                boundaries.append(coupon.start_date)
+
+        self._coupons = coupons
+        self._next_boundary = min(boundaries, default=None)
+        self._version = version
+
+    def get(self, code):
+        """Return the valid coupon with the given code, or None."""
+        now = timezone.now()
+        if not cache_is_shared():
+            return (
+                Coupon.objects.filter(
+                    code=code,
+                    is_active=True,
+                    deleted_at__isnull=True,
+                    start_date__lte=now,
+                    end_date__gt=now,
+                )
+                .order_by("start_date", "end_date", "id")
+                .first()
+            )
+
+        if self._is_stale(now):
+            with self._lock:
+                if self._is_stale(now):
+                    self._load(now)
+
+        for coupon in self._coupons.get(code, ()):
+            if coupon.start_date <= now < coupon.end_date:
+                return coupon
+        return None
+
+    def invalidate(self):
+        """Make every process reload its index on the next lookup."""
+        cache.set(COUPON_INDEX_VERSION_KEY, timezone.now().timestamp(), None)
+        self._version = None
+
+
+coupon_index = CouponIndex()
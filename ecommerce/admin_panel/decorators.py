@@ -4,6 +4,8 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.shortcuts import render
 
+from .permissions import has_cached_perm
+
 
 def check_user_permission(permission_codename, type=None):
 
@@ -14,7 +16,7 @@ def check_user_permission(permission_codename, type=None):
             is_check = request.GET.get("is_check", None)
 
             # Check if the user has the required permission
-            has_permission = request.user.has_perm(permission_codename)
+            has_permission = has_cached_perm(request.user, permission_codename)
 
             if is_check:
                 if request.user.is_superuser or has_permission:
@@ -35,3 +37,16 @@ def check_user_permission(permission_codename, type=None):
         return inner
 
     return decorator
+
+
+def superuser_required(func):
+    """Like check_user_permission, for pages no permission can grant."""
+
+    @wraps(func)
+    @login_required(login_url="login")
+    def inner(request, *args, **kwargs):
+        if request.user.is_superuser:
+            return func(request, *args, **kwargs)
+        return render(request, "admin_panel/404.html")
+
+    return inner
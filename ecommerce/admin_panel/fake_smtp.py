@@ -0,0 +1,74 @@
+"""
+Local SMTP sink, used instead of the real mail server in load tests.
+
+It speaks enough SMTP for Django's SMTP backend (EHLO, AUTH PLAIN, MAIL,
+RCPT, DATA, RSET, NOOP, QUIT), accepts every message and only counts it, so
+order emails cost a local round trip and never leave the machine. Point the
+site at it with ``EMAIL_HOST``/``EMAIL_PORT`` (no TLS).
+"""
+
+import socketserver
+import threading
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def _read_data(self):
+        """Read the message up to the lone "." line and return its size."""
+        size = 0
+        for line in self.rfile:
+            if line in (b".\r\n", b".\n"):
+                break
+            size += len(line)
+        return size
+
+    def handle(self):
+        self._reply("220 localhost fake SMTP ready")
+        for line in self.rfile:
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-localhost")
+                self._reply("250-AUTH PLAIN")
+                self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 localhost")
+            elif verb == "AUTH":
+                if len(command.split()) < 3:
+                    # No initial response: the credentials follow on a line
+                    self._reply("334 ")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                size = self._read_data()
+                with self.server.lock:
+                    self.server.messages += 1
+                    self.server.bytes += size
+                self._reply("250 OK: queued")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True  # Restart right away, like HTTPServer
+    daemon_threads = True
+
+
+def create_server(host="127.0.0.1", port=8025):
+    """
+    Return an SMTP sink (call ``serve_forever()`` to run it). ``messages``
+    and ``bytes`` count what it has received.
+    """
+    server = SMTPSinkServer((host, port), SMTPSinkHandler)
+    server.messages = 0
+    server.bytes = 0
+    server.lock = threading.Lock()
+    return server
@@ -0,0 +1,74 @@
+"""
+Resized WebP derivatives of uploaded product and banner images.
+
+Derivatives are generated by a Celery task after the upload is committed
+(see ``admin_panel.signals``), never in the web process. They are stored next
+to the original under a ``derivatives/`` folder and recorded on the model as
+
+    {"source": <original name>, "<size name>": <derivative name>, ...}
+
+Templates pick a size with the ``image_url`` filter from
+``product_management.templatetags.image_tags``.
+"""
+
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+
+def get_derivative_sizes(instance):
+    """Return {size name: (max width, max height)} for the instance's model."""
+    return settings.IMAGE_DERIVATIVE_SIZES.get(instance._meta.label_lower, {})
+
+
+def generate_derivatives(instance):
+    """Create the WebP derivatives of ``instance.image`` and record them."""
+    from PIL import Image, ImageOps
+
+    storage = instance.image.storage
+    source = instance.image.name
+    directory, filename = os.path.split(os.path.splitext(source)[0])
+
+    try:
+        with storage.open(source, "rb") as file:
+            original = ImageOps.exif_transpose(Image.open(file))
+            original.load()
+    except OSError:
+        # Missing or unreadable file: record it so it is not retried, the
+        # templates keep serving the original
+        original = None
+    if original is None:
+        return _record(instance, source, {"source": source})
+
+    has_alpha = "A" in original.getbands() or "transparency" in original.info
+    original = original.convert("RGBA" if has_alpha else "RGB")
+
+    derivatives = {"source": source}
+    for size_name, (width, height) in get_derivative_sizes(instance).items():
+        image = original.copy()
+        image.thumbnail((width, height), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, "WEBP", quality=settings.IMAGE_DERIVATIVE_QUALITY, method=4)
+
+        path = os.path.join(directory, "derivatives", f"{filename}_{size_name}.webp")
+        if storage.exists(path):
+            storage.delete(path)
+        derivatives[size_name] = storage.save(path, ContentFile(buffer.getvalue()))
+
+    # Remove the derivatives of a replaced image
+    for size_name, path in (instance.derivatives or {}).items():
+        if size_name != "source" and path not in derivatives.values():
+            storage.delete(path)
+
+    return _record(instance, source, derivatives)
+
+
+def _record(instance, source, derivatives):
+    # update() rather than save() so no post_save signal fires again
+    type(instance)._base_manager.filter(pk=instance.pk, image=source).update(
+        derivatives=derivatives
+    )
+    instance.derivatives = derivatives
+    return derivatives
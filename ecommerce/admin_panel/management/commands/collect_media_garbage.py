@@ -0,0 +1,29 @@
+import humanize
+from django.core.management.base import BaseCommand
+
+from admin_panel.media_gc import collect_media_garbage
+
+
+class Command(BaseCommand):
+    help = "Remove deleted product images and orphaned files under the media folders"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be removed",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        summary = collect_media_garbage(
+            dry_run=options["dry_run"], batch_size=options["batch_size"]
+        )
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {summary['files']} files ({summary['orphans']} orphaned) "
+                f"and {summary['rows']} image rows, "
+                f"{humanize.naturalsize(summary['bytes'])} reclaimed."
+            )
+        )
@@ -0,0 +1,54 @@
+import os
+import time
+from dataclasses import fields
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel.scale_data import PASSWORD, PREFIX, ScaleConfig, generate_scale_data
+from user_management.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a production-sized synthetic catalog, users, orders, "
+        "wishlists and events to reproduce performance problems locally"
+    )
+
+    def add_arguments(self, parser):
+        for field in fields(ScaleConfig):
+            parser.add_argument(
+                f"--{field.name.replace('_', '-')}",
+                type=int,
+                default=field.default,
+                help=f"Default: {field.default}",
+            )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Worker processes (always 1 on SQLite)",
+        )
+
+    def log(self, table, created, total):
+        self.stdout.write(f"{table}: {created}/{total}")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{PREFIX}-user-").exists():
+            raise CommandError(
+                "Scale data was already generated in this database, start from "
+                "a fresh one (`manage.py flush` then `manage.py load_fixtures`)."
+            )
+
+        config = ScaleConfig(
+            **{field.name: options[field.name] for field in fields(ScaleConfig)}
+        )
+        started = time.monotonic()
+        created = generate_scale_data(config, workers=options["workers"], log=self.log)
+        summary = ", ".join(f"{count} {table}" for table, count in created.items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {summary} in {time.monotonic() - started:.0f}s. "
+                f"Users {PREFIX}-admin and {PREFIX}-user-N log in with "
+                f"'{PASSWORD}'."
+            )
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.importtime import (
+    IMPORT_TIME_BUDGET_MS,
+    LAZY_MODULES,
+    measure_import_time,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the start-up import time and memory of a worker with "
+        "`python -X importtime` and check it against the budget"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET_MS)
+
+    def handle(self, *args, **options):
+        result = measure_import_time()
+        for module, ms in list(result["top_level"].items())[: options["top"]]:
+            self.stdout.write(f"{module:<60} {ms:>9.1f} ms")
+        self.stdout.write(
+            f"Start-up imports took {result['total_ms']:.0f} ms, "
+            f"peak RSS {result['rss_mb']:.0f} MB."
+        )
+
+        if result["lazy_imported"]:
+            raise CommandError(
+                f"Imported at start-up: {', '.join(result['lazy_imported'])}. "
+                f"Import {', '.join(LAZY_MODULES)} where they are used."
+            )
+        if result["total_ms"] > options["budget"]:
+            raise CommandError(
+                f"Over the budget of {options['budget']:.0f} ms, see "
+                "`python -X importtime` for the slow imports."
+            )
+        self.stdout.write(self.style.SUCCESS("Within the import time budget."))
@@ -0,0 +1,92 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from benchmarks.datasets import SIZES
+from benchmarks.runner import compare, load_baseline, run_benchmarks, save_baseline
+
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "baseline.json")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the cart, order, category, pagination, serializer, tracking "
+        "and report hot paths on a test database and compare with a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="small",
+            help=f"Comma separated dataset sizes ({', '.join(SIZES)})",
+        )
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--only", help="Only run cases whose name contains this")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store the results as the new baseline instead of comparing",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=2.0,
+            help="Slowdown factor of time and memory that counts as a regression",
+        )
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def report(self, size, name, result):
+        self.stdout.write(
+            f"{size:<7} {name:<40} {result['median_ms']:>9.2f} ms "
+            f"{result['queries']:>5} queries {result['peak_kb']:>9.1f} KB"
+        )
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options["sizes"].split(",")]
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(sorted(unknown))}")
+
+        # Never benchmark against the real data: run on a throwaway database
+        setup_test_environment(debug=True)
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={"default"}
+        )
+        try:
+            results = run_benchmarks(
+                sizes,
+                repeat=options["repeat"],
+                only=options["only"],
+                report=self.report,
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+
+        if options["save_baseline"]:
+            save_baseline(options["baseline"], results)
+            self.stdout.write(self.style.SUCCESS(f"Saved {options['baseline']}"))
+            return
+
+        regressions = compare(
+            results, load_baseline(options["baseline"]), options["threshold"]
+        )
+        if regressions:
+            raise CommandError(
+                "Performance regressions:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from admin_panel.fake_smtp import create_server
+
+
+class Command(BaseCommand):
+    help = "Run a local SMTP sink that accepts and discards every email"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8025)
+
+    def handle(self, *args, **options):
+        server = create_server(options["host"], options["port"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"SMTP sink listening on {options['host']}:{options['port']}"
+                f" - set EMAIL_HOST and EMAIL_PORT to this address."
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stdout.write(f"{server.messages} emails received.")
+            server.server_close()
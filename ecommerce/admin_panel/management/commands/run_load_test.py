@@ -0,0 +1,234 @@
+import json
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler,
+    get_internal_wsgi_application,
+)
+from django.test.utils import override_settings
+
+from admin_panel import fake_smtp
+from admin_panel.models import Address, EmailTemplate
+from admin_panel.scale_data import PASSWORD, PREFIX
+from loadtest.journeys import JOURNEYS, Target
+from loadtest.runner import parse_mix, run_load_test
+from loadtest.stats import PERCENTILES
+from order_management import fake_gateway
+from order_management.models import PaymentGateway
+from product_management.models import Product
+from user_management.models import User
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_in_thread(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the storefront and admin panel with scripted journeys, "
+        "against a local SMTP sink and a fake Razorpay API"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="Site to test, ignored with --serve",
+        )
+        parser.add_argument(
+            "--serve",
+            action="store_true",
+            help="Serve the site from this process, wired to the local stand-ins",
+        )
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=60, help="Seconds")
+        parser.add_argument(
+            "--mix",
+            default="",
+            help="Journey weights, e.g. browse=60,checkout_cod=10 "
+            f"(journeys: {', '.join(JOURNEYS)})",
+        )
+        parser.add_argument(
+            "--think-time", type=float, default=0, help="Mean pause between journeys"
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--customer-prefix", default=f"{PREFIX}-user-")
+        parser.add_argument("--password", default=PASSWORD)
+        parser.add_argument("--admin-username", default=f"{PREFIX}-admin")
+        parser.add_argument("--admin-password", default=PASSWORD)
+        parser.add_argument("--smtp-port", type=int, default=8025)
+        parser.add_argument("--gateway-port", type=int, default=8090)
+        parser.add_argument(
+            "--gateway-latency", type=float, default=0, help="Milliseconds"
+        )
+        parser.add_argument("--gateway-error-rate", type=float, default=0)
+        parser.add_argument(
+            "--no-fakes",
+            action="store_true",
+            help="Do not start the SMTP sink and fake Razorpay (already running)",
+        )
+        parser.add_argument(
+            "--max-error-rate",
+            type=float,
+            default=0.01,
+            help="Fail when more requests than this share fail",
+        )
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def build_target(self, options):
+        admin = User.objects.filter(username=options["admin_username"]).first()
+        if admin is None:
+            raise CommandError(
+                f"No user {options['admin_username']}, generate data first with "
+                "`manage.py generate_scale_data`."
+            )
+        if not EmailTemplate.objects.filter(title="Order Confirmation").exists():
+            raise CommandError(
+                "The order email templates are missing, load them with "
+                "`manage.py load_fixtures`."
+            )
+        for name in ("Cash On Delivery", "Razorpay"):
+            PaymentGateway.objects.get_or_create(
+                name=name, defaults={"created_by": admin, "updated_by": admin}
+            )
+
+        customers = list(
+            Address.objects.filter(
+                user__username__startswith=options["customer_prefix"], active=True
+            )
+            .order_by("user_id")
+            .values_list("user__username", "id")[:1000]
+        )
+        # Enough stock for the whole test, add_to_cart refuses the rest
+        product_ids = list(
+            Product.objects.filter(
+                is_active=True, deleted_at__isnull=True, quantity__gte=50
+            )
+            .order_by("-view_count", "id")
+            .values_list("id", flat=True)[:1000]
+        )
+        if not customers or not product_ids:
+            raise CommandError(
+                "No customers with an address or products in stock, generate "
+                "data first with `manage.py generate_scale_data`."
+            )
+        return Target(
+            base_url=options["base_url"].rstrip("/"),
+            password=options["password"],
+            customers=customers,
+            product_ids=product_ids,
+            admin_username=options["admin_username"],
+            admin_password=options["admin_password"],
+            razorpay_key_secret=settings.RAZORPAY_KEY_SECRET or "",
+        )
+
+    def print_summary(self, summary):
+        columns = ["count", "errors", "rps"] + [f"p{p}_ms" for p in PERCENTILES]
+        columns.append("max_ms")
+        self.stdout.write(
+            f"{'endpoint':<28}" + "".join(f"{column:>10}" for column in columns)
+        )
+        for name, row in summary.items():
+            self.stdout.write(
+                f"{name:<28}" + "".join(f"{row[column]:>10}" for column in columns)
+            )
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        smtp = gateway = None
+        if not options["no_fakes"]:
+            smtp = _serve_in_thread(fake_smtp.create_server(port=options["smtp_port"]))
+            gateway = _serve_in_thread(
+                fake_gateway.create_server(
+                    port=options["gateway_port"],
+                    latency=options["gateway_latency"] / 1000,
+                    error_rate=options["gateway_error_rate"],
+                )
+            )
+
+        overrides = {}
+        if options["serve"]:
+            overrides = {
+                "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "127.0.0.1"],
+                "EMAIL_HOST": "127.0.0.1",
+                "EMAIL_PORT": options["smtp_port"],
+                "EMAIL_HOST_USER": "",
+                "EMAIL_HOST_PASSWORD": "",
+                "EMAIL_USE_TLS": False,
+                "EMAIL_USE_SSL": False,
+                "DEFAULT_FROM_EMAIL": settings.DEFAULT_FROM_EMAIL or "shop@example.com",
+                "RAZORPAY_BASE_URL": f"http://127.0.0.1:{options['gateway_port']}",
+                "RAZORPAY_KEY_ID": settings.RAZORPAY_KEY_ID or "rzp_test_loadtest",
+                "RAZORPAY_KEY_SECRET": settings.RAZORPAY_KEY_SECRET or "loadtest",
+            }
+        else:
+            self.stdout.write(
+                f"Testing {options['base_url']}; start it with "
+                f"EMAIL_HOST=127.0.0.1 EMAIL_PORT={options['smtp_port']} "
+                f"RAZORPAY_BASE_URL=http://127.0.0.1:{options['gateway_port']}"
+            )
+
+        with override_settings(**overrides):
+            target = self.build_target(options)
+            server = None
+            if options["serve"]:
+                server = ThreadedWSGIServer(
+                    ("127.0.0.1", 0), QuietWSGIRequestHandler
+                )
+                server.set_app(get_internal_wsgi_application())
+                _serve_in_thread(server)
+                target.base_url = f"http://127.0.0.1:{server.server_port}"
+            try:
+                stats, elapsed = run_load_test(
+                    target,
+                    users=options["users"],
+                    duration=options["duration"],
+                    mix=mix,
+                    think_time=options["think_time"],
+                    seed=options["seed"],
+                )
+            finally:
+                if server:
+                    server.shutdown()
+                    server.server_close()
+
+        summary = stats.summary(elapsed)
+        self.print_summary(summary)
+        if smtp:
+            self.stdout.write(
+                f"{smtp.messages} emails received, "
+                f"{len(gateway.orders)} Razorpay orders created."
+            )
+            smtp.shutdown()
+            gateway.shutdown()
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(summary, file, indent=2)
+
+        total = summary["TOTAL"]
+        error_rate = total["errors"] / total["count"] if total["count"] else 1
+        if error_rate > options["max_error_rate"]:
+            raise CommandError(
+                f"{total['errors']} of {total['count']} requests failed "
+                f"({error_rate:.1%})."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{total['count']} requests in {elapsed:.0f}s "
+                f"({total['rps']} req/s), {error_rate:.1%} failed."
+            )
+        )
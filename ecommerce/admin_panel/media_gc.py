@@ -0,0 +1,148 @@
+"""
+Garbage collection of uploaded media.
+
+Deleting a product image from the admin only marks the row (``deleted_at``),
+the storefront stops showing it right away (``ProductImage.objects.visible()``);
+``collect_media_garbage`` later removes the files in batches:
+
+- images marked deleted, or belonging to a soft-deleted product, for longer
+  than the grace period are removed from storage with their derivatives,
+  then their rows are deleted. Files another row still uses (bulk imports
+  and generated data point several rows at one file) are kept,
+- files under the media folders that no row references any more (e.g. the
+  image of a deleted banner, an upload whose row was never saved) are
+  removed once they are older than the grace period.
+
+Each run returns a summary of the files removed and the space reclaimed.
+"""
+
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from product_management.models import ProductImage
+
+from .models import Banner
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_GC_FOLDERS = ["product_images", "banners"]
+
+
+def mark_images_deleted(queryset):
+    """Mark product images for deletion, their files are removed later."""
+    return queryset.filter(deleted_at__isnull=True).update(
+        deleted_at=timezone.now(), is_active=False
+    )
+
+
+def _image_paths(image, derivatives):
+    paths = [image] if image else []
+    paths.extend(
+        path for name, path in (derivatives or {}).items() if name != "source"
+    )
+    return paths
+
+
+def _delete_file(storage, path, summary, dry_run):
+    try:
+        size = storage.size(path)
+        if not dry_run:
+            storage.delete(path)
+    except OSError:
+        return  # Already gone
+    except SuspiciousFileOperation:
+        # An absolute or "../" path, outside the media root
+        logger.warning("Not deleting %r: outside the media storage", path)
+        return
+    summary["files"] += 1
+    summary["bytes"] += size
+
+
+def purge_deleted_images(summary, cutoff, batch_size, dry_run=False):
+    """Remove the files and rows of product images deleted before ``cutoff``."""
+    storage = ProductImage._meta.get_field("image").storage
+    purged = Q(deleted_at__lt=cutoff) | Q(product__deleted_at__lt=cutoff)
+    queryset = ProductImage.objects.filter(purged).order_by("id")
+    # Files of the rows that stay
+    referenced = _referenced_paths(exclude=purged)
+
+    last_id = 0
+    while True:
+        images = list(
+            queryset.filter(id__gt=last_id).values_list(
+                "id", "image", "derivatives"
+            )[:batch_size]
+        )
+        if not images:
+            break
+        last_id = images[-1][0]
+
+        for _, image, derivatives in images:
+            for path in _image_paths(image, derivatives):
+                if path not in referenced:
+                    _delete_file(storage, path, summary, dry_run)
+        if not dry_run:
+            ProductImage.objects.filter(id__in=[image[0] for image in images]).delete()
+        summary["rows"] += len(images)
+
+
+def _referenced_paths(exclude=None):
+    """The files used by the image rows, except the ProductImage ``exclude`` ones."""
+    referenced = set()
+    for model in (ProductImage, Banner):
+        queryset = model._base_manager.all()
+        if exclude is not None and model is ProductImage:
+            queryset = queryset.exclude(exclude)
+        for image, derivatives in queryset.values_list(
+            "image", "derivatives"
+        ).iterator(chunk_size=2000):
+            referenced.update(_image_paths(image, derivatives))
+    return referenced
+
+
+def _walk(storage, folder):
+    """Yield the paths of all files under ``folder`` of the storage."""
+    try:
+        directories, files = storage.listdir(folder)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield os.path.join(folder, name)
+    for name in directories:
+        yield from _walk(storage, os.path.join(folder, name))
+
+
+def purge_orphaned_files(summary, cutoff, dry_run=False):
+    """Remove files under the media folders that no row references."""
+    storage = default_storage
+    referenced = _referenced_paths()
+    for folder in MEDIA_GC_FOLDERS:
+        for path in _walk(storage, folder):
+            if path in referenced:
+                continue
+            if storage.get_modified_time(path) >= cutoff:
+                continue  # Possibly an upload still being saved
+            _delete_file(storage, path, summary, dry_run)
+            summary["orphans"] += 1
+
+
+def collect_media_garbage(dry_run=False, batch_size=None):
+    """
+    Run one garbage collection pass and return
+    {"rows": ..., "files": ..., "orphans": ..., "bytes": ...}.
+    """
+    batch_size = batch_size or settings.MEDIA_GC_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(seconds=settings.MEDIA_GC_GRACE_PERIOD)
+    summary = {"rows": 0, "files": 0, "orphans": 0, "bytes": 0}
+
+    purge_deleted_images(summary, cutoff, batch_size, dry_run=dry_run)
+    purge_orphaned_files(summary, cutoff, dry_run=dry_run)
+    return summary
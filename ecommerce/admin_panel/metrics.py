@@ -0,0 +1,272 @@
+"""
+Per-view request, SQL query and database time metrics.
+
+``QueryInstrumentationMiddleware`` installs a ``QueryRecorder`` as the
+execute wrapper of every database connection for the duration of a request.
+The recorder only counts and times the queries, keyed by their SQL text
+(which holds placeholders, not values), so the overhead is a function call
+and a clock read per query. At the end of the request the totals are added
+to histograms labelled with the resolved view name.
+
+A request that runs the same query shape ``QUERY_N_PLUS_ONE_THRESHOLD``
+times or more is counted as an N+1 suspect and logged once per view and
+shape, with the SQL.
+
+Each process keeps its own registry and writes a snapshot to the cache at
+most every ``METRICS_FLUSH_INTERVAL`` seconds; ``/metrics`` adds up the
+snapshots of all the processes and renders them in the Prometheus text
+format.
+
+Adding up needs a cache shared by the processes (``CACHE_URL``). With the
+per-process memory cache a scrape can only see the process that answered
+it, so ``/metrics`` reports that process alone, with a ``process`` label:
+each worker's series stay monotonic instead of jumping between scrapes.
+"""
+
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ecommerce.cache import cache_is_shared
+
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PROCESSES_CACHE_KEY = "metrics:processes"
+# Snapshots of processes that stopped flushing are dropped after this long
+PROCESS_TIMEOUT = 60 * 60
+
+IN_LIST_RE = re.compile(r"\bIN \(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+
+def query_shape(sql):
+    """The query with its IN lists collapsed, so their length does not matter."""
+    if " IN (" in sql:
+        return IN_LIST_RE.sub("IN (%s, ...)", sql)
+    return sql
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+
+    def empty(self):
+        # Non-cumulative bucket counts (the last is +Inf), then sum and count
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, values, label, value):
+        series = values.setdefault(label, self.empty())
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, values, extra_labels=""):
+        for label, series in sorted(values.items()):
+            labels = f'view="{label}"{extra_labels}'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            yield f"{self.name}_sum{{{labels}}} {round(series[-2], 6)}"
+            yield f"{self.name}_count{{{labels}}} {series[-1]}"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+
+    def empty(self):
+        return [0]
+
+    def observe(self, values, label, value=1):
+        values.setdefault(label, self.empty())[0] += value
+
+    def render(self, values, extra_labels=""):
+        for label, series in sorted(values.items()):
+            yield f'{self.name}{{view="{label}"{extra_labels}}} {series[0]}'
+
+
+def process_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _escape(label):
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """The metrics of this process, {metric name: {view: series}}."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.values = {}
+        self.process_key = f"metrics:process:{process_name()}"
+        self.flushed_at = 0.0
+
+    def add(self, metric):
+        self.metrics[metric.name] = metric
+        self.values[metric.name] = {}
+        return metric
+
+    def observe(self, metric, label, value=1):
+        with self.lock:
+            metric.observe(self.values[metric.name], _escape(label), value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {label: list(series) for label, series in values.items()}
+                for name, values in self.values.items()
+            }
+
+    def flush(self, force=False):
+        """Write the snapshot of this process to the cache, if it is time to."""
+        if not cache_is_shared():
+            return
+        now = time.monotonic()
+        if not force and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        # A forked worker inherits the parent's registry but is a new process
+        self.process_key = f"metrics:process:{process_name()}"
+        cache.set(self.process_key, self.snapshot(), PROCESS_TIMEOUT)
+        processes = cache.get(PROCESSES_CACHE_KEY) or {}
+        if self.process_key not in processes:
+            processes[self.process_key] = True
+            cache.set(PROCESSES_CACHE_KEY, processes, None)
+
+    def collect(self):
+        """Add up the snapshots of every process."""
+        self.flush(force=True)
+        processes = cache.get(PROCESSES_CACHE_KEY) or {}
+        snapshots = cache.get_many(list(processes))
+        stale = set(processes) - set(snapshots)
+        if stale:
+            cache.set(
+                PROCESSES_CACHE_KEY,
+                {key: True for key in processes if key not in stale},
+                None,
+            )
+
+        totals = {name: {} for name in self.metrics}
+        for snapshot in snapshots.values():
+            for name, values in snapshot.items():
+                if name not in totals:
+                    continue
+                for label, series in values.items():
+                    total = totals[name].setdefault(label, [0] * len(series))
+                    for index, value in enumerate(series):
+                        total[index] += value
+        return totals
+
+    def render(self):
+        """All the processes' metrics in the Prometheus text format."""
+        if cache_is_shared():
+            totals, extra_labels = self.collect(), ""
+        else:
+            # Only this process can be seen, see the module docstring
+            totals = self.snapshot()
+            extra_labels = f',process="{_escape(process_name())}"'
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.render(totals[name], extra_labels))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+VIEW_DURATION = REGISTRY.add(
+    Histogram(
+        "django_view_duration_seconds",
+        "Time spent in the middleware stack and view, per view.",
+        SECONDS_BUCKETS,
+    )
+)
+VIEW_QUERIES = REGISTRY.add(
+    Histogram(
+        "django_view_queries",
+        "Number of SQL queries run by a request, per view.",
+        QUERY_BUCKETS,
+    )
+)
+VIEW_DB_DURATION = REGISTRY.add(
+    Histogram(
+        "django_view_db_duration_seconds",
+        "Time spent running SQL queries in a request, per view.",
+        SECONDS_BUCKETS,
+    )
+)
+VIEW_N_PLUS_ONE = REGISTRY.add(
+    Counter(
+        "django_view_n_plus_one_suspects_total",
+        "Requests that repeated a query shape QUERY_N_PLUS_ONE_THRESHOLD times.",
+    )
+)
+
+# (view, shape) already logged by this process
+_reported = set()
+
+
+class QueryRecorder:
+    """Database execute wrapper counting and timing the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql] = self.shapes.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        """{shape: count} of the query shapes run ``threshold`` times or more."""
+        shapes = {}
+        for sql, count in self.shapes.items():
+            shape = query_shape(sql)
+            shapes[shape] = shapes.get(shape, 0) + count
+        return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+
+def record_request(view, duration, recorder):
+    REGISTRY.observe(VIEW_DURATION, view, duration)
+    REGISTRY.observe(VIEW_QUERIES, view, recorder.count)
+    REGISTRY.observe(VIEW_DB_DURATION, view, recorder.duration)
+
+    suspects = recorder.repeated(settings.QUERY_N_PLUS_ONE_THRESHOLD)
+    if suspects:
+        REGISTRY.observe(VIEW_N_PLUS_ONE, view)
+        for shape, count in suspects.items():
+            if (view, shape) not in _reported and len(_reported) < 1000:
+                _reported.add((view, shape))
+                logger.warning(
+                    "Possible N+1 in %s: query run %d times in one request: %s",
+                    view,
+                    count,
+                    shape[:500],
+                )
+    REGISTRY.flush()
@@ -1,28 +1,84 @@
+import logging
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from . import profiling
+from .metrics import QueryRecorder, record_request
 from .models import UserEventTracking
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from ecommerce import db_router
 from django.contrib.gis.geoip2 import GeoIP2
 from ipaddress import ip_address, ip_network
 from geoip2.errors import AddressNotFoundError
 
 
+logger = logging.getLogger(__name__)
+
+# User agents of crawlers, monitors and HTTP libraries that are not worth tracking
+BOT_USER_AGENT_RE = re.compile(
+    r"bot|crawl|spider|slurp|scrape|fetch|monitor|preview|headless|lighthouse"
+    r"|python-requests|python-urllib|curl|wget|httpclient|okhttp|go-http-client",
+    re.IGNORECASE,
+)
+
+VISITOR_COOKIE_SALT = "admin_panel.visitor_id"
+
+
 class UserEventTrackingMiddleware:
-    """Middleware to track user events"""
+    """
+    Middleware to track user events
+
+    Anonymous visitors are identified by their session key when they already
+    have a session, otherwise by a signed visitor id cookie, so tracking never
+    creates a session row on its own. Bot traffic is not tracked at all.
+
+    Works in both sync and async stacks; under ASGI the event is recorded in
+    a worker thread, as it reads the session and user and writes a row.
+    """
+
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
         # Skip certain requests
-        if self.should_skip_request(request):
+        if self.should_skip_request(request) or self.is_bot(request):
             return self.get_response(request)
 
         # Capture the response from the view
         response = self.get_response(request)
+        self.track_event(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if self.should_skip_request(request) or self.is_bot(request):
+            return await self.get_response(request)
 
-        # Ensure the session has a key
-        if not request.session.session_key:
-            request.session.save()
-        session_id = request.session.session_key
+        response = await self.get_response(request)
+        await sync_to_async(self.track_event)(request, response)
+        return response
+
+    def track_event(self, request, response):
+        """Record the event of a request that was answered with ``response``."""
+
+        # Identify the visitor without forcing a session to be created
+        session_id = request.session.session_key or self.get_visitor_id(
+            request, response
+        )
 
         # Capture event details
         event_type = self.get_event_type(request)
@@ -65,7 +121,32 @@ class UserEventTrackingMiddleware:
 
         UserEventTracking.objects.create(**event_data)
 
-        return response
+    @staticmethod
+    def is_bot(request):
+        """Check whether the request comes from a crawler or an HTTP client library."""
+
+        user_agent = request.META.get("HTTP_USER_AGENT", "")
+        return not user_agent or bool(BOT_USER_AGENT_RE.search(user_agent))
+
+    @staticmethod
+    def get_visitor_id(request, response):
+        """Return the visitor id from the signed cookie, issuing a new one if needed."""
+
+        visitor_id = request.get_signed_cookie(
+            settings.VISITOR_COOKIE_NAME, default=None, salt=VISITOR_COOKIE_SALT
+        )
+        if not visitor_id:
+            visitor_id = uuid.uuid4().hex
+            response.set_signed_cookie(
+                settings.VISITOR_COOKIE_NAME,
+                visitor_id,
+                salt=VISITOR_COOKIE_SALT,
+                max_age=settings.VISITOR_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return visitor_id
 
     @staticmethod
     def get_event_type(request):
@@ -190,4 +271,153 @@ class UserEventTrackingMiddleware:
             return True
         if request.path == "/health-check/":
             return True
+        if request.path == "/metrics":
+            return True
         return False
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the duration, SQL query count and database time of every request
+    per resolved view, and flag N+1 suspects (see ``admin_panel.metrics``).
+    Placed first so the queries of the other middleware are counted too.
+
+    Database connections belong to a thread. Under ASGI the queries of a
+    request, from the async ORM, sync views and sync middleware alike, run in
+    its thread-sensitive worker thread, so the wrappers are installed there.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self.install_recorder(recorder):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        record_request(self.get_view_name(request), duration, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        stack = await sync_to_async(self.install_recorder)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        duration = time.perf_counter() - start
+        record_request(self.get_view_name(request), duration, recorder)
+        return response
+
+    @staticmethod
+    def install_recorder(recorder):
+        """Wrap the connections of this thread, until the returned stack closes."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    @staticmethod
+    def get_view_name(request):
+        """The URL name of the view, never the path, to keep the labels few."""
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "<unresolved>"
+        return match.view_name or match._func_path
+
+
+class ProfilingMiddleware:
+    """
+    Profile a sample of the requests with cProfile and keep the stacks of the
+    slow ones (see ``admin_panel.profiling``). Placed first so the profiles
+    cover the other middleware too.
+
+    Both profilers attribute what they see to a request by its thread, which
+    coroutines of many requests share under ASGI: async requests are passed
+    through unprofiled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.get_response(request)
+        if request.path.startswith(("/static/", "/media/")):
+            return self.get_response(request)
+
+        sampler = profiling.get_sampler()
+        profiler = profiling.start_cprofile() if profiling.should_sample() else None
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            stacks = sampler.stop()
+            if profiler is not None:
+                profiling.stop_cprofile(profiler)
+        try:
+            profiling.record_request(
+                QueryInstrumentationMiddleware.get_view_name(request),
+                duration,
+                stacks,
+                profiler,
+            )
+        except OSError:
+            # A full or unwritable disk loses the profile, not the response
+            logger.exception("Could not save the profile of %s", request.path)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track the writes of every request for the replica router, and keep the
+    reads of a browser that just wrote on the primary for a few seconds (see
+    ``ecommerce.db_router``).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICA_ALIASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        with db_router.request_routing(request) as state:
+            response = self.get_response(request)
+        return db_router.pin_to_primary(state, response)
+
+    async def __acall__(self, request):
+        with db_router.request_routing(request) as state:
+            response = await self.get_response(request)
+        return db_router.pin_to_primary(state, response)
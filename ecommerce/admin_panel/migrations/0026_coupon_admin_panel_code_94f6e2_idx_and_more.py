@@ -0,0 +1,21 @@
+# Generated by Django 4.2.14 on 2026-10-19 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0025_alter_usereventtracking_object_info'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['code', 'is_active'], name='admin_panel_code_94f6e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usereventtracking',
+            index=models.Index(fields=['user', 'event_type', 'event_time'], name='admin_panel_user_id_e15515_idx'),
+        ),
+    ]
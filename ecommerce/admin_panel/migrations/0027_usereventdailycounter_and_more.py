@@ -0,0 +1,30 @@
+# Generated by Django 4.2.14 on 2026-10-19 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0026_coupon_admin_panel_code_94f6e2_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEventDailyCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('event_type', models.CharField(max_length=255)),
+                ('device_type', models.CharField(max_length=100)),
+                ('object_info', models.CharField(blank=True, default='', max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usereventdailycounter',
+            constraint=models.UniqueConstraint(fields=('date', 'event_type', 'device_type', 'object_info'), name='unique_user_event_daily_counter'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-19 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0028_counterdelta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banner',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
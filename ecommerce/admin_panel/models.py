@@ -1,5 +1,6 @@
 from django.utils import timezone
 from django.db import models
+from django.db.models import DEFERRED
 from user_management.models import User
 
 
@@ -20,6 +21,78 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class DirtyFieldsMixin:
+    """
+    Track which fields changed since the instance was loaded from the database.
+
+    Values are snapshotted in ``from_db``. Saving a loaded instance without
+    ``update_fields`` only writes the changed fields (plus ``auto_now``
+    fields); saving an unchanged instance does not query at all, and so sends
+    no ``pre_save``/``post_save`` signals. Values are compared with ``!=``,
+    so mutating a mutable value in place is not seen.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(
+            zip(field_names, (value for value in values if value is not DEFERRED))
+        )
+        return instance
+
+    def get_dirty_fields(self):
+        """Return {attname: loaded value} of the fields changed since loading."""
+        loaded_values = getattr(self, "_loaded_values", None)
+        if loaded_values is None:
+            return {}
+
+        dirty_fields = {}
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in loaded_values:
+                # Deferred when loaded and assigned since
+                dirty_fields[field.attname] = DEFERRED
+            elif getattr(self, field.attname) != loaded_values[field.attname]:
+                dirty_fields[field.attname] = loaded_values[field.attname]
+        return dirty_fields
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and hasattr(self, "_loaded_values")
+            and not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            update_fields = list(self.get_dirty_fields())
+            if update_fields:
+                update_fields += [
+                    field.attname
+                    for field in self._meta.concrete_fields
+                    if getattr(field, "auto_now", False)
+                ]
+            kwargs["update_fields"] = update_fields
+
+        super().save(*args, **kwargs)
+
+        # Only the saved fields now match the database
+        update_fields = kwargs.get("update_fields")
+        self._loaded_values = {
+            **getattr(self, "_loaded_values", {}),
+            **{
+                field.attname: getattr(self, field.attname)
+                for field in self._meta.concrete_fields
+                if field.attname in self.__dict__
+                and (
+                    update_fields is None
+                    or field.name in update_fields
+                    or field.attname in update_fields
+                )
+            },
+        }
+
+
 class ContactUs(models.Model):
     user = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, blank=True)
     first_name = models.CharField(max_length=50)
@@ -45,6 +118,11 @@ class Coupon(BaseModel):
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["code", "is_active"]),
+        ]
+
     def __str__(self):
         return f"{self.name}"
 
@@ -113,6 +191,7 @@ class Banner(BaseModel):
     is_active = models.BooleanField(default=True)
     status = models.BooleanField(default=True)
     display_order = models.PositiveIntegerField(default=1)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         """Ordering"""
@@ -180,5 +259,49 @@ class UserEventTracking(models.Model):
     browser_info = models.TextField(blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "event_type", "event_time"]),
+        ]
+
     def __str__(self):
         return f"Event {self.id}: {self.event_type} by User {self.user_id} at {self.event_time}"
+
+
+class UserEventDailyCounter(models.Model):
+    """Daily rollup of user events that have been archived out of UserEventTracking"""
+
+    date = models.DateField()
+    event_type = models.CharField(max_length=255)
+    device_type = models.CharField(max_length=100)
+    object_info = models.CharField(max_length=255, blank=True, default="")
+    count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "event_type", "device_type", "object_info"],
+                name="unique_user_event_daily_counter",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.event_type} ({self.device_type}): {self.count}"
+
+
+class CounterDelta(models.Model):
+    """
+    Pending increment of a counter column, written instead of updating the
+    counter row directly. Deltas are applied in bulk by ``flush_counters``.
+    """
+
+    model_label = models.CharField(max_length=100)
+    field_name = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    amount = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model_label}.{self.field_name}[{self.object_id}] += {self.amount}"
@@ -0,0 +1,78 @@
+"""
+Cross-request cache of each user's resolved permissions and groups.
+
+Entries are keyed by user id and a global version. Changing a user's groups
+or direct permissions drops that user's entry; changing a Group or
+Permission (or a group's permissions) bumps the version, which invalidates
+every entry at once. See ``admin_panel.signals``.
+
+The invalidation only reaches the other workers through a shared cache
+(``CACHE_URL``). With the per-process memory cache a revoked permission
+would stay granted in the other workers, so the lookups are not cached
+across requests then.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from ecommerce.cache import cache_is_shared
+
+
+PERMISSION_CACHE_VERSION_KEY = "user_permissions:version"
+
+
+def _cache_key(user_id):
+    version = cache.get_or_set(PERMISSION_CACHE_VERSION_KEY, 0, None)
+    return f"user_permissions:{version}:{user_id}"
+
+
+def _load_user_access(user):
+    return {
+        "permissions": user.get_all_permissions(),
+        "groups": list(user.groups.values_list("name", flat=True)),
+    }
+
+
+def get_user_access(user):
+    """Return {"permissions": set of "app_label.codename", "groups": [names]}."""
+    # Reuse the result within the same request
+    access = getattr(user, "_access_cache", None)
+    if access is not None:
+        return access
+
+    if not cache_is_shared():
+        access = _load_user_access(user)
+    else:
+        key = _cache_key(user.id)
+        access = cache.get(key)
+        if access is None:
+            access = _load_user_access(user)
+            cache.set(key, access, settings.PERMISSION_CACHE_TIMEOUT)
+
+    user._access_cache = access
+    return access
+
+
+def has_cached_perm(user, permission_codename):
+    """Cached equivalent of ``user.has_perm`` for the model backend permissions."""
+    if not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    return permission_codename in get_user_access(user)["permissions"]
+
+
+def get_user_groups(user):
+    """Return the names of the groups the user belongs to."""
+    return get_user_access(user)["groups"]
+
+
+def invalidate_user_access(*user_ids):
+    """Drop the cached permissions of the given users."""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_all_access():
+    """Drop the cached permissions of every user."""
+    cache.set(PERMISSION_CACHE_VERSION_KEY, timezone.now().timestamp(), None)
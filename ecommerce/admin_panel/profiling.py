@@ -0,0 +1,261 @@
+"""
+Request profiling: a sampled fraction of requests and every slow request.
+
+Two profilers cover the two cases:
+
+* ``PROFILING_SAMPLE_RATE`` of the requests run under cProfile and are saved
+  as ``.prof`` files (open them with ``python -m pstats`` or snakeviz).
+  cProfile traces every call, so it is too slow to run on all requests, and
+  one process only runs one at a time (a concurrent sampled request is just
+  not profiled).
+* Whether a request is slow is only known at its end, so every request is
+  watched by a stack sampler: a daemon thread per process that records the
+  stack of each thread serving a request every ``PROFILING_INTERVAL``
+  seconds. The stacks of requests slower than ``PROFILING_SLOW_THRESHOLD``
+  are saved as ``.folded`` files, in the collapsed format of flamegraph.pl
+  and speedscope. The others are dropped.
+
+The files go to ``PROFILING_DIR`` on the local disk, named after the time,
+view, duration and process, and are written to a temporary name then
+renamed, so the workers of one host can share the directory. The oldest are
+deleted once there are more than ``PROFILING_MAX_FILES`` files or
+``PROFILING_MAX_BYTES`` bytes.
+"""
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+
+PROFILE_NAME_RE = re.compile(
+    r"^(?P<time>\d{8}T\d{6})_(?P<view>[\w.-]+)_(?P<duration>\d+)ms"
+    r"_(?P<pid>\d+)_[0-9a-f]{8}\.(?P<kind>prof|folded)$"
+)
+UNSAFE_CHARS_RE = re.compile(r"[^\w.-]+")
+
+# One cProfile at a time per process
+_cprofile_lock = threading.Lock()
+
+
+def profile_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def should_sample():
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+class StackSampler:
+    """Records the stacks of the threads it is told to watch."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.busy = threading.Event()
+        # {thread id: Counter of stacks, as tuples of code objects}
+        self.watched = {}
+        self.pid = None
+
+    def ensure_running(self):
+        # Threads do not survive a fork, every gunicorn worker starts its own
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    threading.Thread(
+                        target=self.run, name="stack-sampler", daemon=True
+                    ).start()
+
+    def start(self):
+        """Watch the current thread."""
+        self.ensure_running()
+        with self.lock:
+            self.watched[threading.get_ident()] = Counter()
+            self.busy.set()
+
+    def stop(self):
+        """Stop watching the current thread and return its stacks."""
+        with self.lock:
+            stacks = self.watched.pop(threading.get_ident(), Counter())
+            if not self.watched:
+                self.busy.clear()
+        return stacks
+
+    def run(self):
+        while True:
+            self.busy.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks in self.watched.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_stack(frame)] += 1
+
+
+def _stack(frame):
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return tuple(codes)
+
+
+_labels = {}
+
+
+def _label(code):
+    """'path/module.py:function', relative to the project or site-packages."""
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for root in (f"{settings.BASE_DIR}{os.sep}", f"site-packages{os.sep}"):
+            if root in filename:
+                filename = filename.split(root, 1)[1]
+                break
+        else:
+            filename = os.path.basename(filename)
+        label = f"{filename}:{code.co_name}".replace(";", ":").replace(" ", "_")
+        _labels[code] = label
+    return label
+
+
+def folded(stacks):
+    """Stacks in the collapsed format, one "frame;frame;frame count" per line."""
+    lines = [
+        ";".join(_label(code) for code in stack) + f" {count}"
+        for stack, count in stacks.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+SAMPLER = None
+
+
+def get_sampler():
+    global SAMPLER
+    if SAMPLER is None:
+        SAMPLER = StackSampler(settings.PROFILING_INTERVAL)
+    return SAMPLER
+
+
+def start_cprofile():
+    """A running cProfile, or None when another request is being profiled."""
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (a debugger, coverage) already holds the hook
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+
+def stop_cprofile(profiler):
+    profiler.disable()
+    _cprofile_lock.release()
+
+
+def profile_name(view, duration, kind):
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    view = UNSAFE_CHARS_RE.sub("-", view).strip("-")[:80] or "unknown"
+    return (
+        f"{timestamp}_{view}_{int(duration * 1000)}ms"
+        f"_{os.getpid()}_{uuid.uuid4().hex[:8]}.{kind}"
+    )
+
+
+def save_profile(view, duration, kind, write):
+    """
+    Save a profile with ``write(path)`` under a temporary name, then rename
+    it so the listing never sees a partial file, and rotate the directory.
+    """
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = profile_name(view, duration, kind)
+    temporary = directory / f".{name}.tmp"
+    try:
+        write(temporary)
+        os.replace(temporary, directory / name)
+    finally:
+        temporary.unlink(missing_ok=True)
+    rotate()
+    return name
+
+
+def list_profiles():
+    """The saved profiles, newest first, as dicts of their name's parts."""
+    directory = profile_dir()
+    profiles = []
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return profiles
+    for entry in entries:
+        match = PROFILE_NAME_RE.match(entry.name)
+        if match is None:
+            continue
+        try:
+            size = entry.stat().st_size
+        except FileNotFoundError:
+            # Rotated away by another worker
+            continue
+        profiles.append(
+            {
+                "name": entry.name,
+                "time": datetime.strptime(match["time"], "%Y%m%dT%H%M%S").replace(
+                    tzinfo=timezone.utc
+                ),
+                "view": match["view"],
+                "duration_ms": int(match["duration"]),
+                "pid": int(match["pid"]),
+                "kind": match["kind"],
+                "size": size,
+            }
+        )
+    profiles.sort(key=lambda profile: profile["name"], reverse=True)
+    return profiles
+
+
+def rotate():
+    """Delete the oldest profiles beyond PROFILING_MAX_FILES/MAX_BYTES."""
+    profiles = list_profiles()
+    total = sum(profile["size"] for profile in profiles)
+    while profiles and (
+        len(profiles) > settings.PROFILING_MAX_FILES
+        or total > settings.PROFILING_MAX_BYTES
+    ):
+        oldest = profiles.pop()
+        total -= oldest["size"]
+        (profile_dir() / oldest["name"]).unlink(missing_ok=True)
+
+
+def get_profile_path(name):
+    """The path of a saved profile, or None if there is no such profile."""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def record_request(view, duration, stacks, profiler):
+    """Save the cProfile of a sampled request and the stacks of a slow one."""
+    if profiler is not None:
+        save_profile(view, duration, "prof", profiler.dump_stats)
+    if stacks and duration >= settings.PROFILING_SLOW_THRESHOLD:
+        save_profile(
+            view, duration, "folded", lambda path: path.write_text(folded(stacks))
+        )
@@ -0,0 +1,583 @@
+"""
+Synthetic production-scale data, to reproduce performance problems locally.
+
+``generate_scale_data`` fills the database with a deep category tree,
+products with attributes and images, users with addresses, coupons, orders
+with details, wishlists and user events, all with ``bulk_create`` in chunks.
+
+Every chunk draws from its own random generator seeded from the seed, the
+table and the chunk number, so a seed always produces the same rows however
+many workers create them. Popularity is skewed: a few products and users get
+most of the orders, views and wishlists, like in production.
+
+Chunks of the big tables are created in parallel by forked worker processes,
+each on its own database connection. SQLite only allows one writer, so
+there they run in the current process.
+"""
+
+import multiprocessing
+import random
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections
+from django.utils import timezone
+
+from admin_panel.models import Address, Coupon, UserEventTracking
+from order_management.models import (
+    OrderDetail,
+    PaymentGateway,
+    UserOrder,
+    UserWishList,
+)
+from product_management.models import (
+    Category,
+    Product,
+    ProductAttribute,
+    ProductAttributeValue,
+    ProductImage,
+)
+from user_management.models import User
+
+
+PREFIX = "scale"
+PASSWORD = "password"
+PLACEHOLDER_IMAGES = 8
+
+ADJECTIVES = (
+    "Classic Premium Organic Wireless Compact Vintage Smart Portable Deluxe Eco "
+    "Ultra Handmade"
+).split()
+NOUNS = (
+    "Shirt Headphones Backpack Lamp Watch Bottle Sneakers Kettle Jacket Speaker "
+    "Notebook Mug Chair Charger"
+).split()
+ATTRIBUTES = {
+    "Color": ["Red", "Blue", "Green", "Black", "White", "Grey"],
+    "Size": ["XS", "S", "M", "L", "XL"],
+    "Material": ["Cotton", "Steel", "Plastic", "Wood", "Leather"],
+    "Brand": ["Acme", "Globex", "Initech", "Umbrella", "Hooli"],
+}
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sneha", "Arjun"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Khan", "Das", "Mehta"]
+CITIES = [
+    ("Mumbai", "Maharashtra"),
+    ("Pune", "Maharashtra"),
+    ("Bengaluru", "Karnataka"),
+    ("Chennai", "Tamil Nadu"),
+    ("Delhi", "Delhi"),
+    ("Kolkata", "West Bengal"),
+]
+SEARCH_TERMS = ["shoes", "phone", "red shirt", "gift", "lamp", "wireless", "sale"]
+EVENT_TYPES = {
+    "page_view": 50,
+    "product_view": 30,
+    "add_to_cart": 8,
+    "add_to_wishlist": 4,
+    "form_submission": 3,
+    "login": 3,
+    "logout": 2,
+}
+DEVICE_TYPES = {"desktop": 55, "mobile": 40, "tablet": 5}
+
+
+@dataclass
+class ScaleConfig:
+    seed: int = 42
+    users: int = 20_000
+    category_depth: int = 5
+    category_branching: int = 5
+    products: int = 100_000
+    attributes_per_product: int = 3
+    images_per_product: int = 3
+    coupons: int = 500
+    orders: int = 200_000
+    wishlists: int = 100_000
+    events: int = 2_000_000
+    order_days: int = 730
+    event_days: int = 120
+    chunk_size: int = 5_000
+
+
+# Shared with the worker processes, which inherit it when they are forked
+_context = {}
+
+
+def _rng(seed, table, chunk):
+    return random.Random(f"{seed}-{table}-{chunk}")
+
+
+def _generated_index(name):
+    """The index a generated username or product name ends with."""
+    return int(re.search(r"\d+$", name).group())
+
+
+def _skewed(rng, values, skew=2.0):
+    """Pick a value, favouring the start of the list (the popular ones)."""
+    return values[int(len(values) * rng.random() ** skew)]
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _audit(user_id, when):
+    return {
+        "created_by_id": user_id,
+        "updated_by_id": user_id,
+        "created_at": when,
+        "updated_at": when,
+    }
+
+
+@contextmanager
+def _explicit_timestamps():
+    """Keep the generated created_at/updated_at/event_time in bulk_create."""
+    models = (
+        Address,
+        Category,
+        Coupon,
+        OrderDetail,
+        Product,
+        ProductAttribute,
+        ProductAttributeValue,
+        ProductImage,
+        UserEventTracking,
+        UserOrder,
+        UserWishList,
+    )
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _ids_by(model, field, values):
+    """
+    Map ``field`` to id for the rows just bulk created (MySQL does not
+    return the ids of bulk inserted rows).
+    """
+    return dict(
+        model.objects.filter(**{f"{field}__in": values}).values_list(field, "id")
+    )
+
+
+def _chunks(total, chunk_size):
+    return [
+        (number, start, min(start + chunk_size, total))
+        for number, start in enumerate(range(0, total, chunk_size))
+    ]
+
+
+# Chunk builders: each creates rows start..stop-1 of its table.
+
+
+def _create_users(rng, start, stop):
+    now, days = _context["now"], _context["config"].order_days
+    users = [
+        User(
+            username=f"{PREFIX}-user-{index}",
+            email=f"{PREFIX}-user-{index}@example.com",
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            gender=rng.choice(["male", "female", None]),
+            password=_context["password"],
+            date_joined=now - timedelta(days=rng.uniform(0, days)),
+        )
+        for index in range(start, stop)
+    ]
+    User.objects.bulk_create(users)
+    ids = _ids_by(User, "username", [user.username for user in users])
+
+    addresses = []
+    for user in users:
+        city, state = rng.choice(CITIES)
+        addresses.append(
+            Address(
+                user_id=ids[user.username],
+                country="India",
+                state=state,
+                city=city,
+                pincode=str(rng.randint(110000, 855999)),
+                street_address=f"{rng.randint(1, 999)} {rng.choice(LAST_NAMES)} Road",
+                phone_number=f"9{rng.randint(0, 999999999):09d}",
+                **_audit(ids[user.username], user.date_joined),
+            )
+        )
+    Address.objects.bulk_create(addresses)
+    return len(users)
+
+
+def _create_products(rng, start, stop):
+    config, now = _context["config"], _context["now"]
+    audit = _audit(_context["admin_id"], now - timedelta(days=config.order_days))
+    products = [
+        Product(
+            name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {index}",
+            short_description=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS).lower()}",
+            long_description=" ".join(rng.choices(ADJECTIVES + NOUNS, k=60)),
+            price=round(min(rng.lognormvariate(6.5, 1.0), 200000), 2),
+            quantity=rng.randint(0, 500),
+            category_id=rng.choice(_context["leaf_ids"]),
+            is_active=rng.random() < 0.97,
+            view_count=int(rng.paretovariate(1.2)),
+            **audit,
+        )
+        for index in range(start, stop)
+    ]
+    Product.objects.bulk_create(products)
+    ids = _ids_by(Product, "name", [product.name for product in products])
+    product_ids = [ids[product.name] for product in products]
+
+    ProductAttribute.objects.bulk_create(
+        ProductAttribute(name=name, product_id=product_id, **audit)
+        for product_id in product_ids
+        for name in rng.sample(list(ATTRIBUTES), config.attributes_per_product)
+    )
+    ProductAttributeValue.objects.bulk_create(
+        ProductAttributeValue(
+            product_attribute_id=attribute_id, attribute_value=value, **audit
+        )
+        for attribute_id, name in ProductAttribute.objects.filter(
+            product_id__in=product_ids
+        ).values_list("id", "name")
+        for value in rng.sample(ATTRIBUTES[name], rng.randint(1, 3))
+    )
+    ProductImage.objects.bulk_create(
+        ProductImage(
+            image=rng.choice(_context["images"]), product_id=product_id, **audit
+        )
+        for product_id in product_ids
+        for _ in range(config.images_per_product)
+    )
+    return len(products)
+
+
+def _create_orders(rng, start, stop):
+    config, now = _context["config"], _context["now"]
+    user_ids, addresses = _context["user_ids"], _context["addresses"]
+    products, coupons = _context["products"], _context["coupon_ids"]
+
+    orders, order_lines = [], {}
+    for index in range(start, stop):
+        user_id = _skewed(rng, user_ids)
+        created_at = now - timedelta(seconds=rng.uniform(0, config.order_days * 86400))
+        lines = []
+        picked = {_skewed(rng, products) for _ in range(rng.randint(1, 5))}
+        for product_id, price in sorted(picked):
+            quantity = rng.randint(1, 3)
+            lines.append((product_id, quantity, round(price * quantity, 2)))
+        sub_total = sum(amount for _, _, amount in lines)
+        coupon_id = rng.choice(coupons) if coupons and rng.random() < 0.1 else None
+        shipping = 0 if sub_total > 500 else 50
+        paid = rng.choices("SPFC", weights=[90, 4, 4, 2])[0]
+        if now - created_at > timedelta(days=14):
+            status = "D" if paid == "S" else "P"
+        else:
+            status = rng.choice("POSD") if paid == "S" else "P"
+
+        awb_no = f"{PREFIX.upper()}{index:010d}"
+        order_lines[awb_no] = lines
+        orders.append(
+            UserOrder(
+                user_id=user_id,
+                awb_no=awb_no,
+                grand_total=round(sub_total * (0.9 if coupon_id else 1) + shipping, 2),
+                shipping_charges=shipping,
+                shipping_method=rng.choices(["STD", "EXP", "OVN"], [80, 15, 5])[0],
+                coupon_id=coupon_id,
+                payment_status=paid,
+                payment_id=f"pay_{PREFIX}{index}" if paid == "S" else None,
+                transaction_id=f"order_{PREFIX}{index}",
+                payment_gateway_id=_context["gateway_id"],
+                status=status,
+                billing_address_id=addresses.get(user_id),
+                shipping_address_id=addresses.get(user_id),
+                **_audit(user_id, created_at),
+            )
+        )
+    UserOrder.objects.bulk_create(orders)
+    ids = _ids_by(UserOrder, "awb_no", list(order_lines))
+
+    OrderDetail.objects.bulk_create(
+        OrderDetail(
+            order_id=ids[order.awb_no],
+            product_id=product_id,
+            quantity=quantity,
+            amount=amount,
+            **_audit(order.user_id, order.created_at),
+        )
+        for order in orders
+        for product_id, quantity, amount in order_lines[order.awb_no]
+    )
+    return len(orders)
+
+
+def _create_wishlists(rng, start, stop, chunk_count, chunk):
+    config, now = _context["config"], _context["now"]
+    # Each chunk only uses its own slice of users, so pairs are unique overall
+    user_ids = _context["user_ids"][chunk::chunk_count]
+    products = _context["products"]
+    pairs = set()
+    for _ in range(start, stop):
+        for _attempt in range(10):
+            pair = (rng.choice(user_ids), _skewed(rng, products)[0])
+            if pair not in pairs:
+                pairs.add(pair)
+                break
+    UserWishList.objects.bulk_create(
+        UserWishList(
+            user_id=user_id,
+            product_id=product_id,
+            **_audit(
+                user_id,
+                now - timedelta(seconds=rng.uniform(0, config.order_days * 86400)),
+            ),
+        )
+        for user_id, product_id in sorted(pairs)
+    )
+    return len(pairs)
+
+
+def _event(rng, now, days):
+    event_type = _weighted(rng, EVENT_TYPES)
+    object_info, params = None, {}
+    if event_type == "product_view":
+        object_info = str(_skewed(rng, _context["products"])[0])
+        url = f"/product-details/{object_info}/"
+    elif event_type == "add_to_cart":
+        url = "/add-cart/"
+    elif event_type == "add_to_wishlist":
+        url = "/add-wishlist/"
+    elif event_type in ("login", "logout"):
+        url = f"/{event_type}/"
+    elif event_type == "page_view" and rng.random() < 0.3:
+        object_info = rng.choice(SEARCH_TERMS)
+        params = {"search": object_info}
+        url = f"/products/?search={object_info}"
+    else:
+        url = rng.choice(["/", "/products/", "/cart/", "/checkout/", "/contact/"])
+
+    user_id = _skewed(rng, _context["user_ids"]) if rng.random() < 0.6 else None
+    method = "POST" if event_type in ("add_to_cart", "add_to_wishlist") else "GET"
+    return UserEventTracking(
+        user_id=user_id,
+        requested_url=url,
+        event_type=event_type,
+        object_info=object_info,
+        event_time=now - timedelta(seconds=rng.uniform(0, days * 86400)),
+        event_metadata={
+            "path": url.split("?")[0],
+            "method": method,
+            "GET_params": params,
+        },
+        session_id=f"{rng.getrandbits(128):032x}",
+        ip_address=f"{rng.randint(1, 223)}.{rng.randint(0, 255)}."
+        f"{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        device_type=_weighted(rng, DEVICE_TYPES),
+        location=rng.choice(CITIES)[0],
+    )
+
+
+def _create_events(rng, start, stop):
+    now, days = _context["now"], _context["config"].event_days
+    UserEventTracking.objects.bulk_create(
+        _event(rng, now, days) for _ in range(start, stop)
+    )
+    return stop - start
+
+
+BUILDERS = {
+    "users": _create_users,
+    "products": _create_products,
+    "orders": _create_orders,
+    "wishlists": _create_wishlists,
+    "events": _create_events,
+}
+
+
+def _run_chunk(task):
+    table, chunk, start, stop, chunk_count = task
+    rng = _rng(_context["config"].seed, table, chunk)
+    builder = BUILDERS[table]
+    with _explicit_timestamps():
+        if table == "wishlists":
+            return builder(rng, start, stop, chunk_count, chunk)
+        return builder(rng, start, stop)
+
+
+def _run_table(table, total, workers, log):
+    chunks = _chunks(total, _context["config"].chunk_size)
+    tasks = [(table, *chunk, len(chunks)) for chunk in chunks]
+    created = 0
+    if workers > 1 and len(tasks) > 1:
+        # Children must open their own connections, not share the parent's
+        connections.close_all()
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            for count in pool.imap_unordered(_run_chunk, tasks):
+                created += count
+                log(table, created, total)
+    else:
+        for task in tasks:
+            created += _run_chunk(task)
+            log(table, created, total)
+    return created
+
+
+def _placeholder_images(rng):
+    """Save a few placeholder product images and return their names."""
+    from PIL import Image
+
+    names = []
+    for index in range(PLACEHOLDER_IMAGES):
+        name = f"product_images/{PREFIX}/placeholder-{index}.jpg"
+        if not default_storage.exists(name):
+            color = tuple(rng.randint(0, 255) for _ in range(3))
+            buffer = BytesIO()
+            Image.new("RGB", (800, 800), color).save(buffer, "JPEG")
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+    return names
+
+
+def _create_categories(config, admin_id, when):
+    """Create the category tree level by level and return the leaf ids."""
+    audit = _audit(admin_id, when)
+    level = [None]
+    for depth in range(config.category_depth):
+        categories = [
+            Category(
+                name=f"{PREFIX.title()} {depth}-{parent_index}-{index}",
+                description="Generated category",
+                parent_id=parent_id,
+                **audit,
+            )
+            for parent_index, parent_id in enumerate(level)
+            for index in range(config.category_branching)
+        ]
+        Category.objects.bulk_create(categories)
+        names = [category.name for category in categories]
+        ids = _ids_by(Category, "name", names)
+        level = [ids[name] for name in names]
+    return level
+
+
+def _create_coupons(config, admin_id, now, rng):
+    Coupon.objects.bulk_create(
+        Coupon(
+            code=f"S{index:05d}",
+            name=f"Scale coupon {index}",
+            description="Generated coupon",
+            discount=rng.choice([5, 10, 15, 20, 25]),
+            is_active=rng.random() < 0.8,
+            start_date=start,
+            end_date=start + timedelta(days=rng.randint(7, 90)),
+            **_audit(admin_id, start),
+        )
+        for index in range(config.coupons)
+        for start in [now - timedelta(days=rng.uniform(0, config.order_days))]
+    )
+    return list(
+        Coupon.objects.filter(name__startswith="Scale coupon ").values_list(
+            "id", flat=True
+        )
+    )
+
+
+def generate_scale_data(config, workers=1, log=None):
+    """
+    Create the data described by ``config`` and return the number of rows
+    created per table. ``log(table, created, total)`` reports progress.
+    """
+    log = log or (lambda table, created, total: None)
+    if connection.vendor == "sqlite":
+        workers = 1
+
+    now = timezone.now()
+    rng = _rng(config.seed, "reference", 0)
+    admin, _ = User.objects.get_or_create(
+        username=f"{PREFIX}-admin",
+        defaults={
+            "email": f"{PREFIX}-admin@example.com",
+            "is_staff": True,
+            "is_superuser": True,
+            "password": make_password(PASSWORD),
+        },
+    )
+    # The admin panel only lets in users with a group, like the fixture admin
+    admin.groups.add(
+        *Group.objects.filter(name__in=["order_manager", "inventory_manager"])
+    )
+    gateway, _ = PaymentGateway.objects.get_or_create(
+        name="Razorpay", defaults={"created_by": admin, "updated_by": admin}
+    )
+
+    _context.clear()
+    _context.update(
+        config=config,
+        now=now,
+        admin_id=admin.id,
+        gateway_id=gateway.id,
+        # Hashing is slow on purpose; every generated user shares one hash
+        password=make_password(PASSWORD),
+    )
+
+    created = {}
+    with _explicit_timestamps():
+        _context["leaf_ids"] = _create_categories(
+            config, admin.id, now - timedelta(days=config.order_days)
+        )
+        _context["coupon_ids"] = _create_coupons(config, admin.id, now, rng)
+    created["categories"] = sum(
+        config.category_branching**depth
+        for depth in range(1, config.category_depth + 1)
+    )
+    created["coupons"] = len(_context["coupon_ids"])
+    _context["images"] = _placeholder_images(rng)
+
+    created["users"] = _run_table("users", config.users, workers, log)
+    generated_users = User.objects.filter(username__startswith=f"{PREFIX}-user-")
+    # In generation order, not id order: with several workers the ids depend
+    # on which chunk committed first, and _skewed must pick the same rows
+    _context["user_ids"] = [
+        user_id
+        for _, user_id in sorted(
+            (_generated_index(username), user_id)
+            for username, user_id in generated_users.values_list("username", "id")
+        )
+    ]
+    _context["addresses"] = dict(
+        Address.objects.filter(user__in=generated_users).values_list("user_id", "id")
+    )
+
+    created["products"] = _run_table("products", config.products, workers, log)
+    _context["products"] = [
+        product
+        for _, product in sorted(
+            (_generated_index(name), (product_id, price))
+            for name, product_id, price in Product.objects.filter(
+                category_id__in=_context["leaf_ids"], is_active=True
+            ).values_list("name", "id", "price")
+        )
+    ]
+
+    for table in ("orders", "wishlists", "events"):
+        created[table] = _run_table(table, getattr(config, table), workers, log)
+    return created
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from product_management.models import ProductImage
+
+from .coupons import coupon_index
+from .models import Banner, Coupon
+from .permissions import invalidate_all_access, invalidate_user_access
+from .tasks import generate_image_derivatives
+
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_access_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate cached permissions when user groups or permissions change.
+
+    Like the other receivers below, only once the change is committed: a
+    request reading the old permissions before that would cache them again.
+    """
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set:
+        # Changed from the group/permission side
+        user_ids = list(pk_set)
+    else:
+        # A group or permission was cleared of all its users
+        transaction.on_commit(invalidate_all_access)
+        return
+    transaction.on_commit(lambda: invalidate_user_access(*user_ids))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        transaction.on_commit(invalidate_all_access)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def group_or_permission_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_all_access)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupon_changed(sender, **kwargs):
+    """Reload the coupon index in every process once the change is committed."""
+    transaction.on_commit(coupon_index.invalidate)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Banner)
+def image_saved(sender, instance, **kwargs):
+    """Generate resized derivatives in the background when the image changes."""
+    source = (instance.derivatives or {}).get("source")
+    if instance.image and source != instance.image.name:
+        model_label = sender._meta.label_lower
+        transaction.on_commit(
+            lambda: generate_image_derivatives.delay(model_label, instance.pk)
+        )
@@ -0,0 +1,244 @@
+import gzip
+import json
+import os
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import partial
+
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from admin_panel.counters import flush_counters, reconcile_coupon_counts
+from admin_panel.images import generate_derivatives
+from admin_panel.media_gc import collect_media_garbage
+from admin_panel.models import UserEventDailyCounter, UserEventTracking
+from admin_panel.utils import send_order_status_update_emails
+from order_management.models import UserOrder
+
+
+USER_EVENT_ARCHIVE_FIELDS = [
+    "id",
+    "user_id",
+    "requested_url",
+    "event_type",
+    "object_info",
+    "event_time",
+    "event_metadata",
+    "session_id",
+    "ip_address",
+    "device_type",
+    "browser_info",
+    "location",
+]
+
+
+def rollup_user_events(events):
+    """Add the given raw events to the daily counters (per day, event type, device and object)."""
+    counts = Counter(
+        (
+            timezone.localdate(event["event_time"]),
+            event["event_type"],
+            event["device_type"],
+            event["object_info"] or "",
+        )
+        for event in events
+    )
+
+    for (date, event_type, device_type, object_info), count in counts.items():
+        lookup = {
+            "date": date,
+            "event_type": event_type,
+            "device_type": device_type,
+            "object_info": object_info,
+        }
+        updated = UserEventDailyCounter.objects.filter(**lookup).update(
+            count=F("count") + count, updated_at=timezone.now()
+        )
+        if not updated:
+            UserEventDailyCounter.objects.create(count=count, **lookup)
+
+
+def archive_user_events(events, archive_dir):
+    """
+    Write raw events to gzip-compressed JSONL files, one per event day, named
+    after the day and the first event id.
+
+    The files are written under a temporary name and the
+    [(temporary path, path)] pairs are returned, to be moved into place by
+    ``publish_archives`` once the events are deleted, or removed by
+    ``discard_archives`` if they are not.
+    """
+    events_by_day = defaultdict(list)
+    for event in events:
+        events_by_day[timezone.localdate(event["event_time"])].append(event)
+
+    archives = []
+    for day, day_events in events_by_day.items():
+        name = f"user_events_{day:%Y-%m-%d}_{day_events[0]['id']}.jsonl.gz"
+        path = os.path.join(archive_dir, name)
+        temporary = os.path.join(archive_dir, f".{name}.tmp")
+        archives.append((temporary, path))
+        with gzip.open(temporary, "wt", encoding="utf-8") as archive:
+            for event in day_events:
+                archive.write(
+                    json.dumps(event, cls=DjangoJSONEncoder, separators=(",", ":"))
+                    + "\n"
+                )
+    return archives
+
+
+def publish_archives(archives):
+    for temporary, path in archives:
+        os.replace(temporary, path)
+
+
+def _publish(archives, committed):
+    committed.append(True)
+    publish_archives(archives)
+
+
+def discard_archives(archives):
+    for temporary, _ in archives:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+@shared_task
+def compact_user_events(retention_days=None, batch_size=None):
+    """
+    Roll up, archive and delete user events older than the retention window.
+
+    Events are processed oldest first in batches of ``batch_size``. Each batch
+    updates the daily counters and is deleted in a single transaction, and its
+    archive files are only moved into place once that transaction commits, so
+    a failed run can simply be retried without archiving events twice.
+    """
+    retention_days = retention_days or settings.USER_EVENT_RETENTION_DAYS
+    batch_size = batch_size or settings.USER_EVENT_PURGE_BATCH_SIZE
+    archive_dir = settings.USER_EVENT_ARCHIVE_DIR
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # Cut at midnight so a day is always archived as a whole
+    cutoff = timezone.localtime() - timedelta(days=retention_days)
+    cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    total_events = 0
+    while True:
+        archives = []
+        committed = []
+        try:
+            with transaction.atomic():
+                # Ids grow with event_time, so walking the primary key finds
+                # the oldest events without needing an index on event_time
+                events = list(
+                    UserEventTracking.objects.filter(event_time__lt=cutoff)
+                    .order_by("id")
+                    .values(*USER_EVENT_ARCHIVE_FIELDS)[:batch_size]
+                )
+                if not events:
+                    break
+
+                rollup_user_events(events)
+                archives = archive_user_events(events, archive_dir)
+                UserEventTracking.objects.filter(
+                    id__in=[event["id"] for event in events]
+                ).delete()
+                transaction.on_commit(partial(_publish, archives, committed))
+        except Exception:
+            # Rolled back, the events are archived again by the retry. Once
+            # committed, the temporary files are the only copy: keep them.
+            if not committed:
+                discard_archives(archives)
+            raise
+
+        total_events += len(events)
+
+    return total_events
+
+
+@shared_task
+def purge_expired_sessions(batch_size=None):
+    """
+    Delete expired sessions in primary key batches.
+
+    Unlike ``clearsessions`` this never issues one huge DELETE, so the
+    session table is not locked for long while it is being cleaned up.
+    """
+    batch_size = batch_size or settings.SESSION_PURGE_BATCH_SIZE
+    now = timezone.now()
+
+    total_sessions = 0
+    while True:
+        session_keys = list(
+            Session.objects.filter(expire_date__lt=now).values_list(
+                "session_key", flat=True
+            )[:batch_size]
+        )
+        if not session_keys:
+            break
+        deleted, _ = Session.objects.filter(session_key__in=session_keys).delete()
+        total_sessions += deleted
+
+    return total_sessions
+
+
+@shared_task(name="admin_panel.tasks.flush_counters")
+def flush_counters_task():
+    """Apply pending write-behind counter increments."""
+    return flush_counters()
+
+
+@shared_task(name="admin_panel.tasks.reconcile_coupon_counts")
+def reconcile_coupon_counts_task():
+    """Recompute coupon usage counts from orders."""
+    return reconcile_coupon_counts()
+
+
+@shared_task
+def send_order_status_update_emails_task(order_ids):
+    """Send the status update email for a batch of orders."""
+    orders = UserOrder.objects.filter(id__in=order_ids).select_related("user")
+    return send_order_status_update_emails(orders)
+
+
+@shared_task
+def generate_image_derivatives(model_label, pk):
+    """Generate the resized WebP derivatives of a ProductImage or Banner."""
+    instance = apps.get_model(model_label)._base_manager.filter(pk=pk).first()
+    if not instance or not instance.image:
+        return None
+    if (instance.derivatives or {}).get("source") == instance.image.name:
+        return instance.derivatives
+    return generate_derivatives(instance)
+
+
+@shared_task
+def generate_missing_image_derivatives(limit=500):
+    """Queue derivative generation for images that do not have any yet."""
+    queued = 0
+    for model_label in settings.IMAGE_DERIVATIVE_SIZES:
+        model = apps.get_model(model_label)
+        pks = (
+            model._base_manager.filter(deleted_at__isnull=True)
+            .exclude(image="")
+            .exclude(derivatives__has_key="source")
+            .values_list("pk", flat=True)[: limit - queued]
+        )
+        for pk in pks:
+            generate_image_derivatives.delay(model_label, pk)
+            queued += 1
+        if queued >= limit:
+            break
+    return queued
+
+
+@shared_task(name="admin_panel.tasks.collect_media_garbage")
+def collect_media_garbage_task():
+    """Remove deleted and orphaned media files, return the space reclaimed."""
+    return collect_media_garbage()
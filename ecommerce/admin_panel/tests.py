@@ -1,3 +1,854 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from admin_panel import profiling
+from admin_panel.counters import flush_counters, increment, reconcile_coupon_counts
+from admin_panel.media_gc import collect_media_garbage, mark_images_deleted
+from admin_panel.middleware import ProfilingMiddleware
+from admin_panel.models import (
+    Address,
+    CounterDelta,
+    Coupon,
+    UserEventDailyCounter,
+    UserEventTracking,
+)
+from admin_panel.permissions import _cache_key, get_user_access, has_cached_perm
+from admin_panel.tasks import compact_user_events
+from benchmarks.importtime import IMPORT_TIME_BUDGET_MS, measure_import_time
+from ecommerce.db_router import read_from_replica
+from order_management.models import OrderStatusLogs, UserOrder, UserWishList
+from product_management.models import Category, Product, ProductImage
+from user_management.models import User
+
+
+def get_query_plan(queryset):
+    """
+    Run EXPLAIN for the given queryset and return the plan rows as dicts.
+
+    SQLite is asked for "EXPLAIN QUERY PLAN" (rows with a "detail" column),
+    MySQL for the classic tabular EXPLAIN (rows with "table", "type",
+    "possible_keys" and "key" columns).
+    """
+    sql, params = queryset.query.sql_with_params()
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """
+    Guards the hot lookup paths against regressing to full table scans.
+
+    Each test builds the same ORM query the views use and inspects the query
+    plan of the main table. The tables are small here, so on MySQL the test
+    checks that an index is usable for the predicate (``possible_keys``)
+    rather than which one the optimizer picked for a handful of rows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="plan_user", password="x")
+        audit = {"created_by": cls.user, "updated_by": cls.user}
+        cls.category = Category.objects.create(
+            name="Shoes", description="Shoes", **audit
+        )
+        cls.product = Product.objects.create(
+            name="Runner",
+            short_description="Runner",
+            long_description="Runner",
+            price=100,
+            category=cls.category,
+            quantity=10,
+            **audit,
+        )
+        now = timezone.now()
+        Coupon.objects.create(
+            code="SAVE10",
+            name="Save 10",
+            description="Save 10",
+            discount=10,
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=1),
+            **audit,
+        )
+        address = Address.objects.create(
+            user=cls.user,
+            country="India",
+            state="MH",
+            city="Mumbai",
+            pincode="400001",
+            street_address="Street",
+            phone_number="9999999999",
+            **audit,
+        )
+        UserOrder.objects.create(
+            user=cls.user,
+            grand_total=100,
+            billing_address=address,
+            shipping_address=address,
+        )
+        UserWishList.objects.create(user=cls.user, product=cls.product)
+        UserEventTracking.objects.create(
+            user=cls.user,
+            requested_url="/product-details/1",
+            event_type="product_view",
+            object_info=str(cls.product.id),
+            ip_address="127.0.0.1",
+            device_type="desktop",
+        )
+
+    def assertNoFullScan(self, queryset, model):
+        table = model._meta.db_table
+        plan = get_query_plan(queryset)
+        self.assertTrue(plan, "EXPLAIN returned an empty plan")
+
+        for row in plan:
+            if connection.vendor == "sqlite":
+                detail = row["detail"]
+                if detail.split(" ")[:2] == ["SCAN", table]:
+                    self.assertIn(
+                        "INDEX", detail, f"Full scan on {table}: {detail}"
+                    )
+            elif connection.vendor == "mysql":
+                if row.get("table") == table and row.get("type") == "ALL":
+                    self.assertTrue(
+                        row.get("possible_keys"),
+                        f"Full scan on {table} without a usable index: {row}",
+                    )
+
+    def test_recent_product_views_use_index(self):
+        queryset = UserEventTracking.objects.filter(
+            user=self.user, event_type="product_view"
+        ).order_by("-event_time")[:50]
+        self.assertNoFullScan(queryset, UserEventTracking)
+
+    def test_my_orders_use_index(self):
+        queryset = UserOrder.objects.filter(user=self.user).order_by("-created_at")
+        self.assertNoFullScan(queryset, UserOrder)
+
+    def test_track_order_uses_index(self):
+        queryset = UserOrder.objects.filter(awb_no="ORD20240101000000STD")
+        self.assertNoFullScan(queryset, UserOrder)
+
+    def test_apply_coupon_uses_index(self):
+        queryset = Coupon.objects.filter(code="SAVE10", is_active=True)
+        self.assertNoFullScan(queryset, Coupon)
+
+    def test_product_list_uses_index(self):
+        queryset = Product.objects.filter(
+            is_active=True, category=self.category
+        ).order_by("price")
+        self.assertNoFullScan(queryset, Product)
+
+    def test_wishlist_lookup_uses_index(self):
+        queryset = UserWishList.objects.filter(user=self.user, product=self.product)
+        self.assertNoFullScan(queryset, UserWishList)
+
+
+class ImportTimeTests(SimpleTestCase):
+    """
+    Keeps the start-up of the web and Celery workers lean: the heavy
+    integrations are imported on first use, and the start-up imports stay
+    within ``IMPORT_TIME_BUDGET_MS``.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.result = measure_import_time()
+
+    def test_heavy_integrations_are_imported_lazily(self):
+        self.assertEqual(self.result["lazy_imported"], [])
+
+    def test_start_up_imports_within_budget(self):
+        self.assertLess(
+            self.result["total_ms"],
+            IMPORT_TIME_BUDGET_MS,
+            f"Slowest imports: {list(self.result['top_level'].items())[:5]}",
+        )
+
+
+@skipUnless(
+    "replica1" in settings.DATABASES,
+    "Needs a replica, run the tests with --settings=ecommerce.test_settings",
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The tests run with a ``replica1`` database mirroring the test database
+    (see ecommerce.test_settings), so every query can be traced to the
+    connection that ran it.
+    """
+
+    databases = {"default", "replica1"}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="secret")
+        self.audit = {"created_by": self.user, "updated_by": self.user}
+        category = Category.objects.create(
+            name="Phones", description="Phones", **self.audit
+        )
+        Product.objects.create(
+            name="Phone",
+            short_description="Phone",
+            long_description="Phone",
+            price=100,
+            category=category,
+            quantity=10,
+            **self.audit,
+        )
+
+    def assertReadsFrom(self, alias, queries, table):
+        other = "replica1" if alias == "default" else "default"
+        self.assertTrue(any(table in query["sql"] for query in queries[alias]))
+        self.assertFalse(any(table in query["sql"] for query in queries[other]))
+
+    def capture(self):
+        return {
+            alias: CaptureQueriesContext(connections[alias])
+            for alias in ("default", "replica1")
+        }
+
+    def run_captured(self, function):
+        queries = self.capture()
+        with queries["default"], queries["replica1"]:
+            function()
+        return queries
+
+    def test_designated_view_reads_from_replica(self):
+        self.client.force_login(self.user)
+        queries = self.run_captured(lambda: self.client.get("/api/products/"))
+        self.assertReadsFrom("replica1", queries, "product_management_product")
+        # The user is loaded from the primary before switching
+        self.assertReadsFrom("default", queries, "user_management_user")
+
+    def test_other_reads_use_primary(self):
+        queries = self.run_captured(lambda: list(Product.objects.all()))
+        self.assertReadsFrom("default", queries, "product_management_product")
+
+    def test_read_from_replica_block(self):
+        def read():
+            with read_from_replica():
+                list(Product.objects.all())
+
+        queries = self.run_captured(read)
+        self.assertReadsFrom("replica1", queries, "product_management_product")
+
+    def test_reads_in_transaction_use_primary(self):
+        def read():
+            with transaction.atomic(), read_from_replica():
+                list(Product.objects.all())
+
+        queries = self.run_captured(read)
+        self.assertReadsFrom("default", queries, "product_management_product")
+
+    def test_reads_after_write_use_primary(self):
+        def read():
+            with read_from_replica():
+                Category.objects.create(
+                    name="Books", description="Books", **self.audit
+                )
+                list(Product.objects.all())
+
+        queries = self.run_captured(read)
+        self.assertReadsFrom("default", queries, "product_management_product")
+
+    def test_write_pins_browser_to_primary(self):
+        response = self.client.post(
+            "/login/", {"username": "buyer", "password": "secret"}
+        )
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE_NAME]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_STICKY_SECONDS)
+
+        queries = self.run_captured(lambda: self.client.get("/api/products/"))
+        self.assertReadsFrom("default", queries, "product_management_product")
+
+    def test_tracking_writes_do_not_pin(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            "/api/products/", headers={"user-agent": "Mozilla/5.0 (X11; Linux)"}
+        )
+        self.assertTrue(
+            UserEventTracking.objects.exists(), "The request was not tracked"
+        )
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+
+class MediaGarbageCollectionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = os.path.join(directory.name, "media")
+        os.makedirs(os.path.join(self.media_root, "product_images"))
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username="gc_user", password="x")
+        audit = {"created_by": self.user, "updated_by": self.user}
+        category = Category.objects.create(name="Mugs", description="Mugs", **audit)
+        self.product = Product.objects.create(
+            name="Mug",
+            short_description="Mug",
+            long_description="Mug",
+            price=10,
+            category=category,
+            quantity=1,
+            **audit,
+        )
+        self.audit = audit
+
+    def make_file(self, name):
+        path = os.path.join(self.media_root, name)
+        with open(path, "wb") as file:
+            file.write(b"image")
+        return path
+
+    def make_image(self, name, deleted=False):
+        image = ProductImage.objects.create(
+            product=self.product, image=name, **self.audit
+        )
+        if deleted:
+            mark_images_deleted(ProductImage.objects.filter(id=image.id))
+            ProductImage.objects.filter(id=image.id).update(
+                deleted_at=timezone.now() - timedelta(days=30)
+            )
+        return image
+
+    def test_files_used_by_live_rows_are_kept(self):
+        shared = self.make_file("product_images/shared.jpg")
+        own = self.make_file("product_images/own.jpg")
+        live = self.make_image("product_images/shared.jpg")
+        self.make_image("product_images/shared.jpg", deleted=True)
+        self.make_image("product_images/own.jpg", deleted=True)
+
+        summary = collect_media_garbage()
+        self.assertEqual(summary["rows"], 2)
+        self.assertTrue(os.path.exists(shared))
+        self.assertFalse(os.path.exists(own))
+        self.assertEqual(list(ProductImage.objects.all()), [live])
+
+    def test_paths_outside_media_root_are_skipped(self):
+        outside = os.path.join(os.path.dirname(self.media_root), "outside.jpg")
+        with open(outside, "wb") as file:
+            file.write(b"not media")
+        self.make_image(outside, deleted=True)
+        self.make_image("../outside.jpg", deleted=True)
+        own = self.make_file("product_images/own.jpg")
+        self.make_image("product_images/own.jpg", deleted=True)
+
+        with self.assertLogs("admin_panel.media_gc", "WARNING"):
+            summary = collect_media_garbage()
+        self.assertEqual(summary["rows"], 3)
+        self.assertTrue(os.path.exists(outside))
+        self.assertFalse(os.path.exists(own))
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.path.join(tempfile.gettempdir(), "permission-cache-tests"),
+        }
+    }
+)
+class PermissionCacheTests(TestCase):
+    """The permission cache, on a cache shared by the processes."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username="staff", password="x")
+        self.permission = Permission.objects.get(codename="view_product")
+        self.user.user_permissions.add(self.permission)
+
+    def has_perm(self):
+        # A later request, with a fresh user instance
+        user = User.objects.get(id=self.user.id)
+        return has_cached_perm(user, "product_management.view_product")
+
+    def test_access_is_cached(self):
+        self.assertTrue(self.has_perm())
+        with self.assertNumQueries(1):
+            # Only the user is loaded
+            self.assertTrue(self.has_perm())
+
+    def test_revoke_is_seen_after_commit(self):
+        self.assertTrue(self.has_perm())
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.user.user_permissions.remove(self.permission)
+                # A concurrent request, not seeing the change yet, caches
+                # the old permissions
+                stale = get_user_access(User.objects.get(id=self.user.id))
+                stale["permissions"] = {"product_management.view_product"}
+                cache.set(_cache_key(self.user.id), stale)
+        self.assertFalse(self.has_perm())
+
+    def test_group_permission_change_invalidates_everyone(self):
+        group = Group.objects.create(name="catalog")
+        self.user.user_permissions.clear()
+        self.user.groups.add(group)
+        self.assertFalse(self.has_perm())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            group.permissions.add(self.permission)
+        self.assertTrue(self.has_perm())
+
+
+class CompactUserEventsTests(TransactionTestCase):
+    """Rollup, archive and delete of old user events, batch by batch."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive_dir = directory.name
+        override = override_settings(
+            USER_EVENT_ARCHIVE_DIR=self.archive_dir, USER_EVENT_RETENTION_DAYS=90
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.old_day = timezone.localtime() - timedelta(days=100)
+        for days, device_type, object_info in (
+            (0, "mobile", "1"),
+            (0, "mobile", "1"),
+            (0, "desktop", "1"),
+            (1, "mobile", "2"),
+            (1, "mobile", ""),
+        ):
+            self.make_event(
+                self.old_day - timedelta(days=days), device_type, object_info
+            )
+        self.old_ids = sorted(UserEventTracking.objects.values_list("id", flat=True))
+        self.recent = self.make_event(timezone.now(), "mobile", "1")
+
+    def make_event(self, event_time, device_type, object_info):
+        event = UserEventTracking.objects.create(
+            event_type="product_view",
+            device_type=device_type,
+            object_info=object_info,
+            event_metadata={},
+        )
+        UserEventTracking.objects.filter(id=event.id).update(event_time=event_time)
+        return event
+
+    def archived_events(self):
+        events = []
+        for name in sorted(os.listdir(self.archive_dir)):
+            with gzip.open(os.path.join(self.archive_dir, name), "rt") as archive:
+                events.extend(json.loads(line) for line in archive)
+        return events
+
+    def test_old_events_are_rolled_up_archived_and_deleted(self):
+        self.assertEqual(compact_user_events(batch_size=2), 5)
+
+        self.assertEqual(list(UserEventTracking.objects.all()), [self.recent])
+        counters = {
+            (counter.date, counter.device_type, counter.object_info): counter.count
+            for counter in UserEventDailyCounter.objects.all()
+        }
+        day = self.old_day.date()
+        previous_day = day - timedelta(days=1)
+        self.assertEqual(
+            counters,
+            {
+                (day, "mobile", "1"): 2,
+                (day, "desktop", "1"): 1,
+                (previous_day, "mobile", "2"): 1,
+                (previous_day, "mobile", ""): 1,
+            },
+        )
+        self.assertEqual(
+            sorted(event["id"] for event in self.archived_events()), self.old_ids
+        )
+        self.assertFalse(
+            [name for name in os.listdir(self.archive_dir) if name.endswith(".tmp")]
+        )
+
+    def test_rolled_back_batch_is_not_archived(self):
+        with mock.patch(
+            "admin_panel.tasks.rollup_user_events", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                compact_user_events(batch_size=2)
+        self.assertEqual(os.listdir(self.archive_dir), [])
+        self.assertEqual(UserEventTracking.objects.count(), 6)
+
+        # The retry archives every event exactly once
+        compact_user_events(batch_size=2)
+        self.assertEqual(
+            sorted(event["id"] for event in self.archived_events()), self.old_ids
+        )
+
+    def test_archive_of_committed_batch_is_kept_if_publishing_fails(self):
+        with mock.patch("admin_panel.tasks.os.replace", side_effect=OSError):
+            with self.assertRaises(OSError):
+                compact_user_events(batch_size=10)
+        # The events are gone from the table, their temporary file remains
+        self.assertEqual(list(UserEventTracking.objects.all()), [self.recent])
+        self.assertTrue(
+            [name for name in os.listdir(self.archive_dir) if name.endswith(".tmp")]
+        )
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class ProfilingTests(TestCase):
+    """Request profiles: the stack sampler, the saved files and their pages."""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        override = override_settings(PROFILING_DIR=self.profile_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def save(self, view, size=10):
+        return profiling.save_profile(
+            view, 1.5, "folded", lambda path: path.write_bytes(b"x" * size)
+        )
+
+    def test_sampler_records_watched_thread_only(self):
+        sampler = profiling.StackSampler(0.001)
+        other = threading.Thread(target=_spin, args=(0.2,))
+        other.start()
+        sampler.start()
+        _spin(0.1)
+        stacks = sampler.stop()
+        other.join()
+
+        self.assertTrue(stacks)
+        self.assertFalse(sampler.watched)
+        self.assertFalse(sampler.busy.is_set())
+        lines = profiling.folded(stacks).splitlines()
+        self.assertTrue(
+            all(";admin_panel/tests.py:test_sampler" in line for line in lines)
+        )
+        self.assertIn(";admin_panel/tests.py:_spin ", lines[0])
+        self.assertFalse(any("threading.py:run" in line for line in lines))
+
+    def test_record_request_keeps_slow_requests(self):
+        stacks = Counter({profiling._stack(sys._getframe()): 3})
+        with self.settings(PROFILING_SLOW_THRESHOLD=1):
+            profiling.record_request("fast", 0.5, stacks, None)
+            self.assertEqual(profiling.list_profiles(), [])
+
+            profiling.record_request("slow", 1.5, stacks, None)
+        (profile,) = profiling.list_profiles()
+        self.assertEqual(
+            (profile["view"], profile["duration_ms"], profile["kind"]),
+            ("slow", 1500, "folded"),
+        )
+        path = profiling.get_profile_path(profile["name"])
+        self.assertTrue(path.read_text().endswith(" 3\n"))
+
+    def test_rotation(self):
+        with self.settings(PROFILING_MAX_FILES=2):
+            for view in ("a", "b", "c"):
+                self.save(view)
+            self.assertEqual(
+                [profile["view"] for profile in profiling.list_profiles()],
+                ["c", "b"],
+            )
+        with self.settings(PROFILING_MAX_BYTES=25):
+            self.save("d")
+            self.assertEqual(
+                [profile["view"] for profile in profiling.list_profiles()],
+                ["d", "c"],
+            )
+        # Only the final files are listed, never the temporary ones
+        self.assertEqual(len(os.listdir(self.profile_dir)), 2)
+
+    def test_unwritable_directory_does_not_fail_the_request(self):
+        # A file where the directory should be
+        path = os.path.join(self.profile_dir, "profiles")
+        with open(path, "w"):
+            pass
+        with self.settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=path, PROFILING_SAMPLE_RATE=1
+        ):
+            middleware = ProfilingMiddleware(lambda request: HttpResponse("ok"))
+            with self.assertLogs("admin_panel.middleware", "ERROR"):
+                response = middleware(RequestFactory().get("/"))
+        self.assertEqual(response.content, b"ok")
+
+    def test_pages_are_for_superusers_only(self):
+        name = self.save("product_detail")
+        list_url = "/admin-panel/profiles/"
+        download_url = f"/admin-panel/profiles/{name}/download"
+
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 302)
+
+        staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        for url in (list_url, download_url):
+            response = self.client.get(url)
+            self.assertTemplateUsed(response, "admin_panel/404.html")
+            self.assertNotIn("Content-Disposition", response.headers)
+
+        superuser = User.objects.create_superuser(username="admin", password="x")
+        self.client.force_login(superuser)
+        response = self.client.get(list_url)
+        self.assertContains(response, name)
+        response = self.client.get(download_url)
+        self.assertEqual(b"".join(response.streaming_content), b"x" * 10)
+        self.assertIn(name, response.headers["Content-Disposition"])
+
+        for missing in (name.replace(".folded", ".prof"), "settings.py"):
+            response = self.client.get(f"/admin-panel/profiles/{missing}/download")
+            self.assertEqual(response.status_code, 404)
+
+
+@override_settings(BULK_ORDER_STATUS_LIMIT=5, ORDER_STATUS_EMAIL_BATCH_SIZE=3)
+class BulkOrderStatusTests(TestCase):
+    """The bulk status change of the orders list."""
+
+    url = "/admin-panel/bulk-update-order-status/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(username="customer", password="x")
+        cls.admin = User.objects.create_superuser(username="admin", password="x")
+        cls.order_ids = [
+            UserOrder.objects.create(
+                user=cls.customer,
+                created_by=cls.customer,
+                updated_by=cls.customer,
+                status=status,
+            ).id
+            for status in ("P", "P", "O", "S", "P")
+        ]
+        cls.long_ago = timezone.now() - timedelta(days=1)
+        UserOrder.objects.update(updated_at=cls.long_ago)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        patcher = mock.patch("admin_panel.views.send_order_status_update_emails_task")
+        self.email_task = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, status, *order_ids):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                self.url, {"status": status, "order_ids": order_ids}
+            )
+        return response, callbacks
+
+    def test_status_change(self):
+        first, second, third, shipped, fifth = self.order_ids
+        response, callbacks = self.post(
+            "S", f"{first},{second}", str(third), str(shipped), str(fifth)
+        )
+        self.assertEqual(response.json()["updated"], 4)
+
+        changed = [first, second, third, fifth]
+        orders = UserOrder.objects.in_bulk(self.order_ids)
+        for order_id in changed:
+            order = orders[order_id]
+            self.assertEqual((order.status, order.updated_by), ("S", self.admin))
+            self.assertGreater(order.updated_at, self.long_ago)
+        # Already shipped: untouched
+        self.assertEqual(orders[shipped].updated_by, self.customer)
+        self.assertEqual(orders[shipped].updated_at, self.long_ago)
+
+        self.assertQuerySetEqual(
+            OrderStatusLogs.objects.order_by("order_id"),
+            [(order_id, "Shipped") for order_id in changed],
+            transform=lambda log: (log.order_id, log.status),
+        )
+
+        # One email task per batch, once the transaction commits
+        self.assertEqual(len(callbacks), 2)
+        batches = [call.args[0] for call in self.email_task.delay.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+        self.assertEqual(sorted(sum(batches, [])), changed)
+
+    def test_invalid_requests_change_nothing(self):
+        for status, order_ids in (
+            ("X", [str(self.order_ids[0])]),
+            ("S", ["first"]),
+            ("S", []),
+            ("S", [",".join(map(str, range(1, 7)))]),
+        ):
+            response, callbacks = self.post(status, *order_ids)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(callbacks, [])
+
+        self.client.force_login(self.customer)
+        response, _ = self.post("S", str(self.order_ids[0]))
+        self.assertEqual(response.json()["msg"], "Permission Denied")
+
+        self.assertEqual(UserOrder.objects.filter(status="S").count(), 1)
+        self.assertFalse(OrderStatusLogs.objects.exists())
+        self.email_task.delay.assert_not_called()
+
+
+class CounterTests(TestCase):
+    """Write-behind counters: the deltas, their flush and the reconciliation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="x")
+        audit = {"created_by": cls.user, "updated_by": cls.user}
+        now = timezone.now()
+        cls.coupons = [
+            Coupon.objects.create(
+                code=code,
+                name=code,
+                description=code,
+                discount=10,
+                start_date=now - timedelta(days=1),
+                end_date=now + timedelta(days=1),
+                **audit,
+            )
+            for code in ("SAVE10", "SAVE20")
+        ]
+        category = Category.objects.create(name="Mugs", description="Mugs", **audit)
+        cls.product = Product.objects.create(
+            name="Mug",
+            short_description="Mug",
+            long_description="Mug",
+            price=10,
+            category=category,
+            quantity=100,
+            **audit,
+        )
+
+    def counts(self):
+        return [
+            Coupon.objects.get(id=coupon.id).count for coupon in self.coupons
+        ] + [Product.objects.get(id=self.product.id).view_count]
+
+    def test_increments_are_applied_on_flush(self):
+        first, second = self.coupons
+        for _ in range(3):
+            increment(Coupon, "count", first.id)
+        increment(Coupon, "count", second.id, amount=5)
+        increment(Product, "view_count", self.product.id)
+        # Deltas that cancel out update nothing
+        increment(Coupon, "count", second.id, amount=2)
+        increment(Coupon, "count", second.id, amount=-2)
+        self.assertEqual(self.counts(), [0, 0, 0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_counters(), 7)
+        # One UPDATE per counter row
+        self.assertEqual(
+            len([query for query in queries if query["sql"].startswith("UPDATE")]), 3
+        )
+        self.assertEqual(self.counts(), [3, 5, 1])
+        self.assertFalse(CounterDelta.objects.exists())
+
+        self.assertEqual(flush_counters(), 0)
+        self.assertEqual(self.counts(), [3, 5, 1])
+
+    def test_flush_in_batches(self):
+        for coupon in self.coupons * 3:
+            increment(Coupon, "count", coupon.id)
+        self.assertEqual(flush_counters(batch_size=4), 6)
+        self.assertEqual(self.counts(), [3, 3, 0])
+        self.assertFalse(CounterDelta.objects.exists())
+
+    def test_reconcile_coupon_counts(self):
+        first, second = self.coupons
+        for coupon in (first, first, second):
+            UserOrder.objects.create(
+                user=self.user,
+                coupon=coupon,
+                created_by=self.user,
+                updated_by=self.user,
+            )
+        # The first coupon drifted, the second one is right once its pending
+        # increment is flushed
+        Coupon.objects.filter(id=first.id).update(count=7)
+        Coupon.objects.filter(id=second.id).update(count=0)
+        increment(Coupon, "count", second.id)
+
+        self.assertEqual(reconcile_coupon_counts(), 1)
+        self.assertEqual(self.counts()[:2], [2, 0])
+        flush_counters()
+        self.assertEqual(self.counts()[:2], [2, 1])
+        self.assertEqual(reconcile_coupon_counts(), 0)
+
+
+@skipUnless(
+    connection.features.has_select_for_update_skip_locked,
+    "The database cannot skip locked rows",
+)
+class CounterFlushConcurrencyTests(TransactionTestCase):
+    """A flush skips the deltas locked by a concurrent flush."""
+
+    def test_locked_deltas_are_skipped(self):
+        user = User.objects.create_user(username="buyer", password="x")
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code="SAVE10",
+            name="Save 10",
+            description="Save 10",
+            discount=10,
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=1),
+            created_by=user,
+            updated_by=user,
+        )
+        for _ in range(3):
+            increment(Coupon, "count", coupon.id)
+        locked_id = CounterDelta.objects.order_by("id").first().id
+
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    CounterDelta.objects.select_for_update().get(id=locked_id)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual(flush_counters(), 2)
+            coupon.refresh_from_db()
+            self.assertEqual(coupon.count, 2)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(flush_counters(), 1)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.count, 3)
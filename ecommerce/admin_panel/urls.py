@@ -101,6 +101,11 @@ urlpatterns = [
     # orders
     path("orders/", views.list_all_orders, name="all_orders"),
     path("get-orders/", views.get_all_orders, name="get_all_orders"),
+    path(
+        "bulk-update-order-status/",
+        views.bulk_update_order_status,
+        name="bulk_update_order_status",
+    ),
     path(
         "update-order/<int:order_id>/",
         views.update_order,
@@ -139,6 +144,13 @@ urlpatterns = [
         views.export_dynamic_system_reports,
         name="export_dynamic_system_reports",
     ),
+    # Request profiles
+    path("profiles/", views.list_profiles, name="list_profiles"),
+    path(
+        "profiles/<str:name>/download",
+        views.download_profile,
+        name="download_profile",
+    ),
     # News-Letter
     path("news-letters", views.list_all_news_letters, name="list_all_news_letters"),
     path("get-news-letters", views.get_all_news_letters, name="get_all_news_letters"),
@@ -14,11 +14,10 @@ from django.conf import settings
 from django.db.models import Count, F, Sum, Q, Value, ExpressionWrapper, Func
 from django.core.paginator import Paginator
 from django.db.models.functions import Coalesce
-from django.core.mail import send_mail
-
-from weasyprint import HTML
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 
 from admin_panel.models import Coupon, EmailTemplate
+from ecommerce.pdf import html_to_pdf
 from user_management.models import User
 from product_management.models import Product
 
@@ -182,6 +181,40 @@ def send_order_status_update_email(order):
     )
 
 
+def send_order_status_update_emails(orders):
+    """
+    Sends the order status update email for many orders over a single SMTP connection.
+
+    Args:
+        orders (Iterable[UserOrder]): Orders with their user loaded.
+
+    Returns:
+        int: The number of emails sent.
+    """
+
+    template = EmailTemplate.objects.filter(title="Order Status Update").first()
+    compiled_template = Template(template.content)
+    messages = []
+    for order in orders:
+        context = {
+            "customer_name": order.user.get_full_name(),
+            "order_number": order.awb_no,
+            "order_status": order.get_status_display(),
+        }
+        html_content = compiled_template.render(Context(context))
+        message = EmailMultiAlternatives(
+            subject=template.subject,
+            body=strip_tags(html_content),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[order.user.email],
+        )
+        message.attach_alternative(html_content, "text/html")
+        messages.append(message)
+
+    with get_connection() as connection:
+        return connection.send_messages(messages) or 0
+
+
 def send_contact_us_notification_to_admin(contact_us_obj):
     """
     Sends an email notification to the admin when a new 'Contact Us' form is submitted.
@@ -518,7 +551,7 @@ class ReportExtraction:
 
         # Render the PDF template with context
         html_string = render_to_string("admin_panel/report_template.html", context)
-        pdf = HTML(string=html_string).write_pdf()
+        pdf = html_to_pdf(html_string)
 
         response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = (
@@ -1,15 +1,18 @@
 # Standard library imports
 from datetime import datetime
+import hmac
 import json
 
 # Django imports
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.contrib.auth.models import Group
 from django.contrib import messages
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q, Sum, Count
 from django.utils import timezone
 from django.contrib.sites.models import Site
@@ -31,6 +34,11 @@ from admin_panel.utils import (
 
 # Local imports
 from .forms import EmailTemplateForm, BannerForm, UserOrderForm
+from .media_gc import mark_images_deleted
+from .metrics import REGISTRY
+from . import profiling
+from .permissions import get_user_groups
+from ecommerce.db_router import use_replica
 from ecommerce.utils import build_search_query, format_datetime, parse_datetimerange
 from .models import (
     Banner,
@@ -47,8 +55,9 @@ from product_management.models import (
     ProductAttributeValue,
     ProductImage,
 )
-from .decorators import check_user_permission
-from order_management.models import UserOrder
+from .decorators import check_user_permission, superuser_required
+from .tasks import send_order_status_update_emails_task
+from order_management.models import OrderStatusLogs, UserOrder
 from .forms import FlatPageForm
 from ecommerce.utils import paginated_response
 from product_management.models import Product
@@ -149,7 +158,7 @@ def check_groups(request, user):
     groups are available or an exception occurs, an appropriate response is returned.
     """
     try:
-        available_groups = list(user.groups.values_list("name", flat=True))
+        available_groups = get_user_groups(user)
         groups = []
 
         if len(available_groups) <= 0:
@@ -182,7 +191,7 @@ def login_view(request):
             user = auth_user(request)
             if user is not None:
                 login(request, user)
-                available_groups = list(user.groups.values_list("name", flat=True))
+                available_groups = get_user_groups(user)
                 if request.user.is_superuser:
                     return redirect("admin-home")
                 elif "order_manager" in available_groups:
@@ -330,6 +339,7 @@ def format_role(groups):
 
 
 @check_user_permission("user_management.view_user", "api")
+@use_replica
 def get_all_users(request):
     """
     Retrieves and displays a list of users who belong to either the
@@ -532,6 +542,7 @@ def list_all_products(request):
 @check_user_permission(
     permission_codename="product_management.view_product", type="api"
 )
+@use_replica
 def get_all_products(request):
     """
     Retrieves and returns a paginated list of all active products, including
@@ -566,7 +577,9 @@ def get_all_products(request):
                 attributes = ProductAttribute.objects.filter(product=product)
                 attributes_list = []
 
-                product_images = ProductImage.objects.filter(product=product).all()
+                product_images = ProductImage.objects.filter(
+                    product=product, deleted_at__isnull=True
+                )
                 product_images_list = []
                 product_images_list = [
                     i.image.url for i in product_images
@@ -975,19 +988,18 @@ def delete_file_view(request):
     Delete a product image.
 
     This function handles POST requests to delete a specific product image based on the provided
-    image ID. It removes the image file from storage and deletes the database entry for the image.
-    Returns a JSON response indicating success or failure of the deletion process.
+    image ID. The image is marked as deleted and its file is removed later by the media garbage
+    collector. Returns a JSON response indicating success or failure of the deletion process.
     """
     image_id = request.POST.get("image_id")
 
     if not image_id:
         return JsonResponse({"success": False, "error": "Missing image ID"})
 
-    product_image = get_object_or_404(ProductImage, id=image_id)
+    product_image = get_object_or_404(ProductImage, id=image_id, deleted_at__isnull=True)
 
     if product_image.image:
-        product_image.image.delete(save=False)  # Delete the image file from storage
-        product_image.delete()  # Delete the database entry
+        mark_images_deleted(ProductImage.objects.filter(id=product_image.id))
         return JsonResponse({"success": True})
     else:
         return JsonResponse({"success": False, "error": "Image does not exist"})
@@ -1002,8 +1014,9 @@ def delete_all_files_view(request):
     Delete all images associated with a product.
 
     This function handles POST requests to delete all images related to a specific product based
-    on the provided product ID. It removes each image file from storage and deletes the database
-    entries for the images. Returns a JSON response indicating the success of the operation.
+    on the provided product ID. The images are marked as deleted in a single query and their files
+    are removed later by the media garbage collector. Returns a JSON response indicating the
+    success of the operation.
     """
     product_id = request.POST.get("product_id")
 
@@ -1011,14 +1024,7 @@ def delete_all_files_view(request):
         return JsonResponse({"success": False, "error": "Missing product ID"})
 
     product = get_object_or_404(Product, id=product_id)
-    product_images = ProductImage.objects.filter(product=product)
-
-    for product_image in product_images:
-        if product_image.image:
-            product_image.image.delete(
-                save=False
-            )  # Delete each image file from storage
-        product_image.delete()  # Delete each database entry
+    mark_images_deleted(ProductImage.objects.filter(product=product))
 
     return JsonResponse({"success": True})
 
@@ -1040,7 +1046,7 @@ def update_product(request, id):
             return JsonResponse({"status": "error", "msg": "Product ID is required."})
 
         product = get_object_or_404(Product, id=id)
-        images = product.product_images.all()
+        images = product.product_images.filter(deleted_at__isnull=True)
 
         if request.method == "POST":
             # Get product details from POST request
@@ -1501,6 +1507,7 @@ def list_all_coupons(request):
 
 
 @check_user_permission(permission_codename="admin_panel.view_coupon", type="view")
+@use_replica
 def get_all_coupons(request):
     """
     Fetches and returns a paginated list of active coupons in JSON format. Coupons are ordered by ID.
@@ -1737,6 +1744,7 @@ def list_all_email_templates(request):
 
 
 @check_user_permission(permission_codename="admin_panel.view_emailtemplate", type="api")
+@use_replica
 def get_all_email_templates(request):
     """
     Fetches and returns a paginated list of email templates in JSON format. Templates are ordered by ID.
@@ -1873,6 +1881,7 @@ def list_all_banners(request):
 
 
 @check_user_permission(permission_codename="admin_panel.view_banner", type="api")
+@use_replica
 def get_all_banners(request):
     """
     Fetches all active banners from the database and returns them in a paginated JSON response.
@@ -2038,6 +2047,7 @@ def flatpage_list(request):
 
 
 @check_user_permission(permission_codename="flatpages.view_flatpage", type="api")
+@use_replica
 def get_all_flatpage(request):
     """
     Fetches all flatpages from the database and returns them in a paginated JSON response.
@@ -2118,7 +2128,11 @@ def list_all_orders(request):
     """
 
     try:
-        return render(request, "admin_panel/orders.html")
+        return render(
+            request,
+            "admin_panel/orders.html",
+            {"status_choices": UserOrder.STATUS_CHOICES},
+        )
     except Exception as e:
         return HttpResponse(str(e))
 
@@ -2126,6 +2140,7 @@ def list_all_orders(request):
 @check_user_permission(
     permission_codename="order_management.view_userorder", type="api"
 )
+@use_replica
 def get_all_orders(request):
     """
     Fetches all orders from the database based on the search query and returns them in a paginated JSON response.
@@ -2213,6 +2228,79 @@ def update_order(request, order_id):
     )
 
 
+@require_POST
+@check_user_permission(
+    permission_codename="order_management.change_userorder", type="api"
+)
+def bulk_update_order_status(request):
+    """
+    Changes the status of many orders at once.
+
+    Expects ``order_ids`` (repeated or comma separated) and ``status`` in the POST data.
+    The orders are updated with a single UPDATE, their status logs are bulk created and
+    the customer emails are queued in batches once the transaction commits.
+    """
+
+    status = request.POST.get("status")
+    if status not in dict(UserOrder.STATUS_CHOICES):
+        return JsonResponse({"status": "error", "msg": "Invalid status"}, status=400)
+
+    try:
+        order_ids = {
+            int(order_id)
+            for value in request.POST.getlist("order_ids")
+            for order_id in value.split(",")
+            if order_id.strip()
+        }
+    except ValueError:
+        return JsonResponse({"status": "error", "msg": "Invalid order ids"}, status=400)
+
+    if not order_ids:
+        return JsonResponse({"status": "error", "msg": "No orders selected"}, status=400)
+    if len(order_ids) > settings.BULK_ORDER_STATUS_LIMIT:
+        return JsonResponse(
+            {
+                "status": "error",
+                "msg": f"You can update at most {settings.BULK_ORDER_STATUS_LIMIT} orders at once",
+            },
+            status=400,
+        )
+
+    with transaction.atomic():
+        # Lock the orders and skip the ones already in the requested status
+        changed_ids = list(
+            UserOrder.objects.select_for_update()
+            .filter(id__in=order_ids)
+            .exclude(status=status)
+            .values_list("id", flat=True)
+        )
+        UserOrder.objects.filter(id__in=changed_ids).update(
+            status=status, updated_by=request.user, updated_at=timezone.now()
+        )
+        status_display = dict(UserOrder.STATUS_CHOICES)[status]
+        OrderStatusLogs.objects.bulk_create(
+            [
+                OrderStatusLogs(order_id=order_id, status=status_display)
+                for order_id in changed_ids
+            ]
+        )
+
+        batch_size = settings.ORDER_STATUS_EMAIL_BATCH_SIZE
+        for start in range(0, len(changed_ids), batch_size):
+            batch = changed_ids[start : start + batch_size]
+            transaction.on_commit(
+                lambda batch=batch: send_order_status_update_emails_task.delay(batch)
+            )
+
+    return JsonResponse(
+        {
+            "status": "success",
+            "msg": f"{len(changed_ids)} order(s) marked {status_display}",
+            "updated": len(changed_ids),
+        }
+    )
+
+
 # ----------------------------------------/Orders---------------------------------------------
 
 
@@ -2230,6 +2318,7 @@ def list_all_contact_us(request):
 
 
 @check_user_permission("user_management.view_contactus", "api")
+@use_replica
 def get_all_contact_us_queries(request):
     """
     Fetches all contact us queries from the database and returns them in a paginated JSON response.
@@ -2317,6 +2406,7 @@ def delete_contact_us_query(request):
 
 # ----------------------------------------Reports---------------------------------------------
 @check_user_permission("user_management.view_user", "view")
+@use_replica
 def report(request):
     try:
         STATUS_CHOICES = {
@@ -2361,6 +2451,7 @@ def report(request):
 
 
 @check_user_permission("user_management.view_user", "view")
+@use_replica
 def dynamic_system_reports(request, report_name):
     try:
         report_name_for_template = {
@@ -2389,6 +2480,7 @@ def dynamic_system_reports(request, report_name):
 
 
 @check_user_permission("user_management.view_user", "view")
+@use_replica
 def export_dynamic_system_reports(request, report_name):
     try:
         report_name_dict = {
@@ -2413,6 +2505,33 @@ def export_dynamic_system_reports(request, report_name):
 # ----------------------------------------/Reports---------------------------------------------
 
 
+# ----------------------------------------Request Profiles---------------------------------------------
+@superuser_required
+def list_profiles(request):
+    """The request profiles saved by this host, newest first."""
+    return render(
+        request,
+        "admin_panel/profiles.html",
+        {
+            "profiles": profiling.list_profiles(),
+            "profiling_enabled": settings.PROFILING_ENABLED,
+            "sample_rate": settings.PROFILING_SAMPLE_RATE,
+            "slow_threshold": settings.PROFILING_SLOW_THRESHOLD,
+        },
+    )
+
+
+@superuser_required
+def download_profile(request, name):
+    path = profiling.get_profile_path(name)
+    if path is None:
+        raise Http404("No such profile")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
+
+
+# ----------------------------------------/Request Profiles---------------------------------------------
+
+
 # ----------------------------------------News-Letter---------------------------------------------
 @check_user_permission("user_management.view_user", "view")
 def list_all_news_letters(request):
@@ -2423,6 +2542,7 @@ def list_all_news_letters(request):
 
 
 @check_user_permission("user_management.view_user", "view")
+@use_replica
 def get_all_news_letters(request):
     try:
         # Server-side processing for DataTables
@@ -2454,3 +2574,22 @@ def get_all_news_letters(request):
 
 
 # ----------------------------------------/News-Letter---------------------------------------------
+
+
+def metrics(request):
+    """
+    Per-view request, query and database time metrics of all the web
+    processes (of this one alone without a shared cache), in the
+    Prometheus text format.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+        )
+    else:
+        allowed = request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+    if not allowed:
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(
+        REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
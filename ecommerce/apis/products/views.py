@@ -1,4 +1,6 @@
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, filters
+from ecommerce.db_router import use_replica
 from product_management.models import Product
 from .serializers import ProductSerializer, ProductListSerializer
 from django_filters.rest_framework import DjangoFilterBackend
@@ -26,3 +28,12 @@ class ProductViewSet(viewsets.ModelViewSet):
         if self.action == "list":
             return ProductListSerializer
         return super().get_serializer_class()
+
+    # Catalog reads are served by the replicas
+    @method_decorator(use_replica)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(use_replica)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,9 @@
+"""
+Micro-benchmarks of the cart, pricing, category, pagination, serialization,
+event tracking and reporting hot paths.
+
+Run them with ``manage.py run_benchmarks``: a throwaway test database is
+created, filled with deterministic data at each size, and the wall time,
+query count and peak memory of every case are compared with
+``benchmarks/baseline.json``.
+"""
@@ -0,0 +1,126 @@
+"""
+Benchmark cases.
+
+Each case is registered with ``@benchmark(name)`` and receives the Dataset.
+It does its setup and returns the function to measure; only that function
+is timed. The runner rolls back whatever the function writes after every
+call, so each repetition sees the same data.
+"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from admin_panel.middleware import UserEventTrackingMiddleware
+from admin_panel.utils import ReportExtraction
+from admin_panel.views import fetch_sub_cat
+from apis.products.serializers import ProductListSerializer
+from ecommerce.utils import paginated_response
+from order_management.utils import calculate_sub_total_amount, create_user_order
+from product_management.models import Product
+
+
+BENCHMARKS = {}
+
+CART_SIZE = 20
+
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+)
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def _cart(data):
+    return {product_id: 2 for product_id in data.product_ids[:CART_SIZE]}
+
+
+@benchmark("cart.calculate_sub_total_amount")
+def calculate_sub_total(data):
+    cart = _cart(data)
+    return lambda: calculate_sub_total_amount(cart, 0)
+
+
+@benchmark("order.create_user_order")
+def create_order(data):
+    cart = _cart(data)
+    return lambda: create_user_order(
+        user=data.admin,
+        cart=cart,
+        billing_address_id=data.address_id,
+        shipping_address_id=data.address_id,
+        payment_gateway=data.payment_gateway,
+        applied_coupon={"code": data.coupon.code, "discount_percent": 10},
+    )
+
+
+@benchmark("category.fetch_sub_cat")
+def category_tree(data):
+    return lambda: fetch_sub_cat(data.root_category)
+
+
+@benchmark("pagination.paginated_response")
+def pagination(data):
+    request = RequestFactory().get(
+        "/admin-panel/get-all-products/", {"draw": 1, "start": 20, "length": 10}
+    )
+    return lambda: paginated_response(request, Product.objects.order_by("-id"))
+
+
+@benchmark("api.ProductListSerializer")
+def product_list_serializer(data):
+    # One page of the product API, as PageNumberPagination would slice it
+    def serialize():
+        products = Product.objects.filter(is_active=True).order_by("id")[:100]
+        return ProductListSerializer(products, many=True).data
+
+    return serialize
+
+
+@benchmark("middleware.UserEventTrackingMiddleware")
+def event_tracking(data):
+    factory = RequestFactory()
+    middleware = UserEventTrackingMiddleware(lambda request: HttpResponse("ok"))
+    session_middleware = SessionMiddleware(lambda request: None)
+    product_id = data.product_ids[0]
+
+    def track():
+        request = factory.get(
+            f"/product/{product_id}/", HTTP_USER_AGENT=BROWSER_USER_AGENT
+        )
+        session_middleware.process_request(request)
+        request.user = AnonymousUser()
+        return middleware(request)
+
+    return track
+
+
+def _report(report_name, paginate):
+    def setup(data):
+        request = RequestFactory().get(
+            "/admin-panel/reports/",
+            {"start_date": "2000-01-01", "end_date": "2100-01-01"},
+        )
+
+        def run():
+            context = ReportExtraction(request, report_name).get_context_data(paginate)
+            # Evaluate the page (or the whole report) like the template would
+            rows = context["page_obj"]
+            return [getattr(row, "id", row) for row in rows]
+
+        return run
+
+    return setup
+
+
+for _name in ("sales-report", "user-report", "coupon-report"):
+    benchmark(f"report.{_name}")(_report(_name, paginate=True))
+benchmark("report.sales-report.export")(_report("sales-report", paginate=False))
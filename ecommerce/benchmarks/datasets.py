@@ -0,0 +1,194 @@
+"""
+Deterministic datasets for the benchmarks, at a few sizes.
+
+Everything is created with ``bulk_create`` from a seeded random generator,
+so two runs at the same size benchmark the same data.
+"""
+
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.utils import timezone
+
+from admin_panel.models import Address, Coupon, EmailTemplate, UserEventTracking
+from order_management.models import OrderDetail, PaymentGateway, UserOrder
+from product_management.models import (
+    Category,
+    Product,
+    ProductAttribute,
+    ProductAttributeValue,
+)
+from user_management.models import User
+
+
+# Number of products per size; the other tables are scaled from it
+SIZES = {
+    "small": 100,
+    "medium": 1000,
+    "large": 10000,
+}
+
+EMAIL_TEMPLATES = ["Order Confirmation", "Admin Order Notification"]
+
+
+@dataclass
+class Dataset:
+    size: str
+    admin: User = None
+    user_ids: list = field(default_factory=list)
+    root_category: Category = None
+    product_ids: list = field(default_factory=list)
+    address_id: int = None
+    payment_gateway: PaymentGateway = None
+    coupon: Coupon = None
+
+
+def _category_tree(admin, depth, branching):
+    """Create a category tree and return its root."""
+    root = Category.objects.create(
+        name="Benchmark",
+        description="Benchmark root",
+        created_by=admin,
+        updated_by=admin,
+    )
+    level = [root]
+    for depth_index in range(depth):
+        Category.objects.bulk_create(
+            Category(
+                name=f"Category {depth_index}-{parent.id}-{index}",
+                description="",
+                parent=parent,
+                created_by=admin,
+                updated_by=admin,
+            )
+            for parent in level
+            for index in range(branching)
+        )
+        # Re-read the level, bulk_create does not return ids on MySQL
+        level = list(Category.objects.filter(parent__in=level))
+    return root
+
+
+def build_dataset(size, seed=42):
+    """Create the benchmark data of the given size and return a Dataset."""
+    product_count = SIZES[size]
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    data = Dataset(size=size)
+    admin = data.admin = User.objects.create_superuser(
+        username="benchmark-admin", email="admin@example.com", password="benchmark"
+    )
+    audit = {"created_by": admin, "updated_by": admin}
+
+    User.objects.bulk_create(
+        User(username=f"benchmark-user-{index}", email=f"user{index}@example.com")
+        for index in range(max(10, product_count // 10))
+    )
+    data.user_ids = list(
+        User.objects.exclude(id=admin.id).order_by("id").values_list("id", flat=True)
+    )
+
+    data.root_category = _category_tree(admin, depth=3, branching=4)
+    leaves = list(
+        Category.objects.filter(children__isnull=True).values_list("id", flat=True)
+    )
+
+    Product.objects.bulk_create(
+        Product(
+            name=f"Product {index}",
+            short_description=f"Short description {index}",
+            long_description="Long description " * 10,
+            price=round(rng.uniform(1, 500), 2),
+            quantity=rng.randint(0, 100),
+            category_id=rng.choice(leaves),
+            **audit,
+        )
+        for index in range(product_count)
+    )
+    data.product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+
+    ProductAttribute.objects.bulk_create(
+        ProductAttribute(name=name, product_id=product_id, **audit)
+        for product_id in data.product_ids
+        for name in ("Color", "Size")
+    )
+    ProductAttributeValue.objects.bulk_create(
+        ProductAttributeValue(
+            product_attribute_id=attribute_id, attribute_value=value, **audit
+        )
+        for attribute_id in ProductAttribute.objects.values_list("id", flat=True)
+        for value in rng.sample(["Red", "Blue", "Green", "S", "M", "L"], 2)
+    )
+
+    address = Address.objects.create(
+        user=admin,
+        country="India",
+        state="Maharashtra",
+        city="Mumbai",
+        pincode="400001",
+        street_address="1 Benchmark Street",
+        phone_number="9999999999",
+        **audit,
+    )
+    data.address_id = address.id
+    data.payment_gateway = PaymentGateway.objects.create(name="Razorpay", **audit)
+    data.coupon = Coupon.objects.create(
+        code="BENCH10",
+        name="Benchmark",
+        description="",
+        discount=10,
+        start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+        **audit,
+    )
+    EmailTemplate.objects.bulk_create(
+        EmailTemplate(
+            title=title,
+            subject=title,
+            content="{{ order_number }}"
+            "{% for product in products %} {{ product.name }}{% endfor %}",
+            **audit,
+        )
+        for title in EMAIL_TEMPLATES
+    )
+
+    UserOrder.objects.bulk_create(
+        UserOrder(
+            user_id=rng.choice(data.user_ids),
+            grand_total=rng.randint(100, 5000),
+            awb_no=f"ORDBENCH{index}",
+            status=rng.choice("POSD"),
+            payment_gateway=data.payment_gateway,
+            coupon=data.coupon if index % 5 == 0 else None,
+            created_by=admin,
+            updated_by=admin,
+        )
+        for index in range(product_count // 2)
+    )
+    order_ids = list(UserOrder.objects.order_by("id").values_list("id", flat=True))
+    OrderDetail.objects.bulk_create(
+        OrderDetail(
+            order_id=order_id,
+            product_id=product_id,
+            quantity=rng.randint(1, 3),
+            amount=rng.uniform(1, 500),
+            **audit,
+        )
+        for order_id in order_ids
+        for product_id in rng.sample(data.product_ids, 3)
+    )
+
+    UserEventTracking.objects.bulk_create(
+        UserEventTracking(
+            user_id=rng.choice(data.user_ids),
+            requested_url=f"/product/{product_id}/",
+            event_type="product_view",
+            object_info=str(product_id),
+            ip_address="127.0.0.1",
+            device_type="Desktop",
+        )
+        for product_id in rng.choices(data.product_ids, k=product_count * 5)
+    )
+    return data
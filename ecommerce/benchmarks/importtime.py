@@ -0,0 +1,96 @@
+"""
+Start-up import time of the web and Celery workers.
+
+A fresh interpreter runs ``python -X importtime`` over what a worker loads
+before its first request or task: the WSGI application, every view
+(through the URLconf) and the task modules. The cumulative times of the
+top-level imports add up to the import time of the start-up; the child
+also reports its peak RSS.
+
+The heavy integrations in ``LAZY_MODULES`` are only imported where they are
+used (``ecommerce.pdf``, ``order_management.payments``,
+``user_management.google_auth``); one of them showing up here means a
+module-level import crept back in.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+
+
+# Imported on first use only, never at start-up
+LAZY_MODULES = ("weasyprint", "razorpay", "google.oauth2", "google.auth")
+
+# Generous: about twice the import time of a start-up on a laptop
+IMPORT_TIME_BUDGET_MS = 2000
+
+BOOT_CODE = """
+import json, resource, sys
+import ecommerce.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+import admin_panel.tasks, order_management.tasks, product_management.tasks
+sys.stdout.write(json.dumps(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+"""
+
+IMPORT_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def parse_importtime(output):
+    """[(module, self us, cumulative us, depth)] from ``-X importtime`` output."""
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_LINE_RE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append((module, int(own), int(cumulative), len(indent) // 2))
+    return imports
+
+
+def measure_import_time(settings_module=None):
+    """
+    Import the start-up modules in a fresh interpreter and return
+    {"total_ms", "rss_mb", "top_level": {module: ms}, "lazy_imported": [...]}.
+    """
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE=settings_module or settings.SETTINGS_MODULE,
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT_CODE],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        raise RuntimeError(f"Start-up failed:\n{process.stderr[-2000:]}")
+
+    imports = parse_importtime(process.stderr)
+    top_level = {
+        module: cumulative / 1000
+        for module, _, cumulative, depth in imports
+        if depth == 0
+    }
+    lazy_imported = [
+        lazy
+        for lazy in LAZY_MODULES
+        if any(
+            module == lazy or module.startswith(f"{lazy}.")
+            for module, _, _, _ in imports
+        )
+    ]
+    # ru_maxrss is in KB on Linux, in bytes on macOS
+    max_rss = int(process.stdout.split()[-1])
+    rss_unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "total_ms": round(sum(top_level.values()), 1),
+        "rss_mb": round(max_rss / rss_unit, 1),
+        "top_level": dict(
+            sorted(top_level.items(), key=lambda item: item[1], reverse=True)
+        ),
+        "lazy_imported": lazy_imported,
+    }
@@ -0,0 +1,158 @@
+"""
+Run benchmark cases and compare them with a baseline.
+
+Every case is called once with ``tracemalloc`` on to record its peak memory
+and query count, then ``repeat`` more times for the timings. Each call runs
+in a transaction that is rolled back, so writes do not accumulate.
+
+Results (and the baseline file) look like:
+
+    {"sqlite": {"small": {"cart.calculate_sub_total_amount":
+        {"median_ms": 1.2, "min_ms": 1.1, "queries": 20, "peak_kb": 35.0}}}}
+"""
+
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .cases import BENCHMARKS
+from .datasets import build_dataset
+
+
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DIFF_MS = 5.0
+MIN_MEMORY_DIFF_KB = 64.0
+
+
+class Rollback(Exception):
+    pass
+
+
+def _call(func, queries=None):
+    """Call ``func`` in a rolled back transaction, recording its queries."""
+    try:
+        with transaction.atomic():
+            if queries is None:
+                func()
+            else:
+                with CaptureQueriesContext(connection) as captured:
+                    func()
+                queries.extend(captured.captured_queries)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def measure(func, repeat=5):
+    """Return the timings, query count and peak memory of calling ``func``."""
+    cache.clear()
+    gc.collect()
+    # The query log is capped; once full, captured slices come back empty
+    reset_queries()
+    queries = []
+    tracemalloc.start()
+    try:
+        _call(func, queries)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _call(func)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "queries": len(queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(sizes, repeat=5, only=None, report=None):
+    """
+    Build the dataset of each size and run the cases on it. Datasets are
+    rolled back afterwards. Returns {vendor: {size: {case: result}}}.
+    """
+    results = {}
+    for size in sizes:
+        size_results = results.setdefault(size, {})
+        try:
+            with transaction.atomic():
+                data = build_dataset(size)
+                for name, setup in BENCHMARKS.items():
+                    if only and only not in name:
+                        continue
+                    size_results[name] = measure(setup(data), repeat=repeat)
+                    if report:
+                        report(size, name, size_results[name])
+                raise Rollback
+        except Rollback:
+            pass
+    return {connection.vendor: results}
+
+
+def load_baseline(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    """Merge the results into the baseline file."""
+    baseline = load_baseline(path)
+    for vendor, sizes in results.items():
+        for size, cases in sizes.items():
+            baseline.setdefault(vendor, {}).setdefault(size, {}).update(cases)
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def compare(results, baseline, threshold=2.0):
+    """
+    Return a list of regression messages. More queries than the baseline is
+    always a regression; time and memory regress when they exceed the
+    baseline by ``threshold`` times and by more than the noise floor.
+    """
+    regressions = []
+    for vendor, sizes in results.items():
+        for size, cases in sizes.items():
+            for name, result in cases.items():
+                base = baseline.get(vendor, {}).get(size, {}).get(name)
+                if not base:
+                    continue
+                label = f"{vendor}/{size}/{name}"
+                if result["queries"] > base["queries"]:
+                    regressions.append(
+                        f"{label}: {result['queries']} queries "
+                        f"(baseline {base['queries']})"
+                    )
+                # The fastest run is the least disturbed by the machine's load
+                if (
+                    result["min_ms"] > base["min_ms"] * threshold
+                    and result["min_ms"] - base["min_ms"] > MIN_TIME_DIFF_MS
+                ):
+                    regressions.append(
+                        f"{label}: {result['min_ms']} ms "
+                        f"(baseline {base['min_ms']} ms)"
+                    )
+                if (
+                    result["peak_kb"] > base["peak_kb"] * threshold
+                    and result["peak_kb"] - base["peak_kb"] > MIN_MEMORY_DIFF_KB
+                ):
+                    regressions.append(
+                        f"{label}: {result['peak_kb']} KB peak "
+                        f"(baseline {base['peak_kb']} KB)"
+                    )
+    return regressions
@@ -0,0 +1,43 @@
+"""
+Helpers for the async views.
+
+Django 4.2 has no async API for the user and session of a request: both are
+loaded from the database the first time they are read, which is not allowed
+on the event loop. ``aload_user_and_session`` reads them once in a worker
+thread; the view can then use ``request.user`` and ``request.session`` as
+usual, and SessionMiddleware saves the session changes.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import resolve_url
+
+
+def _load_user_and_session(request):
+    # Reading them evaluates the lazy user and loads the session data
+    _ = request.user.is_authenticated
+    request.session.keys()
+
+
+async def aload_user_and_session(request):
+    await sync_to_async(_load_user_and_session)(request)
+
+
+def alogin_required(login_url):
+    """login_required for async views, Django 4.2's only wraps sync views."""
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            await aload_user_and_session(request)
+            if not request.user.is_authenticated:
+                return redirect_to_login(
+                    request.get_full_path(), resolve_url(login_url)
+                )
+            return await view(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
@@ -0,0 +1,20 @@
+"""
+Whether the default cache is shared by all the processes.
+
+The permission cache, the coupon index and the ``/metrics`` aggregation rely
+on the cache to tell the other workers about a change. With the per-process
+memory cache used when ``CACHE_URL`` is unset, a worker would never hear of
+it, so they fall back to the database or to their own process instead.
+"""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+# Backends whose entries no other process can see
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def cache_is_shared():
+    return not isinstance(caches["default"], PROCESS_LOCAL_BACKENDS)
@@ -16,4 +16,4 @@ app = Celery("ecommerce")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # Load task modules from all registered Django app configs.
-app.autodiscover_tasks(["order_management"])
+app.autodiscover_tasks(["order_management", "admin_panel", "product_management"])
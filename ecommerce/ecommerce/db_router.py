@@ -0,0 +1,146 @@
+"""
+Read replica routing.
+
+Writes, and reads by default, go to the primary (``default``). Read-only
+paths designated with ``use_replica`` (views) or ``read_from_replica``
+(blocks and functions), such as the reports, the admin DataTables
+endpoints, the catalog API and the recommendations, read from one of the
+``DATABASE_REPLICA_ALIASES``, picked once per request or block. They still
+read from the primary:
+
+* inside a transaction on the primary, which the replica cannot see;
+* after a write in the same request or block;
+* for a browser that wrote less than ``REPLICA_STICKY_SECONDS`` ago, so
+  users see their own orders and changes while the replicas catch up.
+  ``ReplicaRoutingMiddleware`` sets a short-lived cookie on the responses
+  of requests that wrote, and pins the requests carrying it.
+
+The routing state lives in a context variable, which asgiref copies into
+the worker threads of async views, so it covers both kinds of views.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        # Reads of the request stay on the primary
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = False
+        self.alias = None
+
+    def read_alias(self):
+        if not self.replica or self.pinned or self.wrote:
+            return DEFAULT_DB_ALIAS
+        if self.alias is None:
+            replicas = settings.DATABASE_REPLICA_ALIASES
+            self.alias = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        return self.alias
+
+
+_state = ContextVar("db_routing_state", default=None)
+
+
+@contextmanager
+def request_routing(request):
+    """The routing state of a request, pinned if the browser wrote recently."""
+    state = RoutingState(pinned=settings.REPLICA_PIN_COOKIE_NAME in request.COOKIES)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def pin_to_primary(state, response):
+    """Pin the next requests of the browser to the primary if this one wrote."""
+    if state.wrote:
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE_NAME,
+            "1",
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+@contextmanager
+def read_from_replica():
+    """Send the reads of the block to a replica, see the module docstring."""
+    state = _state.get()
+    token = None
+    if state is None:
+        # Outside a request, e.g. in a Celery task
+        state = RoutingState()
+        token = _state.set(state)
+    previous, state.replica = state.replica, True
+    try:
+        yield
+    finally:
+        state.replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def use_replica(view):
+    """
+    Run the queries of a read-only view on a replica. The user and session
+    are loaded from the primary first: a login may not have reached the
+    replica yet.
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            await sync_to_async(_load_user)(request)
+            with read_from_replica():
+                return await view(request, *args, **kwargs)
+
+    else:
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            _load_user(request)
+            with read_from_replica():
+                return view(request, *args, **kwargs)
+
+    return inner
+
+
+def _load_user(request):
+    # Reading it evaluates the lazy user, so the view never queries it
+    _ = request.user.is_authenticated
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if (
+            state is not None
+            and model._meta.label_lower not in settings.REPLICA_PIN_IGNORED_MODELS
+        ):
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,15 @@
+"""
+PDF rendering.
+
+WeasyPrint loads Pango, Cairo, fontTools and their bindings, a large share
+of a worker's start-up time and memory, while only the order invoice and
+report exports use it. It is imported on the first render instead of with
+the views.
+"""
+
+
+def html_to_pdf(html):
+    """Render an HTML document to PDF and return the bytes."""
+    from weasyprint import HTML
+
+    return HTML(string=html).write_pdf()
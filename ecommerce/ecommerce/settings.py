@@ -48,9 +48,7 @@ INSTALLED_APPS = [
     "django.contrib.flatpages",
     # Third-party apps
     "background_task",
-    "django_weasyprint",
     "django_celery_beat",
-    "debug_toolbar",
     # Custom apps
     "admin_panel",
     "product_management",
@@ -71,6 +69,9 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    "admin_panel.middleware.ProfilingMiddleware",
+    "admin_panel.middleware.QueryInstrumentationMiddleware",
+    "admin_panel.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,9 +81,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
     "corsheaders.middleware.CorsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "admin_panel.middleware.UserEventTrackingMiddleware",
 ]
+# Debug toolbar, only in development: its middleware is sync only, and under
+# ASGI it would put every request through a worker thread
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(-1, "debug_toolbar.middleware.DebugToolbarMiddleware")
 
 ROOT_URLCONF = "ecommerce.urls"
 
@@ -125,6 +130,33 @@ DATABASES = {
     }
 }
 
+# Read replicas, "host" or "host:port" separated by commas, with the name and
+# credentials of the primary. Only the views and blocks marked with
+# ecommerce.db_router.use_replica/read_from_replica read from them.
+DATABASE_REPLICAS = [
+    replica for replica in os.getenv("DATABASE_REPLICAS", "").split(",") if replica
+]
+for index, replica in enumerate(DATABASE_REPLICAS, start=1):
+    host, _, port = replica.partition(":")
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICA_ALIASES = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["ecommerce.db_router.ReplicaRouter"]
+# After writing, a browser reads from the primary for this long (seconds)
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+REPLICA_PIN_COOKIE_NAME = "primary_pin"
+# Writes that do not pin: the sessions are always read from the primary, and
+# nobody reads the tracked events or the counter deltas back right away
+REPLICA_PIN_IGNORED_MODELS = [
+    "sessions.session",
+    "admin_panel.usereventtracking",
+    "admin_panel.counterdelta",
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -195,10 +227,28 @@ EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 
 PASSWORD_RESET_EMAIL_TEMPLATE_NAME = "registration/password_reset_email.html"
 SESSION_COOKIE_AGE = 1209600  # 2 weeks, in seconds
+SESSION_PURGE_BATCH_SIZE = 5000
+
+# Signed cookie identifying anonymous visitors for event tracking
+VISITOR_COOKIE_NAME = "visitor_id"
+VISITOR_COOKIE_AGE = 365 * 24 * 60 * 60  # 1 year, in seconds
 
 RAZORPAY_KEY_ID = os.environ.get("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.environ.get("RAZORPAY_KEY_SECRET")
 RAZORPAY_WEBHOOK_SECRET = os.environ.get("RAZORPAY_WEBHOOK_SECRET")
+# Point at the local stand-in (manage.py run_fake_razorpay) for load tests
+RAZORPAY_BASE_URL = os.environ.get("RAZORPAY_BASE_URL", "https://api.razorpay.com")
+RAZORPAY_CONNECT_TIMEOUT = float(os.environ.get("RAZORPAY_CONNECT_TIMEOUT", 3))
+RAZORPAY_READ_TIMEOUT = float(os.environ.get("RAZORPAY_READ_TIMEOUT", 10))
+RAZORPAY_POOL_SIZE = int(os.environ.get("RAZORPAY_POOL_SIZE", 10))
+# Consecutive gateway failures before calls fail fast, and for how long (seconds)
+RAZORPAY_CIRCUIT_FAILURE_THRESHOLD = 5
+RAZORPAY_CIRCUIT_RESET_TIMEOUT = 30
+
+# Razorpay webhook events are reconciled in batches; events whose order does
+# not exist yet are retried for PAYMENT_WEBHOOK_MATCH_WINDOW seconds
+PAYMENT_WEBHOOK_BATCH_SIZE = 500
+PAYMENT_WEBHOOK_MATCH_WINDOW = 60 * 60
 
 CSRF_TRUSTED_ORIGINS = [
     "https://direct-equally-tomcat.ngrok-free.app",
@@ -243,6 +293,10 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(hour=0, minute=0),  # Every day at midnight
         # "schedule": 10.00,  # Runs every 10 seconds
     },
+    "update-daily-order-report": {
+        "task": "order_management.tasks.update_daily_order_report",
+        "schedule": crontab(minute=5),  # Every hour at 5 past
+    },
     "send-weekly-wishlist-summary": {
         "task": "order_management.tasks.send_weekly_wishlist_summary",
         "schedule": crontab(
@@ -250,7 +304,135 @@ CELERY_BEAT_SCHEDULE = {
         ),  # Runs every Sunday at 8:00 AM
         # "schedule": 10.00,
     },
+    "compact-user-events": {
+        "task": "admin_panel.tasks.compact_user_events",
+        "schedule": crontab(hour=2, minute=0),  # Every day at 2:00 AM
+    },
+    "build-product-recommendations": {
+        "task": "product_management.tasks.build_product_recommendations",
+        "schedule": crontab(hour=3, minute=0),  # Every day at 3:00 AM
+    },
+    "process-webhook-events": {
+        "task": "order_management.tasks.process_webhook_events",
+        "schedule": 5 * 60.0,  # Every 5 minutes
+    },
+    "purge-abandoned-carts": {
+        "task": "order_management.tasks.purge_abandoned_carts",
+        "schedule": crontab(hour=4, minute=0),  # Every day at 4:00 AM
+    },
+    "purge-expired-sessions": {
+        "task": "admin_panel.tasks.purge_expired_sessions",
+        "schedule": crontab(minute=30),  # Every hour at half past
+    },
+    "flush-counters": {
+        "task": "admin_panel.tasks.flush_counters",
+        "schedule": 60.0,  # Every minute
+    },
+    "collect-media-garbage": {
+        "task": "admin_panel.tasks.collect_media_garbage",
+        "schedule": crontab(hour=2, minute=30),  # Every day at 2:30 AM
+    },
+    "generate-missing-image-derivatives": {
+        "task": "admin_panel.tasks.generate_missing_image_derivatives",
+        "schedule": crontab(minute=15),  # Every hour at quarter past
+    },
+    "reconcile-coupon-counts": {
+        "task": "admin_panel.tasks.reconcile_coupon_counts",
+        "schedule": crontab(hour=1, minute=0),  # Every day at 1:00 AM
+    },
+}
+
+# User event retention
+USER_EVENT_RETENTION_DAYS = int(os.getenv("USER_EVENT_RETENTION_DAYS", "90"))
+USER_EVENT_PURGE_BATCH_SIZE = 5000
+USER_EVENT_ARCHIVE_DIR = os.getenv(
+    "USER_EVENT_ARCHIVE_DIR", os.path.join(BASE_DIR, "archive", "user_events")
+)
+
+# Cache (Redis when CACHE_URL is set, per-process memory otherwise). CACHE_URL
+# is required when running several workers: without a shared cache the
+# permissions are not cached, coupon lookups hit the database and /metrics
+# only reports the process that answered (see ecommerce.cache).
+if os.getenv("CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Product recommendations
+RECOMMENDATION_LOOKBACK_DAYS = int(os.getenv("RECOMMENDATION_LOOKBACK_DAYS", "90"))
+RECOMMENDATION_TOP_K = 20
+RECOMMENDATION_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Cached user permissions and groups (invalidated on change, shared cache only)
+PERMISSION_CACHE_TIMEOUT = 60 * 60
+
+# Resized WebP derivatives of uploaded images, {model: {size name: (width, height)}}
+IMAGE_DERIVATIVE_SIZES = {
+    "product_management.productimage": {
+        "thumb": (160, 160),
+        "card": (480, 480),
+        "large": (1200, 1200),
+    },
+    "admin_panel.banner": {
+        "banner_small": (768, 768),
+        "banner": (1920, 1920),
+    },
 }
+IMAGE_DERIVATIVE_QUALITY = 80
+
+# Media garbage collection: deleted images and orphaned files are removed
+# once they are older than the grace period (seconds)
+MEDIA_GC_GRACE_PERIOD = int(os.getenv("MEDIA_GC_GRACE_PERIOD", 24 * 60 * 60))
+MEDIA_GC_BATCH_SIZE = 500
+
+# Daily order summary email: number of orders listed in the email, and
+# whether to attach a CSV of all the day's orders
+DAILY_ORDER_REPORT_ORDER_LIMIT = 50
+DAILY_ORDER_REPORT_ATTACH_CSV = (
+    os.getenv("DAILY_ORDER_REPORT_ATTACH_CSV", "False") == "True"
+)
+
+# Weekly wishlist summary email: how many products and users to list
+WISHLIST_SUMMARY_TOP_PRODUCTS = 20
+WISHLIST_SUMMARY_TOP_USERS = 20
+
+# Bulk order status updates
+BULK_ORDER_STATUS_LIMIT = 1000
+ORDER_STATUS_EMAIL_BATCH_SIZE = 100
+
+# Per-view query metrics, served in the Prometheus format at /metrics to
+# METRICS_ALLOWED_IPS, or to any client sending "Authorization: Bearer
+# <METRICS_TOKEN>" when a token is set
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1").split(",")
+# How often each process publishes its metrics to the shared cache (seconds)
+METRICS_FLUSH_INTERVAL = 10
+# A request running the same query this many times is an N+1 suspect
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+
+# Request profiling: PROFILING_SAMPLE_RATE of the requests are profiled with
+# cProfile, and the stacks of every request slower than
+# PROFILING_SLOW_THRESHOLD seconds are kept. Listed in the admin panel at
+# /admin-panel/profiles/ (superusers only).
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.01))
+PROFILING_SLOW_THRESHOLD = float(os.getenv("PROFILING_SLOW_THRESHOLD", 1.0))
+# How often the stacks of running requests are sampled (seconds)
+PROFILING_INTERVAL = 0.01
+# Local to each host; the oldest files are deleted beyond these limits
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 500))
+PROFILING_MAX_BYTES = int(os.getenv("PROFILING_MAX_BYTES", 200 * 1024 * 1024))
 
 INTERNAL_IPS = [
     # ...
@@ -0,0 +1,15 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=ecommerce.test_settings
+
+The tests run with a read replica: a second connection to the test database,
+so the routing is tested across two databases.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, DATABASE_REPLICA_ALIASES
+
+if not DATABASE_REPLICA_ALIASES:
+    DATABASES["replica1"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICA_ALIASES = ["replica1"]
@@ -21,9 +21,12 @@ from django.conf.urls.static import static
 from django.conf import settings
 from debug_toolbar.toolbar import debug_toolbar_urls
 
+from admin_panel.views import metrics
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics, name="metrics"),
     path("admin-panel/", include("admin_panel.urls")),
     path("pages/", include("django.contrib.flatpages.urls")),
     path("", include("user_management.urls")),
@@ -0,0 +1,9 @@
+"""
+Load testing harness for the storefront and the admin panel.
+
+Virtual users replay scripted journeys (browsing, carts, cash on delivery
+and Razorpay checkouts, admin DataTables polling) against a running site
+and the latency of every endpoint is collected. Run it with
+``manage.py run_load_test``, which also starts the local SMTP sink and the
+fake Razorpay API so that nothing leaves the machine.
+"""
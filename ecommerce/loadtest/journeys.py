@@ -0,0 +1,200 @@
+"""
+Scripted user journeys.
+
+A journey is registered with ``@journey(name, weight)`` and receives a
+Client with a fresh session, the Target and the virtual user's random
+generator. Every request is recorded under a stable endpoint name, so
+``/product-details/17`` and ``/product-details/42`` land in the same row.
+"""
+
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import requests
+
+from order_management.fake_gateway import sign_payment
+
+
+JOURNEYS = {}
+
+SEARCH_TERMS = ["shirt", "lamp", "wireless", "premium", "watch", "eco"]
+
+# A browser user agent, the event tracking middleware skips HTTP libraries
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+)
+
+
+def journey(name, weight):
+    def decorator(func):
+        JOURNEYS[name] = (func, weight)
+        return func
+
+    return decorator
+
+
+@dataclass
+class Target:
+    base_url: str
+    password: str
+    # (username, address id) of the customers the virtual users log in as
+    customers: list = field(default_factory=list)
+    product_ids: list = field(default_factory=list)
+    admin_username: str = None
+    admin_password: str = None
+    razorpay_key_secret: str = ""
+
+
+class Client:
+    """A browser session that records the latency of every request."""
+
+    def __init__(self, target, stats, timeout=30):
+        self.target = target
+        self.stats = stats
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+
+    def request(self, name, method, path, expect=200, check=None, **kwargs):
+        """
+        Send a request and record it under ``name``. It fails when the
+        status is not ``expect`` or ``check(response)`` is false; the views
+        answer many errors with a 200 and a message.
+        """
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method,
+                self.target.base_url + path,
+                timeout=self.timeout,
+                allow_redirects=False,
+                **kwargs,
+            )
+            ok = response.status_code == expect and (check is None or check(response))
+        except (requests.RequestException, ValueError):
+            response, ok = None, False
+        self.stats.record(name, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def get(self, name, path, **kwargs):
+        return self.request(name, "GET", path, **kwargs)
+
+    def post(self, name, path, data=None, **kwargs):
+        headers = {"X-CSRFToken": self.session.cookies.get("csrftoken", "")}
+        return self.request(name, "POST", path, data=data, headers=headers, **kwargs)
+
+    def post_json(self, name, path, data=None):
+        """POST to a JSON endpoint that answers {"status": "success", ...}."""
+        response = self.post(
+            name, path, data, check=lambda r: r.json().get("status") == "success"
+        )
+        return response.json() if response is not None else None
+
+    def login(self, username, password, admin=False):
+        path = "/admin-panel/login/" if admin else "/login/"
+        name = "admin_login" if admin else "login"
+        self.get(f"{name}_page", path)
+        return self.post(
+            name,
+            path,
+            {"username": username, "password": password},
+            expect=302,
+        )
+
+
+def _fill_cart(client, rng, count):
+    for product_id in rng.sample(client.target.product_ids, count):
+        client.get("product_details", f"/product-details/{product_id}")
+        client.post_json("add_to_cart", f"/add-cart/{product_id}", {"quantity": 1})
+
+
+def _checkout(client, rng):
+    """Log in as a customer, fill the cart and open the checkout."""
+    username, address_id = rng.choice(client.target.customers)
+    if client.login(username, client.target.password) is None:
+        return None
+    _fill_cart(client, rng, rng.randint(1, 3))
+    client.get("cart", "/cart/")
+    client.get("checkout", "/checkout/")
+    return {"billing_address_id": address_id, "shipping_address_id": address_id}
+
+
+@journey("browse", weight=60)
+def browse(client, rng):
+    client.get("home_page", "/")
+    client.get("product_list", "/products/")
+    client.get(
+        "product_search", "/products/", params={"search": rng.choice(SEARCH_TERMS)}
+    )
+    for product_id in rng.sample(client.target.product_ids, 2):
+        client.get("product_details", f"/product-details/{product_id}")
+
+
+@journey("cart", weight=20)
+def cart(client, rng):
+    client.get("home_page", "/")
+    _fill_cart(client, rng, rng.randint(1, 3))
+    client.get("cart", "/cart/")
+
+
+@journey("checkout_cod", weight=10)
+def checkout_cash_on_delivery(client, rng):
+    addresses = _checkout(client, rng)
+    if addresses is None:
+        return
+    order = client.post_json(
+        "place_order_cod",
+        "/place-order/",
+        {**addresses, "selected_payment": "payment_cash"},
+    )
+    if order:
+        client.get("order_successful", f"/order-successful/{order['order_id']}/")
+
+
+@journey("checkout_razorpay", weight=5)
+def checkout_razorpay(client, rng):
+    addresses = _checkout(client, rng)
+    if addresses is None:
+        return
+    payment = client.post_json(
+        "place_order_razorpay",
+        "/place-order/",
+        {**addresses, "selected_payment": "payment_razorpay"},
+    )
+    if not payment:
+        return
+    # What Razorpay Checkout hands back to the page after a successful payment
+    payment_id = f"pay_{uuid.uuid4().hex[:14]}"
+    order = client.post_json(
+        "payment_handler",
+        "/paymenthandler/",
+        {
+            **addresses,
+            "selected_payment": "payment_razorpay",
+            "razorpay_order_id": payment["razorpay_order_id"],
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": sign_payment(
+                payment["razorpay_order_id"],
+                payment_id,
+                client.target.razorpay_key_secret,
+            ),
+        },
+    )
+    if order:
+        client.get("order_successful", f"/order-successful/{order['order_id']}/")
+
+
+@journey("admin_polling", weight=5)
+def admin_polling(client, rng):
+    target = client.target
+    if client.login(target.admin_username, target.admin_password, admin=True) is None:
+        return
+    # The DataTables of the product and order lists, paging and searching
+    for _ in range(3):
+        params = {"draw": 1, "start": rng.choice([0, 10, 20]), "length": 10}
+        if rng.random() < 0.3:
+            params["search[value]"] = rng.choice(SEARCH_TERMS)
+        client.get("admin_get_products", "/admin-panel/get-products/", params=params)
+        client.get("admin_get_orders", "/admin-panel/get-orders/", params=params)
@@ -0,0 +1,57 @@
+"""
+Run virtual users against a site.
+
+Each virtual user is a thread that replays journeys, picked by weight, until
+the duration is over. Journeys start from a fresh session, like a new
+visitor. Without think time the test is closed-loop: every user fires its
+next request as soon as the previous one answered, which measures the
+throughput the site can sustain with that many concurrent users.
+"""
+
+import random
+import threading
+import time
+
+from .journeys import JOURNEYS, Client
+from .stats import Stats
+
+
+def parse_mix(value):
+    """Parse "browse=60,cart=20" into {journey: weight}."""
+    mix = {}
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        if name.strip() not in JOURNEYS:
+            raise ValueError(f"Unknown journey {name.strip()!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def run_load_test(target, users=10, duration=60, mix=None, think_time=0, seed=42):
+    """Run the load test and return (Stats, elapsed seconds)."""
+    mix = mix or {name: weight for name, (_, weight) in JOURNEYS.items()}
+    names, weights = list(mix), list(mix.values())
+    stats = Stats()
+    deadline = time.monotonic() + duration
+
+    def virtual_user(index):
+        rng = random.Random(f"{seed}-{index}")
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            func = JOURNEYS[name][0]
+            start = time.perf_counter()
+            func(Client(target, stats), rng)
+            stats.record(f"journey:{name}", time.perf_counter() - start)
+            if think_time:
+                time.sleep(rng.uniform(0, 2 * think_time))
+
+    threads = [
+        threading.Thread(target=virtual_user, args=(index,), daemon=True)
+        for index in range(users)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - started
@@ -0,0 +1,54 @@
+"""Latency and error statistics of a load test, per endpoint."""
+
+import threading
+from collections import defaultdict
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, int(round(percent / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds, ok=True):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, elapsed):
+        """
+        Return {endpoint: {"count", "errors", "rps", "p50_ms", ..., "max_ms"}},
+        plus a "TOTAL" row over every request. Rows named "journey:..." time
+        whole journeys and are left out of the total.
+        """
+        with self.lock:
+            rows = {name: list(values) for name, values in self.latencies.items()}
+            errors = dict(self.errors)
+        requests = [name for name in rows if not name.startswith("journey:")]
+        rows["TOTAL"] = [value for name in requests for value in rows[name]]
+        errors["TOTAL"] = sum(errors.get(name, 0) for name in requests)
+
+        summary = {}
+        for name, values in sorted(rows.items()):
+            values.sort()
+            row = {
+                "count": len(values),
+                "errors": errors.get(name, 0),
+                "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            }
+            for percent in PERCENTILES:
+                row[f"p{percent}_ms"] = round(percentile(values, percent) * 1000, 1)
+            row["max_ms"] = round(values[-1] * 1000, 1) if values else 0.0
+            summary[name] = row
+        return summary
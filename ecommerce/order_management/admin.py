@@ -1,3 +1,5 @@
+import json
+
 from django.contrib import admin
 from .models import (
     PaymentGateway,
@@ -6,6 +8,9 @@ from .models import (
     OrderDetail,
     UserWishList,
     OrderStatusLogs,
+    Cart,
+    CartItem,
+    DailyOrderReport,
 )
 
 
@@ -82,7 +87,14 @@ class UserWishListAdmin(admin.ModelAdmin):
 
 @admin.register(PaymentLogs)
 class PaymentLogsAdmin(admin.ModelAdmin):
-    list_display = ["id", "pay_ord_id", "pay_status", "response_dict"]
+    list_display = ["id", "pay_ord_id", "payment_id", "pay_status", "processed_at"]
+    search_fields = ["pay_ord_id", "payment_id", "event_id"]
+    exclude = ["payload", "response_dict"]
+    readonly_fields = ["event"]
+
+    @admin.display(description="Event")
+    def event(self, obj):
+        return json.dumps(obj.get_payload(), indent=2)
 
 
 @admin.register(OrderStatusLogs)
@@ -94,3 +106,22 @@ class OrderStatusLogsAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
     ]
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    raw_id_fields = ("product",)
+    extra = 0
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    raw_id_fields = ("user",)
+    list_display = ["id", "user", "created_at", "updated_at"]
+    inlines = [CartItemInline]
+
+
+@admin.register(DailyOrderReport)
+class DailyOrderReportAdmin(admin.ModelAdmin):
+    list_display = ["date", "order_count", "revenue", "is_final", "updated_at"]
+    ordering = ["-date"]
@@ -0,0 +1,204 @@
+"""
+Cart storage backed by the Cart/CartItem tables.
+
+Logged-in users own one cart. Anonymous visitors get a cart whose id is
+written to the session once, the first time they add something. Every
+change after that updates a single CartItem row, so cart traffic no longer
+rewrites the whole session.
+
+The ``a``-prefixed methods are for async views; they expect the user and
+session of the request to be loaded already (see
+``ecommerce.async_utils.aload_user_and_session``).
+"""
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import Cart, CartItem
+
+
+CART_SESSION_KEY = "cart_id"
+
+# Maximum quantity of a single product in the cart
+MAX_CART_QUANTITY = 10
+
+
+class CartStore:
+    """Cart of the current request (user or anonymous session)."""
+
+    def __init__(self, request):
+        self.request = request
+        self._cart_id = None
+
+    def get_cart_id(self, create=False):
+        """Return the cart id, creating the cart when ``create`` is set."""
+        if self._cart_id:
+            return self._cart_id
+
+        user = self.request.user
+        if user.is_authenticated:
+            if create:
+                cart, _ = Cart.objects.get_or_create(user=user)
+                self._cart_id = cart.id
+            else:
+                self._cart_id = (
+                    Cart.objects.filter(user=user).values_list("id", flat=True).first()
+                )
+        else:
+            self._cart_id = self.request.session.get(CART_SESSION_KEY)
+            if not self._cart_id and create:
+                self._cart_id = Cart.objects.create().id
+                self.request.session[CART_SESSION_KEY] = self._cart_id
+        return self._cart_id
+
+    async def aget_cart_id(self, create=False):
+        if self._cart_id:
+            return self._cart_id
+
+        user = self.request.user
+        if user.is_authenticated:
+            if create:
+                cart, _ = await Cart.objects.aget_or_create(user=user)
+                self._cart_id = cart.id
+            else:
+                self._cart_id = await (
+                    Cart.objects.filter(user=user).values_list("id", flat=True).afirst()
+                )
+        else:
+            self._cart_id = self.request.session.get(CART_SESSION_KEY)
+            if not self._cart_id and create:
+                self._cart_id = (await Cart.objects.acreate()).id
+                self.request.session[CART_SESSION_KEY] = self._cart_id
+        return self._cart_id
+
+    def items(self):
+        """Return the cart as {product_id: quantity}, oldest line first."""
+        cart_id = self.get_cart_id()
+        if not cart_id:
+            return {}
+        return dict(
+            CartItem.objects.filter(cart_id=cart_id, quantity__gt=0)
+            .order_by("id")
+            .values_list("product_id", "quantity")
+        )
+
+    async def aitems(self):
+        cart_id = await self.aget_cart_id()
+        if not cart_id:
+            return {}
+        return {
+            product_id: quantity
+            async for product_id, quantity in CartItem.objects.filter(
+                cart_id=cart_id, quantity__gt=0
+            )
+            .order_by("id")
+            .values_list("product_id", "quantity")
+        }
+
+    def get(self, product_id):
+        """Return the quantity of a product in the cart."""
+        cart_id = self.get_cart_id()
+        if not cart_id:
+            return 0
+        quantity = (
+            CartItem.objects.filter(cart_id=cart_id, product_id=product_id)
+            .values_list("quantity", flat=True)
+            .first()
+        )
+        return quantity or 0
+
+    async def aget(self, product_id):
+        cart_id = await self.aget_cart_id()
+        if not cart_id:
+            return 0
+        quantity = await (
+            CartItem.objects.filter(cart_id=cart_id, product_id=product_id)
+            .values_list("quantity", flat=True)
+            .afirst()
+        )
+        return quantity or 0
+
+    def count(self):
+        """Return the total number of items in the cart."""
+        cart_id = self.get_cart_id()
+        if not cart_id:
+            return 0
+        total = CartItem.objects.filter(cart_id=cart_id).aggregate(
+            total=Sum("quantity")
+        )["total"]
+        return total or 0
+
+    def add(self, product_id, quantity):
+        """Change the quantity of a product by ``quantity`` (may be negative)."""
+        cart_id = self.get_cart_id(create=True)
+        _add_cart_item(cart_id, product_id, quantity)
+
+    async def aadd(self, product_id, quantity):
+        cart_id = await self.aget_cart_id(create=True)
+        # One thread hop for the update and the fallback insert
+        await sync_to_async(_add_cart_item)(cart_id, product_id, quantity)
+
+    def remove(self, product_id):
+        """Remove a product from the cart."""
+        cart_id = self.get_cart_id()
+        if cart_id:
+            CartItem.objects.filter(cart_id=cart_id, product_id=product_id).delete()
+
+    def clear(self):
+        """Remove all products from the cart."""
+        cart_id = self.get_cart_id()
+        if cart_id:
+            CartItem.objects.filter(cart_id=cart_id).delete()
+
+
+def _add_cart_item(cart_id, product_id, quantity):
+    """Atomically add ``quantity`` to a cart line, creating it if needed."""
+    updated = CartItem.objects.filter(cart_id=cart_id, product_id=product_id).update(
+        quantity=F("quantity") + quantity
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(
+                cart_id=cart_id, product_id=product_id, quantity=quantity
+            )
+    except IntegrityError:
+        # Another request created the line first
+        CartItem.objects.filter(cart_id=cart_id, product_id=product_id).update(
+            quantity=F("quantity") + quantity
+        )
+
+
+def merge_session_cart(request, user):
+    """
+    Move the anonymous cart of this session into the user's cart.
+
+    Quantities of products present in both carts are added up, capped at
+    ``MAX_CART_QUANTITY``. The anonymous cart is deleted afterwards.
+    """
+    session_cart_id = request.session.pop(CART_SESSION_KEY, None)
+    if not session_cart_id:
+        return
+
+    with transaction.atomic():
+        session_items = dict(
+            CartItem.objects.filter(cart_id=session_cart_id).values_list(
+                "product_id", "quantity"
+            )
+        )
+        if session_items:
+            user_cart, _ = Cart.objects.get_or_create(user=user)
+            if user_cart.id != session_cart_id:
+                user_items = dict(
+                    CartItem.objects.filter(cart=user_cart).values_list(
+                        "product_id", "quantity"
+                    )
+                )
+                for product_id, quantity in session_items.items():
+                    current = user_items.get(product_id, 0)
+                    added = min(quantity, MAX_CART_QUANTITY - current)
+                    if added > 0:
+                        _add_cart_item(user_cart.id, product_id, added)
+        Cart.objects.filter(id=session_cart_id, user__isnull=True).delete()
@@ -1,9 +1,9 @@
+from order_management.cart import CartStore
 from order_management.models import UserWishList
 
 
 def cart_item_count(request):
-    cart = request.session.get("cart", {})
-    item_count = sum(cart.values())
+    item_count = CartStore(request).count()
     return {"cart_item_count": item_count}
 
 
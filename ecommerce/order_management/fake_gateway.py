@@ -0,0 +1,145 @@
+"""
+Local stand-in for the Razorpay API, used for offline checkout load tests.
+
+It answers the endpoints the shop uses (create/fetch order, fetch payment)
+with Razorpay-shaped JSON, and can add latency and errors to see how the
+shop behaves when the gateway degrades. Start it with
+``manage.py run_fake_razorpay`` and set ``RAZORPAY_BASE_URL`` to its address.
+
+``sign_payment`` produces the signature Razorpay Checkout would hand to
+``payment_handler``, so a load test can complete the payment step too.
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sign_payment(razorpay_order_id, payment_id, key_secret):
+    """Return the checkout signature for a payment of a Razorpay order."""
+    return hmac.new(
+        key_secret.encode(),
+        f"{razorpay_order_id}|{payment_id}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+class FakeRazorpayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _degrade(self):
+        """Apply the configured latency and error rate. True if it failed."""
+        if self.server.latency:
+            time.sleep(random.expovariate(1 / self.server.latency))
+        if random.random() < self.server.error_rate:
+            self._send(
+                500,
+                {"error": {"code": "SERVER_ERROR", "description": "Injected error"}},
+            )
+            return True
+        return False
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        data = self._read_json()
+        if self._degrade():
+            return
+        if self.path.rstrip("/") != "/v1/orders":
+            self._send(404, {"error": {"code": "BAD_REQUEST_ERROR"}})
+            return
+        if not isinstance(data.get("amount"), int) or data["amount"] < 100:
+            self._send(
+                400,
+                {
+                    "error": {
+                        "code": "BAD_REQUEST_ERROR",
+                        "description": "The amount must be at least INR 1.00",
+                    }
+                },
+            )
+            return
+
+        order = {
+            "id": f"order_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": data["amount"],
+            "amount_paid": 0,
+            "amount_due": data["amount"],
+            "currency": data.get("currency", "INR"),
+            "receipt": data.get("receipt"),
+            "status": "created",
+            "attempts": 0,
+            "created_at": int(time.time()),
+        }
+        with self.server.lock:
+            self.server.orders[order["id"]] = order
+        self._send(200, order)
+
+    def do_GET(self):
+        if self._degrade():
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[:2] == ["v1", "orders"]:
+            order = self.server.orders.get(parts[2])
+            if order:
+                self._send(200, order)
+                return
+        elif len(parts) == 3 and parts[:2] == ["v1", "payments"]:
+            self._send(
+                200,
+                {
+                    "id": parts[2],
+                    "entity": "payment",
+                    "status": "captured",
+                    "captured": True,
+                },
+            )
+            return
+        self._send(
+            404,
+            {
+                "error": {
+                    "code": "BAD_REQUEST_ERROR",
+                    "description": "The id provided does not exist",
+                }
+            },
+        )
+
+
+def create_server(
+    host="127.0.0.1", port=8090, latency=0.0, error_rate=0.0, verbose=False
+):
+    """
+    Return a fake Razorpay server (call ``serve_forever()`` to run it).
+    ``latency`` is the mean added delay in seconds, ``error_rate`` the share
+    of requests answered with a 500 SERVER_ERROR.
+    """
+    server = ThreadingHTTPServer((host, port), FakeRazorpayHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.verbose = verbose
+    server.orders = {}
+    server.lock = threading.Lock()
+    return server
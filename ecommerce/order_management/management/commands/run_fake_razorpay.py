@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from order_management.fake_gateway import create_server
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in Razorpay API for offline checkout load tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Mean added latency per request, in milliseconds",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of requests answered with a server error (0-1)",
+        )
+        parser.add_argument("--verbose", action="store_true", help="Log every request")
+
+    def handle(self, *args, **options):
+        server = create_server(
+            options["host"],
+            options["port"],
+            latency=options["latency"] / 1000,
+            error_rate=options["error_rate"],
+            verbose=options["verbose"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Fake Razorpay listening on http://{options['host']}:{options['port']}"
+                f" - set RAZORPAY_BASE_URL to this address."
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-19 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_management', '0013_orderstatuslogs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userorder',
+            index=models.Index(fields=['user', 'created_at'], name='order_manag_user_id_4692fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userorder',
+            index=models.Index(fields=['awb_no'], name='order_manag_awb_no_3aecc7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userwishlist',
+            index=models.Index(fields=['user', 'product'], name='order_manag_user_id_937995_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.14 on 2026-10-19 09:19
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_logs_processed(apps, schema_editor):
+    # Logs received before the webhook queue existed are history, not work
+    PaymentLogs = apps.get_model("order_management", "PaymentLogs")
+    PaymentLogs.objects.update(processed_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_management', '0015_cart_cartitem_cartitem_unique_cart_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentlogs',
+            name='event_id',
+            field=models.CharField(max_length=100, null=True, unique=True, verbose_name='Event Id'),
+        ),
+        migrations.AddField(
+            model_name='paymentlogs',
+            name='payload',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Compressed Event Payload'),
+        ),
+        migrations.AddField(
+            model_name='paymentlogs',
+            name='payment_id',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Payment Id'),
+        ),
+        migrations.AddField(
+            model_name='paymentlogs',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='paymentlogs',
+            name='pay_ord_id',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='Payment Order Id'),
+        ),
+        migrations.AlterField(
+            model_name='paymentlogs',
+            name='response_dict',
+            field=models.TextField(blank=True, verbose_name='Response In Str Form'),
+        ),
+        migrations.RunPython(mark_existing_logs_processed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userorder',
+            index=models.Index(fields=['transaction_id'], name='order_manag_transac_3ec4b1_idx'),
+        ),
+    ]
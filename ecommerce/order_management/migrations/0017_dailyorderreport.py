@@ -0,0 +1,37 @@
+# Generated by Django 4.2.14 on 2026-10-19 09:24
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_management', '0016_paymentlogs_webhook_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrderReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('by_status', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('by_payment_status', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('by_payment_gateway', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('top_products', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('is_final', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userorder',
+            index=models.Index(fields=['created_at'], name='order_manag_created_e3a37b_idx'),
+        ),
+    ]
@@ -1,9 +1,14 @@
+# Standard library imports
+import json
+import zlib
+
 # Standard Django imports
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
 # App-specific imports
-from admin_panel.models import Address, Coupon, BaseModel
+from admin_panel.models import Address, Coupon, BaseModel, DirtyFieldsMixin
 from product_management.models import Product
 from user_management.models import User
 from django.db.models import Sum
@@ -22,7 +27,7 @@ class PaymentGateway(BaseModel):
         return self.name
 
 
-class UserOrder(BaseModel):
+class UserOrder(DirtyFieldsMixin, BaseModel):
     """
     Represents an order placed by a user with various details.
     """
@@ -117,6 +122,12 @@ class UserOrder(BaseModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+            models.Index(fields=["awb_no"]),
+            models.Index(fields=["transaction_id"]),
+            models.Index(fields=["created_at"]),
+        ]
 
     def generate_awb_no(self):
         """Generate AWB number using current timestamp and shipping method."""
@@ -128,20 +139,21 @@ class UserOrder(BaseModel):
         """Override save method to set awb_no before saving the instance."""
         if not self.awb_no:
             self.awb_no = self.generate_awb_no()
-        self.created_by = self.user
-        self.updated_by = self.user
-        # Log status change with human-readable status
-        if self.id:
-            # Get the current status from the database and compare with new status
-            current_status = self.__class__.objects.get(id=self.id).status
-            if self.status != current_status:
-                # Use Django's get_status_display() to get the human-readable status
-                human_readable_status = self.get_status_display()
-                order_status_log = OrderStatusLogs(
-                    order=self, status=human_readable_status
-                )
-                order_status_log.save()
+        # Ids, not instances: no query to load the user
+        self.created_by_id = self.user_id
+        self.updated_by_id = self.user_id
+        # Status changed since the order was loaded (no extra SELECT needed),
+        # and saved: update_fields may leave it out
+        update_fields = kwargs.get("update_fields")
+        status_changed = (
+            not self._state.adding
+            and (update_fields is None or "status" in update_fields)
+            and "status" in self.get_dirty_fields()
+        )
         super().save(*args, **kwargs)
+        if status_changed:
+            # Log status change with human-readable status
+            OrderStatusLogs.objects.create(order=self, status=self.get_status_display())
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
@@ -205,6 +217,11 @@ class UserWishList(BaseModel):
         Product, related_name="wishlist_product", on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "product"]),
+        ]
+
     def __str__(self):
         return self.product.name
 
@@ -216,15 +233,34 @@ class UserWishList(BaseModel):
 
 
 class PaymentLogs(models.Model):
-    """webhook response data"""
+    """
+    Webhook events received from Razorpay. Rows with an empty processed_at
+    are waiting to be reconciled with the orders (see order_management.webhooks).
+    """
 
-    pay_ord_id = models.CharField(max_length=50, verbose_name="Payment Order Id")
+    event_id = models.CharField(
+        max_length=100, unique=True, null=True, verbose_name="Event Id"
+    )
+    pay_ord_id = models.CharField(
+        max_length=50, db_index=True, verbose_name="Payment Order Id"
+    )
+    payment_id = models.CharField(max_length=50, blank=True, verbose_name="Payment Id")
     pay_status = models.CharField(max_length=50, verbose_name="Payment Status")
-    response_dict = models.TextField(verbose_name="Response In Str Form")
+    response_dict = models.TextField(blank=True, verbose_name="Response In Str Form")
+    payload = models.BinaryField(
+        null=True, blank=True, verbose_name="Compressed Event Payload"
+    )
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    def get_payload(self):
+        """Return the event as a dict, for new (compressed) and old rows alike."""
+        if self.payload:
+            return json.loads(zlib.decompress(self.payload))
+        return json.loads(self.response_dict or "{}")
+
 
 class OrderStatusLogs(models.Model):
     """Order status logs"""
@@ -235,3 +271,69 @@ class OrderStatusLogs(models.Model):
     status = models.CharField(max_length=10)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+class Cart(models.Model):
+    """
+    Shopping cart of a logged-in user, or of an anonymous visitor whose cart
+    id is kept in the session. Anonymous carts are merged on login.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="cart", null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cart {self.id} - {self.user or 'Anonymous'}"
+
+
+class CartItem(models.Model):
+    """A single product line in a cart"""
+
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="cart_items"
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "product"], name="unique_cart_item"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Cart {self.cart_id} - Product {self.product_id} x {self.quantity}"
+
+
+class DailyOrderReport(models.Model):
+    """
+    Precomputed summary of the orders placed on a day, refreshed during the
+    day and finalised after midnight (see order_management.reports).
+    """
+
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    by_status = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    by_payment_status = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    by_payment_gateway = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    top_products = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    is_final = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.date}: {self.order_count} orders"
+
+    @property
+    def average_order_value(self):
+        return self.revenue / self.order_count if self.order_count else 0
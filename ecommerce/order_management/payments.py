@@ -0,0 +1,184 @@
+"""
+Razorpay gateway client.
+
+Each process keeps one ``razorpay.Client`` whose HTTP session holds a pool of
+keep-alive connections, instead of opening a new session per request. Every
+call has a connect and read timeout, and goes through a circuit breaker:
+after ``RAZORPAY_CIRCUIT_FAILURE_THRESHOLD`` consecutive gateway failures the
+circuit opens and calls fail immediately with ``PaymentGatewayUnavailable``
+for ``RAZORPAY_CIRCUIT_RESET_TIMEOUT`` seconds, so a slow gateway cannot tie
+up every worker. One trial call is then let through to close it again.
+
+``RAZORPAY_BASE_URL`` can point the client at the local stand-in server
+(``manage.py run_fake_razorpay``) for offline load tests.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+class PaymentGatewayUnavailable(Exception):
+    """The payment gateway is failing, timing out or the circuit is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures, retry after a cool-down period."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        """Raise PaymentGatewayUnavailable unless a call may go through now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if (
+                time.monotonic() - self._opened_at < self.reset_timeout
+                or self._trial_running
+            ):
+                raise PaymentGatewayUnavailable("Payment gateway is unavailable.")
+            # Half-open: let a single trial call through
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _create_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class TimeoutSession(requests.Session):
+        """Session with a default (connect, read) timeout on every request."""
+
+        def request(self, *args, **kwargs):
+            kwargs.setdefault(
+                "timeout",
+                (settings.RAZORPAY_CONNECT_TIMEOUT, settings.RAZORPAY_READ_TIMEOUT),
+            )
+            return super().request(*args, **kwargs)
+
+    session = TimeoutSession()
+    # No automatic retries: creating an order is not idempotent
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.RAZORPAY_POOL_SIZE,
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _create_client():
+    import razorpay
+
+    client = razorpay.Client(
+        session=_create_session(),
+        auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+        base_url=settings.RAZORPAY_BASE_URL,
+    )
+    # The client looks its version up with pkg_resources on every request
+    version = client._get_version()
+    client._get_version = lambda: version
+    return client
+
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+circuit_breaker = CircuitBreaker(
+    settings.RAZORPAY_CIRCUIT_FAILURE_THRESHOLD,
+    settings.RAZORPAY_CIRCUIT_RESET_TIMEOUT,
+)
+
+
+def get_razorpay_client():
+    """Return the Razorpay client of this process."""
+    global _client, _client_pid
+    # Connection pools must not be shared with forked worker processes
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = _create_client()
+                _client_pid = os.getpid()
+    return _client
+
+
+def call_gateway(func, *args, **kwargs):
+    """
+    Call the Razorpay API through the circuit breaker. Timeouts, connection
+    errors and gateway/server errors count as failures and are raised as
+    PaymentGatewayUnavailable; request errors (e.g. a bad amount) are not.
+    """
+    import razorpay
+    import requests
+
+    circuit_breaker.before_call()
+    try:
+        result = func(*args, **kwargs)
+    except (
+        requests.RequestException,
+        ValueError,  # Non-JSON response, e.g. from a proxy
+        razorpay.errors.GatewayError,
+        razorpay.errors.ServerError,
+    ) as e:
+        circuit_breaker.record_failure()
+        raise PaymentGatewayUnavailable(str(e) or type(e).__name__) from e
+    except Exception:
+        circuit_breaker.record_success()
+        raise
+    circuit_breaker.record_success()
+    return result
+
+
+def create_razorpay_order(amount, currency="INR"):
+    """Create a Razorpay order for ``amount`` (in rupees) and return it."""
+    client = get_razorpay_client()
+    return call_gateway(
+        client.order.create,
+        {
+            "amount": int(amount * 100),  # Amount in paisa
+            "currency": currency,
+            "payment_capture": "1",
+        },
+    )
+
+
+def verify_payment_signature(razorpay_order_id, payment_id, signature):
+    """Check the signature returned by Razorpay Checkout (no API call)."""
+    if not (
+        settings.RAZORPAY_KEY_SECRET and razorpay_order_id and payment_id and signature
+    ):
+        return False
+    expected = hmac.new(
+        settings.RAZORPAY_KEY_SECRET.encode(),
+        f"{razorpay_order_id}|{payment_id}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
@@ -0,0 +1,156 @@
+"""
+Daily order report.
+
+``build_daily_order_report`` summarises one day's orders into a
+DailyOrderReport row with a fixed number of GROUP BY queries over that day's
+``created_at`` range, however many orders there are. The report of the
+current day is refreshed every hour, so the day is built up as it goes and
+the summary email only has to finalise the day that just ended.
+
+The email template receives the report and plain values only, never a lazy
+queryset, so an admin-edited template cannot trigger per-order queries.
+"""
+
+import csv
+import io
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import DailyOrderReport, OrderDetail, UserOrder
+
+
+CSV_FIELDS = [
+    ("awb_no", "Order Number"),
+    ("created_at", "Order Date"),
+    ("user__username", "Customer"),
+    ("user__email", "Customer Email"),
+    ("status", "Status"),
+    ("payment_status", "Payment Status"),
+    ("payment_gateway__name", "Payment Gateway"),
+    ("coupon__code", "Coupon"),
+    ("grand_total", "Grand Total"),
+]
+
+
+def day_range(date):
+    """Return the [start, end) datetimes of a local calendar day."""
+    start = timezone.make_aware(datetime.combine(date, time.min))
+    return start, start + timedelta(days=1)
+
+
+def orders_of_day(date):
+    start, end = day_range(date)
+    return UserOrder.objects.filter(created_at__gte=start, created_at__lt=end)
+
+
+def _grouped(orders, field, labels=None):
+    rows = (
+        orders.order_by()
+        .values(field)
+        .annotate(count=Count("id"), revenue=Sum("grand_total"))
+        .order_by("-count")
+    )
+    return [
+        {
+            "key": row[field],
+            "label": (labels or {}).get(row[field], row[field] or "-"),
+            "count": row["count"],
+            "revenue": row["revenue"] or 0,
+        }
+        for row in rows
+    ]
+
+
+def build_daily_order_report(date, final=False, top_products=10):
+    """Compute the report of ``date`` and save it. Runs five queries."""
+    orders = orders_of_day(date)
+    start, end = day_range(date)
+
+    totals = orders.order_by().aggregate(count=Count("id"), revenue=Sum("grand_total"))
+    products = (
+        OrderDetail.objects.filter(
+            order__created_at__gte=start, order__created_at__lt=end
+        )
+        .order_by()
+        .values("product_id", name=F("product__name"))
+        .annotate(quantity=Sum("quantity"), revenue=Sum("amount"))
+        .order_by("-quantity", "name")[:top_products]
+    )
+
+    report, _ = DailyOrderReport.objects.update_or_create(
+        date=date,
+        defaults={
+            "order_count": totals["count"],
+            "revenue": totals["revenue"] or 0,
+            "by_status": _grouped(orders, "status", dict(UserOrder.STATUS_CHOICES)),
+            "by_payment_status": _grouped(
+                orders, "payment_status", dict(UserOrder.PAYMENT_STATUS_CHOICES)
+            ),
+            "by_payment_gateway": _grouped(orders, "payment_gateway__name"),
+            "top_products": list(products),
+            "is_final": final,
+        },
+    )
+    return report
+
+
+def get_daily_order_report(date):
+    """Return the final report of ``date``, building it if needed."""
+    report = DailyOrderReport.objects.filter(date=date, is_final=True).first()
+    return report or build_daily_order_report(date, final=True)
+
+
+def write_orders_csv(date, file, chunk_size=2000):
+    """Stream the raw orders of ``date`` to an open text file as CSV."""
+    writer = csv.writer(file)
+    writer.writerow([label for _, label in CSV_FIELDS])
+    rows = (
+        orders_of_day(date)
+        .order_by("created_at")
+        .values_list(*[field for field, _ in CSV_FIELDS])
+        .iterator(chunk_size=chunk_size)
+    )
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def orders_csv_attachment(date):
+    """
+    Return the (filename, content, mimetype) of the CSV of the day's orders.
+    Rows are streamed into a temporary file that spills to disk when large.
+    """
+    max_size = settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    with tempfile.SpooledTemporaryFile(max_size=max_size) as file:
+        text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+        write_orders_csv(date, text)
+        text.flush()
+        file.seek(0)
+        content = file.read()
+        text.detach()
+    return f"orders-{date}.csv", content, "text/csv"
+
+
+def recent_orders(date, limit):
+    """The latest orders of the day with their customer, in one query."""
+    return list(
+        orders_of_day(date)
+        .select_related("user")
+        .only(
+            "id",
+            "awb_no",
+            "grand_total",
+            "status",
+            "created_at",
+            "user__first_name",
+            "user__last_name",
+            "user__username",
+        )
+        .order_by("-created_at")[:limit]
+    )
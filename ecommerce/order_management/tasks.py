@@ -1,83 +1,83 @@
 # orders/tasks.py
 
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, send_mail
 from django.conf import settings
-from order_management.models import UserOrder
 from django.utils import timezone
 from django.utils.html import strip_tags
 from django.template import Template, Context
 from admin_panel.models import EmailTemplate
-from order_management.models import UserWishList
-from datetime import timedelta
+from order_management.models import Cart
+from datetime import datetime, timedelta
 from collections import defaultdict
+from order_management.reports import (
+    build_daily_order_report,
+    get_daily_order_report,
+    orders_csv_attachment,
+    recent_orders,
+)
+from order_management.utils import build_wishlist_summary
+from order_management.webhooks import process_webhook_events
 
 
 @shared_task
-def send_daily_order_summary():
-    """Send Daily Order Summary"""
-    today = timezone.localtime().date()
-    orders = UserOrder.objects.filter(created_at__date=today)
-
-    subject = f"Daily Order Summary for {today}"
+def send_daily_order_summary(date=None):
+    """
+    Send Daily Order Summary of ``date`` (YYYY-MM-DD), by default of the day
+    that just ended, from the precomputed report.
+    """
+    if date:
+        report_date = datetime.strptime(date, "%Y-%m-%d").date()
+    else:
+        report_date = timezone.localtime().date() - timedelta(days=1)
+    report = get_daily_order_report(report_date)
+
+    subject = f"Daily Order Summary for {report_date}"
     template = EmailTemplate.objects.filter(title="Daily Order Summary").first()
-    context = {"orders": orders, "today_date": today}
+    context = {
+        "report": report,
+        "orders": recent_orders(report_date, settings.DAILY_ORDER_REPORT_ORDER_LIMIT),
+        "today_date": report_date,
+        "current_year": report_date.year,
+    }
     rendered_content = Template(template.content).render(Context(context))
     plain_message = strip_tags(rendered_content)
 
-    send_mail(
+    message = EmailMultiAlternatives(
         subject,
         plain_message,
         settings.DEFAULT_FROM_EMAIL,
         [settings.DEFAULT_FROM_EMAIL],
-        html_message=rendered_content,
-        fail_silently=False,
     )
+    message.attach_alternative(rendered_content, "text/html")
+    if settings.DAILY_ORDER_REPORT_ATTACH_CSV and report.order_count:
+        message.attach(*orders_csv_attachment(report_date))
+    message.send(fail_silently=False)
+
+
+@shared_task
+def update_daily_order_report():
+    """Refresh the report of the current day."""
+    report = build_daily_order_report(timezone.localtime().date())
+    return report.order_count
 
 
 @shared_task
 def send_weekly_wishlist_summary():
     """Send Weekly Wishlist Summary"""
     last_week = timezone.now() - timedelta(days=70)
-    wishlist_items = UserWishList.objects.filter(created_at__gte=last_week)
-
-    # Initialize a regular dictionary to hold user wishlist data
-    user_wishlist = {}
-
-    for item in wishlist_items:
-        product_details = {
-            "name": item.product.name,
-            "price": item.product.price,
-        }
-
-        # Check if the user's wishlist already exists in the dictionary
-        if item.user.username not in user_wishlist:
-            user_wishlist[item.user.username] = (
-                []
-            )  # Initialize the list if it doesn't exist
-
-        # Append the product details to the user's wishlist
-        user_wishlist[item.user.username].append(product_details)
-
-    # # Initialize a defaultdict to hold user wishlist data
-    # user_wishlist = defaultdict(list)
-
-    # for item in wishlist_items:
-    #     product_details = {
-    #         "name": item.product.name,
-    #         "price": item.product.price,
-    #     }
-    #     user_wishlist[item.user.username].append(product_details)
-
-    # user_wishlist = dict(user_wishlist)
+    summary = build_wishlist_summary(
+        last_week,
+        top_products=settings.WISHLIST_SUMMARY_TOP_PRODUCTS,
+        top_users=settings.WISHLIST_SUMMARY_TOP_USERS,
+    )
 
-    if wishlist_items.exists():
+    if summary:
         subject = "Weekly User Wish List Summary"
-        context = {"user_wishlist": user_wishlist}
         template = EmailTemplate.objects.filter(
             title="Weekly Wish List Summary"
         ).first()
-        rendered_content = Template(template.content).render(Context(context))
+        rendered_content = Template(template.content).render(Context(summary))
         plain_message = strip_tags(rendered_content)
 
         send_mail(
@@ -88,3 +88,21 @@ def send_weekly_wishlist_summary():
             html_message=rendered_content,
             fail_silently=False,
         )
+
+
+@shared_task
+def purge_abandoned_carts():
+    """Delete anonymous carts that outlived their session."""
+    cutoff = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    deleted, _ = (
+        Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff)
+        .exclude(items__updated_at__gte=cutoff)
+        .delete()
+    )
+    return deleted
+
+
+@shared_task(name="order_management.tasks.process_webhook_events")
+def process_webhook_events_task():
+    """Reconcile queued Razorpay webhook events with the orders."""
+    return process_webhook_events()
@@ -1,3 +1,371 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+from importlib import import_module
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import login
+from django.contrib.auth.models import AnonymousUser
+from django.db.models.signals import post_save
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from order_management.cart import CART_SESSION_KEY, MAX_CART_QUANTITY, CartStore
+from order_management.models import (
+    Cart,
+    CartItem,
+    OrderStatusLogs,
+    PaymentLogs,
+    UserOrder,
+    UserWishList,
+)
+from order_management.tasks import purge_abandoned_carts
+from order_management.webhooks import process_webhook_events
+from product_management.models import Category, Product
+from user_management.models import User
+
+
+class DirtyFieldsTests(TestCase):
+    """UserOrder only saves the fields changed since it was loaded."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="x")
+        cls.order_id = UserOrder.objects.create(
+            user=cls.user, created_by=cls.user, updated_by=cls.user
+        ).id
+
+    def setUp(self):
+        self.order = UserOrder.objects.get(id=self.order_id)
+
+    def test_dirty_fields(self):
+        self.assertEqual(self.order.get_dirty_fields(), {})
+        self.order.status = "S"
+        self.order.payment_status = "S"
+        self.assertEqual(
+            self.order.get_dirty_fields(), {"status": "P", "payment_status": "P"}
+        )
+
+        self.order.status = "P"
+        self.assertEqual(self.order.get_dirty_fields(), {"payment_status": "P"})
+
+    def test_save_writes_changed_fields_only(self):
+        self.order.status = "S"
+        with self.assertNumQueries(2):
+            # The UPDATE and the status log
+            self.order.save()
+        self.assertEqual(self.order.get_dirty_fields(), {})
+
+        # A concurrent change to another field is not overwritten
+        UserOrder.objects.filter(id=self.order_id).update(payment_status="S")
+        self.order.status = "D"
+        self.order.save()
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.payment_status), ("D", "S"))
+
+    def test_unchanged_save_is_a_no_op(self):
+        received = []
+        post_save.connect(received.append, sender=UserOrder)
+        self.addCleanup(post_save.disconnect, received.append, sender=UserOrder)
+
+        with self.assertNumQueries(0):
+            self.order.save()
+        self.assertEqual(received, [])
+
+    def test_status_change_is_logged(self):
+        self.order.status = "S"
+        self.order.save()
+        self.order.save()
+        self.assertEqual(
+            list(
+                OrderStatusLogs.objects.filter(order=self.order).values_list(
+                    "status", flat=True
+                )
+            ),
+            ["Shipped"],
+        )
+
+    def test_status_left_out_of_update_fields_is_not_logged(self):
+        self.order.status = "S"
+        self.order.payment_status = "S"
+        self.order.save(update_fields=["payment_status"])
+        self.assertFalse(OrderStatusLogs.objects.filter(order=self.order).exists())
+        self.assertEqual(self.order.get_dirty_fields(), {"status": "P"})
+
+        self.order.save()
+        self.assertEqual(
+            OrderStatusLogs.objects.get(order=self.order).status, "Shipped"
+        )
+
+
+class CartStoreTests(TestCase):
+    """Carts of anonymous visitors and users, and the merge on login."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="shopper", password="x")
+        audit = {"created_by": cls.user, "updated_by": cls.user}
+        category = Category.objects.create(
+            name="Mugs", description="Mugs", **audit
+        )
+        cls.products = [
+            Product.objects.create(
+                name=f"Mug {index}",
+                short_description="Mug",
+                long_description="Mug",
+                price=10,
+                category=category,
+                quantity=100,
+                **audit,
+            ).id
+            for index in range(3)
+        ]
+
+    def make_request(self, user=None, session=None):
+        request = RequestFactory().get("/")
+        if session is None:
+            session = import_module(settings.SESSION_ENGINE).SessionStore()
+        request.session = session
+        request.user = user or AnonymousUser()
+        return request
+
+    def fill_and_check(self, request):
+        first, second, _ = self.products
+        store = CartStore(request)
+        self.assertEqual(store.items(), {})
+        self.assertEqual(store.count(), 0)
+
+        store.add(first, 2)
+        store.add(first, 1)
+        store.add(second, 1)
+        self.assertEqual(store.items(), {first: 3, second: 1})
+        self.assertEqual(store.get(first), 3)
+        self.assertEqual(store.count(), 4)
+
+        store.add(first, -1)
+        store.remove(second)
+        self.assertEqual(store.items(), {first: 2})
+        self.assertEqual(store.get(second), 0)
+        return store
+
+    def test_anonymous_cart(self):
+        request = self.make_request()
+        self.assertEqual(CartStore(request).count(), 0)
+        # Reading an empty cart creates nothing
+        self.assertFalse(Cart.objects.exists())
+
+        self.fill_and_check(request)
+        cart = Cart.objects.get()
+        self.assertIsNone(cart.user)
+        self.assertEqual(request.session[CART_SESSION_KEY], cart.id)
+        # A later request of the same session sees the same cart
+        store = CartStore(self.make_request(session=request.session))
+        self.assertEqual(store.items(), {self.products[0]: 2})
+
+    def test_user_cart(self):
+        self.fill_and_check(self.make_request(user=self.user))
+        self.assertEqual(Cart.objects.get().user, self.user)
+        store = CartStore(self.make_request(user=self.user))
+        self.assertEqual(store.items(), {self.products[0]: 2})
+
+    def test_clear(self):
+        store = CartStore(self.make_request(user=self.user))
+        store.add(self.products[0], 1)
+        store.clear()
+        self.assertEqual(store.items(), {})
+
+    def log_in(self, request):
+        login(request, self.user, "django.contrib.auth.backends.ModelBackend")
+
+    def test_login_merges_session_cart(self):
+        first, second, third = self.products
+        user_store = CartStore(self.make_request(user=self.user))
+        user_store.add(first, MAX_CART_QUANTITY - 2)
+        user_store.add(second, 1)
+
+        request = self.make_request()
+        anonymous_store = CartStore(request)
+        anonymous_store.add(first, 5)
+        anonymous_store.add(third, 2)
+        anonymous_cart_id = request.session[CART_SESSION_KEY]
+
+        self.log_in(request)
+        self.assertEqual(
+            CartStore(request).items(),
+            {first: MAX_CART_QUANTITY, second: 1, third: 2},
+        )
+        self.assertNotIn(CART_SESSION_KEY, request.session)
+        self.assertFalse(Cart.objects.filter(id=anonymous_cart_id).exists())
+
+    def test_login_without_user_cart(self):
+        request = self.make_request()
+        CartStore(request).add(self.products[0], 2)
+
+        self.log_in(request)
+        self.assertEqual(CartStore(request).items(), {self.products[0]: 2})
+        self.assertEqual(Cart.objects.get().user, self.user)
+
+    def test_purge_abandoned_carts(self):
+        expired = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE + 60)
+        abandoned = Cart.objects.create()
+        CartItem.objects.create(cart=abandoned, product_id=self.products[0])
+        recent = Cart.objects.create()
+        # Old cart, but an item was changed recently
+        touched = Cart.objects.create()
+        CartItem.objects.create(cart=touched, product_id=self.products[0])
+        user_cart = Cart.objects.create(user=self.user)
+        Cart.objects.exclude(id=recent.id).update(updated_at=expired)
+        CartItem.objects.filter(cart=abandoned).update(updated_at=expired)
+
+        purge_abandoned_carts()
+        self.assertQuerySetEqual(
+            Cart.objects.order_by("id"),
+            [recent, touched, user_cart],
+        )
+        self.assertFalse(CartItem.objects.filter(cart_id=abandoned.id).exists())
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET="webhook-secret")
+class RazorpayWebhookTests(TestCase):
+    """Webhook intake and the reconciliation of payment states with orders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="payer", password="x")
+        cls.order = UserOrder.objects.create(
+            user=user, created_by=user, updated_by=user, transaction_id="order_1"
+        )
+
+    def deliver(self, event, payment_id, event_id=None, signature=None):
+        body = json.dumps(
+            {
+                "event": event,
+                "payload": {
+                    "payment": {"entity": {"id": payment_id, "order_id": "order_1"}}
+                },
+            }
+        ).encode()
+        if signature is None:
+            signature = hmac.new(b"webhook-secret", body, hashlib.sha256).hexdigest()
+        headers = {"X-Razorpay-Signature": signature}
+        if event_id:
+            headers["X-Razorpay-Event-Id"] = event_id
+        return self.client.post(
+            "/webhook/razorpay/", body, content_type="application/json", headers=headers
+        )
+
+    def payment_status(self):
+        self.order.refresh_from_db()
+        return self.order.payment_status
+
+    def test_bad_signature_is_rejected(self):
+        response = self.deliver("payment.captured", "pay_1", signature="forged")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentLogs.objects.exists())
+
+    def test_duplicate_event_is_stored_once(self):
+        for _ in range(2):
+            response = self.deliver("payment.captured", "pay_1", event_id="evt_1")
+            self.assertEqual(response.status_code, 200)
+        # Without an event id, deliveries are deduplicated by content
+        for _ in range(2):
+            self.deliver("payment.failed", "pay_2")
+        self.assertEqual(PaymentLogs.objects.count(), 2)
+
+        self.assertEqual(process_webhook_events(), 2)
+        self.assertEqual(process_webhook_events(), 0)
+
+    def test_failure_after_capture_in_one_batch(self):
+        self.deliver("payment.captured", "pay_1", event_id="evt_1")
+        self.deliver("payment.failed", "pay_1", event_id="evt_2")
+        process_webhook_events()
+        self.assertEqual(self.payment_status(), "S")
+
+    def test_failure_after_capture_in_later_batch(self):
+        self.deliver("payment.captured", "pay_1", event_id="evt_1")
+        process_webhook_events()
+        self.deliver("payment.failed", "pay_1", event_id="evt_2")
+        process_webhook_events()
+        self.assertEqual(self.payment_status(), "S")
+
+    def test_retry_succeeds_after_failed_attempt(self):
+        self.deliver("payment.failed", "pay_1", event_id="evt_1")
+        process_webhook_events(batch_size=1)
+        self.assertEqual(self.payment_status(), "F")
+        self.deliver("payment.captured", "pay_2", event_id="evt_2")
+        process_webhook_events(batch_size=1)
+        self.assertEqual(self.payment_status(), "S")
+
+
+class AsyncCartViewTests(TestCase):
+    """The async cart and wishlist views, served through the ASGI handler."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="shopper", password="x")
+        audit = {"created_by": cls.user, "updated_by": cls.user}
+        category = Category.objects.create(name="Mugs", description="Mugs", **audit)
+        cls.product = Product.objects.create(
+            name="Mug",
+            short_description="Mug",
+            long_description="Mug",
+            price=10,
+            category=category,
+            quantity=5,
+            **audit,
+        )
+
+    async def post(self, url, data):
+        response = await self.async_client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    async def test_add_to_cart(self):
+        url = f"/add-cart/{self.product.id}"
+        result = await self.post(url, {"quantity": 2})
+        self.assertEqual((result["status"], result["cart_item_count"]), ("success", 2))
+        # The session cookie keeps the cart of the anonymous visitor
+        result = await self.post(url, {"quantity": 1})
+        self.assertEqual(result["cart"], {str(self.product.id): 3})
+
+        result = await self.post(url, {"quantity": 3})
+        self.assertEqual(result["msg"], "Not enough stock available.")
+        result = await self.post(url, {"quantity": 0})
+        self.assertEqual(result["msg"], "Quantity is required.")
+        item = await CartItem.objects.aget()
+        self.assertEqual(item.quantity, 3)
+
+    async def test_update_cart_quantity(self):
+        await self.post(f"/add-cart/{self.product.id}", {"quantity": 2})
+        url = f"/update-cart/{self.product.id}"
+
+        result = await self.post(url, {"quantity": 1, "operation": "cart_quantity_up"})
+        self.assertEqual((result["cart_quantity"], result["sub_total_amount"]), (3, 30))
+        result = await self.post(
+            url, {"quantity": 2, "operation": "cart_quantity_down"}
+        )
+        self.assertEqual(result["cart_quantity"], 1)
+        result = await self.post(
+            url, {"quantity": 1, "operation": "cart_quantity_down"}
+        )
+        self.assertEqual(result["msg"], "Minimum quantity is 1.")
+        result = await self.post(url, {"quantity": 5, "operation": "cart_quantity_up"})
+        self.assertEqual(result["msg"], "Not enough stock available.")
+
+    async def test_add_to_wishlist(self):
+        url = f"/add-wishlist/{self.product.id}"
+        response = await self.async_client.post(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(await UserWishList.objects.aexists())
+
+        await sync_to_async(self.async_client.force_login)(self.user)
+        result = await self.post(url, {})
+        self.assertEqual(
+            (result["msg"], result["wishlist_item_count"]),
+            ("Product added to wishlist", 1),
+        )
+        result = await self.post(url, {})
+        self.assertEqual(result["msg"], "Product already in wishlist")
+        self.assertEqual(await UserWishList.objects.filter(user=self.user).acount(), 1)
@@ -1,12 +1,16 @@
 from datetime import datetime
 
+from django.db.models import Count
+
 from admin_panel.utils import (
     send_admin_notification_for_new_order_placed,
     send_order_confirmation_email,
 )
+from admin_panel.counters import increment
+from admin_panel.coupons import coupon_index
 from admin_panel.models import Coupon, Address, EmailTemplate
 from product_management.models import Product
-from order_management.models import UserOrder, OrderDetail
+from order_management.models import UserOrder, OrderDetail, UserWishList
 
 
 def calculate_sub_total_amount(cart, total_amount):
@@ -19,6 +23,22 @@ def calculate_sub_total_amount(cart, total_amount):
     return total_amount, cart_products
 
 
+async def acalculate_sub_total_amount(cart, total_amount):
+    """calculate_sub_total_amount for async views, in a single query."""
+    products = {
+        product.id: product
+        async for product in Product.objects.filter(id__in=list(cart))
+    }
+    cart_products = []
+    for product_id, quantity in cart.items():
+        if product_id not in products:
+            raise Product.DoesNotExist(f"Product {product_id} does not exist.")
+        product = products[product_id]
+        cart_products.append({"product": product, "quantity": quantity})
+        total_amount += product.price * quantity
+    return total_amount, cart_products
+
+
 def create_user_order(
     user,
     cart,
@@ -44,9 +64,12 @@ def create_user_order(
         discount_percent = applied_coupon["discount_percent"]
         discount_amount = (total_amount) * (discount_percent / 100)
         total_amount -= discount_amount  # Update total_amount with discount
-        coupon = Coupon.objects.filter(code=coupon_code).first()
-        coupon.count = coupon.count + 1
-        coupon.save()
+        # The coupon may have expired since it was applied to the cart
+        coupon = (
+            coupon_index.get(coupon_code)
+            or Coupon.objects.filter(code=coupon_code).first()
+        )
+        increment(Coupon, "count", coupon.id)
 
     # Create UserOrder
     order = UserOrder(
@@ -128,3 +151,64 @@ def create_user_order(
     )
 
     return order
+
+
+def build_wishlist_summary(since, top_products=20, top_users=20, products_per_user=10):
+    """
+    Summarise the wishlist entries added since ``since`` with GROUP BY queries,
+    so the cost does not grow with the number of rows held in Python.
+
+    Returns None when there are no entries, else a dict with the totals, the
+    most wishlisted products, the most active users and (for those users
+    only) their latest wishlisted products.
+    """
+    wishlist = UserWishList.objects.filter(created_at__gte=since).order_by()
+
+    totals = wishlist.aggregate(
+        items=Count("id"),
+        users=Count("user_id", distinct=True),
+        products=Count("product_id", distinct=True),
+    )
+    if not totals["items"]:
+        return None
+
+    products = list(
+        wishlist.values("product_id", "product__name", "product__price")
+        .annotate(count=Count("id"))
+        .order_by("-count", "product__name")[:top_products]
+    )
+    users = list(
+        wishlist.values("user_id", "user__username")
+        .annotate(count=Count("id"))
+        .order_by("-count", "user__username")[:top_users]
+    )
+
+    user_wishlist = {user["user__username"]: [] for user in users}
+    rows = (
+        wishlist.filter(user_id__in=[user["user_id"] for user in users])
+        .order_by("user_id", "-created_at")
+        .values_list("user__username", "product__name", "product__price")
+        .iterator(chunk_size=2000)
+    )
+    for username, name, price in rows:
+        if len(user_wishlist[username]) < products_per_user:
+            user_wishlist[username].append({"name": name, "price": price})
+
+    return {
+        "total_items": totals["items"],
+        "total_users": totals["users"],
+        "total_products": totals["products"],
+        "top_products": [
+            {
+                "name": product["product__name"],
+                "price": product["product__price"],
+                "count": product["count"],
+            }
+            for product in products
+        ],
+        "top_users": [
+            {"username": user["user__username"], "count": user["count"]}
+            for user in users
+        ],
+        "user_wishlist": user_wishlist,
+    }
@@ -1,25 +1,35 @@
-from django.utils import timezone
-import json
-
 from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
 from django.shortcuts import redirect, render, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.template.loader import get_template
 from django.core.paginator import Paginator
 from django.conf import settings
 from django.contrib import messages
+from django.db import transaction
 
-from weasyprint import HTML
-
-from admin_panel.models import Coupon, Address
+from admin_panel.coupons import coupon_index
+from admin_panel.models import Address
+from ecommerce.async_utils import aload_user_and_session, alogin_required
+from ecommerce.pdf import html_to_pdf
 from product_management.models import Product
 from order_management.models import UserOrder
 from user_management.forms import AddressForm
-from .models import PaymentGateway, PaymentLogs, UserWishList
-from .utils import calculate_sub_total_amount, create_user_order
-
-import razorpay
+from .cart import MAX_CART_QUANTITY, CartStore
+from .models import PaymentGateway, UserWishList
+from .payments import (
+    PaymentGatewayUnavailable,
+    create_razorpay_order,
+    verify_payment_signature,
+)
+from .tasks import process_webhook_events_task
+from .utils import (
+    acalculate_sub_total_amount,
+    calculate_sub_total_amount,
+    create_user_order,
+)
+from .webhooks import store_event, verify_signature
 
 
 # Create your views here.
@@ -31,7 +41,7 @@ def cart_list(request):
             # Remove the applied coupon from the session
             del request.session["applied_coupon"]
         total_amount = 0
-        cart = request.session.get("cart", {})
+        cart = CartStore(request).items()
         cart_products = []
         total_amount, cart_products = calculate_sub_total_amount(
             cart=cart, total_amount=total_amount
@@ -46,20 +56,20 @@ def cart_list(request):
         return HttpResponse(str(e))
 
 
-def add_to_cart(request, product_id):
-    """Add product to cart session."""
+async def add_to_cart(request, product_id):
+    """Add product to cart."""
     try:
         # Retrieve quantity from POST request and validate
         quantity = int(request.POST.get("quantity", 0))
         if quantity <= 0:
             return JsonResponse({"status": "error", "msg": "Quantity is required."})
 
-        # Get the current cart from the session
-        cart = request.session.get("cart", {})
-        product_id_str = str(product_id)
-        current_quantity = cart.get(product_id_str, 0)
+        # Get the current quantity from the cart
+        await aload_user_and_session(request)
+        cart_store = CartStore(request)
+        current_quantity = await cart_store.aget(product_id)
 
-        product = Product.objects.get(id=product_id)
+        product = await Product.objects.aget(id=product_id)
 
         if current_quantity + quantity > product.quantity:
             return JsonResponse(
@@ -70,8 +80,8 @@ def add_to_cart(request, product_id):
             )
 
         # Check for quantity limits
-        if quantity > 10 or current_quantity + quantity > 10:
-            available_quantity = 10 - current_quantity
+        if current_quantity + quantity > MAX_CART_QUANTITY:
+            available_quantity = MAX_CART_QUANTITY - current_quantity
             return JsonResponse(
                 {
                     "status": "error",
@@ -83,9 +93,9 @@ def add_to_cart(request, product_id):
                 }
             )
 
-        # Update cart and save to session
-        cart[product_id_str] = current_quantity + quantity
-        request.session["cart"] = cart
+        # Update the cart line
+        await cart_store.aadd(product_id, quantity)
+        cart = await cart_store.aitems()
 
         # Calculate total items in the cart
         cart_item_count = sum(cart.values())
@@ -103,7 +113,7 @@ def add_to_cart(request, product_id):
         return HttpResponse(f"An error occurred: {e}", status=500)
 
 
-def update_cart_product_quantity(request, product_id):
+async def update_cart_product_quantity(request, product_id):
     """update cart"""
     try:
         if request.method == "POST":
@@ -112,14 +122,15 @@ def update_cart_product_quantity(request, product_id):
                 return JsonResponse({"status": "error", "msg": "Quantity is required."})
 
             operation = request.POST.get("operation")
-            cart = request.session.get("cart", {})
-            product_id_str = str(product_id)
-            product = Product.objects.get(id=product_id)
+            await aload_user_and_session(request)
+            cart_store = CartStore(request)
+            current_quantity = await cart_store.aget(product_id)
+            product = await Product.objects.aget(id=product_id)
 
             if operation == "cart_quantity_up":
                 # Check if adding the quantity exceeds stock
-                new_quantity = cart.get(product_id_str, 0) + quantity
-                if cart.get(product_id_str, 0) >= 10:
+                new_quantity = current_quantity + quantity
+                if current_quantity >= MAX_CART_QUANTITY:
                     return JsonResponse(
                         {
                             "status": "error",
@@ -131,25 +142,27 @@ def update_cart_product_quantity(request, product_id):
                         {"status": "error", "msg": "Not enough stock available."}
                     )
                 response_message = "Quantity Increase successfully!"
-                cart[product_id_str] = new_quantity
+                await cart_store.aadd(product_id, quantity)
 
             elif operation == "cart_quantity_down":
                 # Prevent quantity from going below 1
-                new_quantity = cart.get(product_id_str, 0) - quantity
+                new_quantity = current_quantity - quantity
                 if new_quantity < 1:
                     return JsonResponse(
                         {"status": "error", "msg": "Minimum quantity is 1."}
                     )
-                cart[product_id_str] = new_quantity
+                await cart_store.aadd(product_id, -quantity)
                 response_message = "Quantity Decrease successfully!"
-            request.session["cart"] = cart
+            cart = await cart_store.aitems()
 
             sub_total_amount = 0
             # for product_id, quantity in cart.items():
             #     product = Product.objects.get(id=product_id)
             #     sub_total_amount += product.price * quantity
 
-            sub_total_amount, _ = calculate_sub_total_amount(cart, sub_total_amount)
+            sub_total_amount, _ = await acalculate_sub_total_amount(
+                cart, sub_total_amount
+            )
 
             # Retrieve applied coupon from the sessions
             total_amount = sub_total_amount
@@ -173,7 +186,7 @@ def update_cart_product_quantity(request, product_id):
                     "discount_percent": discount_percent,
                     "coupon_code": coupon_code,
                     "operation": operation,
-                    "cart_quantity": cart.get(product_id_str, 1),
+                    "cart_quantity": cart.get(product_id, 1),
                     "msg": response_message,
                 }
             )
@@ -185,10 +198,9 @@ def update_cart_product_quantity(request, product_id):
 def remove_cart_product(request, product_id):
     """remove cart"""
     try:
-        cart = request.session.get("cart", {})
-        product_id_str = str(product_id)
-        del cart[product_id_str]
-        request.session["cart"] = cart
+        cart_store = CartStore(request)
+        cart_store.remove(product_id)
+        cart = cart_store.items()
 
         sub_total_amount = 0
         # for product_id, quantity in cart.items():
@@ -229,7 +241,7 @@ def clear_cart(request):
     try:
         if request.method == "POST":
             # Remove all items from the cart
-            request.session["cart"] = {}
+            CartStore(request).clear()
             return JsonResponse({"status": "success", "message": "Cart cleared"})
         return JsonResponse(
             {"status": "error", "message": "Invalid request"}, status=400
@@ -245,21 +257,14 @@ def apply_coupon(request):
             coupon_code = request.POST.get("coupon_code")
             total_amount = float(request.POST.get("total_amount"))
 
-            coupon = Coupon.objects.filter(code=coupon_code, is_active=True).first()
+            # Only coupons valid right now are in the index
+            coupon = coupon_index.get(coupon_code)
 
             if not coupon:
                 return JsonResponse(
                     {"status": "error", "msg": "Invalid Coupon Code!"},
                     status=404,
                 )
-            if (
-                not coupon.start_date < timezone.now()
-                or not coupon.end_date > timezone.now()
-            ):
-                return JsonResponse(
-                    {"status": "error", "msg": "Invalid Coupon Code!"},
-                    status=404,
-                )
 
             discount_percent = coupon.discount
             request.session["applied_coupon"] = {
@@ -293,7 +298,7 @@ def remove_coupon(request):
             # Remove the applied coupon from the session
             del request.session["applied_coupon"]
 
-        cart = request.session.get("cart", {})
+        cart = CartStore(request).items()
         sub_total_amount = 0
         # for product_id, quantity in cart.items():
         #     product = Product.objects.get(id=product_id)
@@ -341,20 +346,22 @@ def wishlist_list(request):
         return HttpResponse(str(e))
 
 
-@login_required(login_url="login_page")
-def add_to_wishlist(request, product_id):
+@alogin_required(login_url="login_page")
+async def add_to_wishlist(request, product_id):
     """Add product to cart session"""
     try:
-        product = Product.objects.get(id=product_id)
+        product = await Product.objects.aget(id=product_id)
         if not product:
             return JsonResponse(
                 {"status": "error", "msg": "Invalid Product Id"}, status=400
             )
-        wishlist, created = UserWishList.objects.get_or_create(
+        wishlist, created = await UserWishList.objects.aget_or_create(
             user=request.user, product=product
         )
         # Calculate the number of items in the user's wishlist
-        wishlist_item_count = UserWishList.objects.filter(user=request.user).count()
+        wishlist_item_count = await UserWishList.objects.filter(
+            user=request.user
+        ).acount()
         if created:
             response_data = {
                 "msg": "Product added to wishlist",
@@ -418,7 +425,7 @@ def clear_wishlist(request):
 def checkout(request):
     try:
         sub_total_amount = 0
-        cart = request.session.get("cart", {})
+        cart = CartStore(request).items()
         cart_products = []
 
         addresses = Address.objects.filter(user=request.user, active=True).all()
@@ -484,7 +491,8 @@ def place_order(request):
             if not selected_payment:
                 return JsonResponse({"status": "error", "msg": "Select Payment Method"})
 
-            cart = request.session.get("cart", {})
+            cart_store = CartStore(request)
+            cart = cart_store.items()
             sub_total_amount = 0
             sub_total_amount, _ = calculate_sub_total_amount(cart, sub_total_amount)
 
@@ -505,19 +513,18 @@ def place_order(request):
             payment_response = dict()
             # Handle Razorpay payment
             if selected_payment == "payment_razorpay":
-                # Create Razorpay client
-                razorpay_client = razorpay.Client(
-                    auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
-                )
-
                 # Create an order in Razorpay
-                razorpay_order = razorpay_client.order.create(
-                    {
-                        "amount": int(total_amount * 100),  # Amount in paisa
-                        "currency": "INR",
-                        "payment_capture": "1",
-                    }
-                )
+                try:
+                    razorpay_order = create_razorpay_order(total_amount)
+                except PaymentGatewayUnavailable:
+                    return JsonResponse(
+                        {
+                            "status": "error",
+                            "msg": "Online payment is unavailable right now, "
+                            "please try again later or choose another method.",
+                        },
+                        status=503,
+                    )
                 razorpay_order_id = razorpay_order["id"]
 
                 payment_response = {
@@ -549,9 +556,8 @@ def place_order(request):
                     payment_gateway=payment_gateway,
                 )
 
-                # Clear the cart from session
-                if cart:
-                    del request.session["cart"]
+                # Clear the cart
+                cart_store.clear()
 
                 return JsonResponse(
                     {
@@ -583,22 +589,15 @@ def payment_handler(request):
 
             user = request.user
 
-            # Initialize Razorpay client
-            razorpay_client = razorpay.Client(
-                auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
-            )
-
-            params_dict = {
-                "razorpay_order_id": razorpay_order_id,
-                "razorpay_payment_id": payment_id,
-                "razorpay_signature": signature,
-            }
-
             # Verify the payment signature
-            razorpay_client.utility.verify_payment_signature(params_dict)
+            if not verify_payment_signature(razorpay_order_id, payment_id, signature):
+                return JsonResponse(
+                    {"status": "error", "msg": "Payment Failed Invalid signature"}
+                )
 
             # If payment verification is successful, create the order in your local database
-            cart = request.session.get("cart", {})
+            cart_store = CartStore(request)
+            cart = cart_store.items()
             applied_coupon = request.session.get("applied_coupon", None)
             if selected_payment == "payment_razorpay":
                 payment_gateway = PaymentGateway.objects.filter(name="Razorpay").first()
@@ -616,9 +615,8 @@ def payment_handler(request):
                 transaction_id=razorpay_order_id,
             )
 
-            # Clear the cart from session
-            if cart:
-                del request.session["cart"]
+            # Clear the cart
+            cart_store.clear()
 
             return JsonResponse(
                 {
@@ -628,11 +626,6 @@ def payment_handler(request):
                 }
             )
 
-        except razorpay.errors.SignatureVerificationError:
-            return JsonResponse(
-                {"status": "error", "msg": "Payment Failed Invalid signature"}
-            )
-
         except Exception as e:
             return JsonResponse({"status": "error", "msg": str(e)})
 
@@ -640,33 +633,27 @@ def payment_handler(request):
 
 
 @csrf_exempt
+@require_POST
 def razorpay_webhook(request):
-    """Handles webhook notifications from Razorpay."""
-    response = json.loads(request.body.decode("utf8"))
+    """
+    Handles webhook notifications from Razorpay. The event is verified and
+    queued, the orders are reconciled in the background.
+    """
+    if not verify_signature(
+        request.body, request.headers.get("X-Razorpay-Signature", "")
+    ):
+        return JsonResponse({"status": "error", "msg": "Invalid signature."}, status=400)
+
     try:
-        # Extract event and payload
-        event = response.get("event", "")
-        payload = response.get("payload", {})
-        razorpay_order_id = (
-            payload.get("payment", {}).get("entity", {}).get("order_id", "")
-        )
+        log = store_event(request.body, request.headers.get("X-Razorpay-Event-Id"))
+    except ValueError:
+        return JsonResponse({"status": "error", "msg": "Invalid payload."}, status=400)
 
-        PaymentLogs.objects.create(
-            pay_ord_id=razorpay_order_id,
-            pay_status=event,
-            response_dict=json.dumps(response),
-        )
+    if log is not None:
+        transaction.on_commit(process_webhook_events_task.delay)
 
-        return JsonResponse(
-            {"status": "success", "msg": "Webhook processed successfully."}
-        )
-    except Exception as e:
-        PaymentLogs.objects.create(
-            pay_ord_id="",
-            pay_status="Exception",
-            response_dict=json.dumps({"response": response, "error": str(e)}),
-        )
-        return JsonResponse({"status": "error", "msg": str(e)}, status=500)
+    # Razorpay retries until it gets a 2xx, duplicates are acknowledged too
+    return JsonResponse({"status": "success", "msg": "Webhook received."})
 
 
 @login_required(login_url="login_page")
@@ -711,7 +698,7 @@ def order_pdf_view(request, order_id):
         )
 
         # Generate PDF
-        pdf_file = HTML(string=html_content).write_pdf()
+        pdf_file = html_to_pdf(html_content)
 
         # Return PDF as response
         response = HttpResponse(pdf_file, content_type="application/pdf")
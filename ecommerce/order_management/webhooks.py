@@ -0,0 +1,151 @@
+"""
+Razorpay webhook intake and reconciliation.
+
+The webhook view only verifies the signature and stores the event, so it
+answers Razorpay quickly. ``PaymentLogs`` doubles as the queue:
+
+- ``event_id`` is unique, so retried deliveries of an event are dropped at
+  insert time,
+- ``process_webhook_events`` (a Celery task, also run periodically) reads the
+  unprocessed rows in batches, keeps the latest state of every payment and
+  updates ``UserOrder.payment_status`` with one UPDATE per status.
+
+Payment events often arrive before the customer's browser returns and the
+order is created, so events without a matching order stay queued until
+``PAYMENT_WEBHOOK_MATCH_WINDOW`` has passed.
+"""
+
+import hashlib
+import hmac
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import PaymentLogs, UserOrder
+
+
+# Webhook event -> UserOrder.payment_status. Other events are only logged.
+EVENT_PAYMENT_STATUS = {
+    "payment.captured": "S",
+    "order.paid": "S",
+    "payment.failed": "F",
+}
+
+
+def verify_signature(body, signature, secret=None):
+    """Check the X-Razorpay-Signature header (HMAC-SHA256 of the raw body)."""
+    secret = secret or settings.RAZORPAY_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def store_event(body, event_id=None):
+    """
+    Queue a verified webhook body. Returns the new PaymentLogs row, or None
+    when the event was already received.
+    """
+    event = json.loads(body)
+    payment = event.get("payload", {}).get("payment", {}).get("entity", {})
+    order = event.get("payload", {}).get("order", {}).get("entity", {})
+
+    try:
+        with transaction.atomic():
+            return PaymentLogs.objects.create(
+                # Deliveries without an event id are deduplicated by content
+                event_id=event_id or hashlib.sha256(body).hexdigest(),
+                pay_ord_id=payment.get("order_id") or order.get("id") or "",
+                payment_id=payment.get("id") or "",
+                pay_status=event.get("event", "")[:50],
+                payload=zlib.compress(
+                    json.dumps(event, separators=(",", ":")).encode()
+                ),
+            )
+    except IntegrityError:
+        return None
+
+
+def _latest_statuses(events):
+    """
+    Return {razorpay order id: payment status} from (order id, payment id,
+    event) rows in arrival order. Each payment keeps its latest state, except
+    that a captured payment stays captured (a late failure event is out of
+    order), and an order is paid as soon as one of its payments succeeded.
+    """
+    payments = {}
+    for razorpay_order_id, payment_id, event in events:
+        status = EVENT_PAYMENT_STATUS.get(event)
+        key = (razorpay_order_id, payment_id or event)
+        if razorpay_order_id and status and payments.get(key) != "S":
+            payments[key] = status
+
+    statuses = {}
+    for (razorpay_order_id, _), status in payments.items():
+        if statuses.get(razorpay_order_id) != "S":
+            statuses[razorpay_order_id] = status
+    return statuses
+
+
+def process_webhook_events(batch_size=None):
+    """
+    Reconcile queued webhook events with the orders. Returns the number of
+    events processed.
+    """
+    batch_size = batch_size or settings.PAYMENT_WEBHOOK_BATCH_SIZE
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    match_deadline = timezone.now() - timedelta(
+        seconds=settings.PAYMENT_WEBHOOK_MATCH_WINDOW
+    )
+
+    processed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                PaymentLogs.objects.select_for_update(skip_locked=skip_locked)
+                .filter(processed_at__isnull=True, id__gt=last_id)
+                .order_by("id")
+                .values_list(
+                    "id", "pay_ord_id", "payment_id", "pay_status", "created_at"
+                )[:batch_size]
+            )
+            if not events:
+                break
+            last_id = events[-1][0]
+
+            statuses = _latest_statuses(event[1:4] for event in events)
+            paid = [order_id for order_id, status in statuses.items() if status == "S"]
+            failed = [order_id for order_id, status in statuses.items() if status == "F"]
+
+            # A failed attempt never overrides a successful payment
+            UserOrder.objects.filter(transaction_id__in=paid).exclude(
+                payment_status="S"
+            ).update(payment_status="S", updated_at=timezone.now())
+            UserOrder.objects.filter(
+                transaction_id__in=failed, payment_status="P"
+            ).update(payment_status="F", updated_at=timezone.now())
+
+            matched = set(
+                UserOrder.objects.filter(transaction_id__in=list(statuses))
+                .order_by()
+                .values_list("transaction_id", flat=True)
+            )
+            done = [
+                event_id
+                for event_id, razorpay_order_id, _, _, created_at in events
+                if razorpay_order_id not in statuses
+                or razorpay_order_id in matched
+                or created_at < match_deadline
+            ]
+            PaymentLogs.objects.filter(id__in=done).update(
+                processed_at=timezone.now()
+            )
+
+        processed += len(done)
+
+    return processed
@@ -6,6 +6,7 @@ from .models import (
     ProductAttribute,
     ProductAttributeValue,
     ProductImage,
+    ProductRecommendation,
 )
 
 
@@ -40,6 +41,7 @@ class ProductAdmin(admin.ModelAdmin):
         "long_description",
         "price",
         "quantity",
+        "view_count",
         "is_active",
         "created_by",
         "created_at",
@@ -89,3 +91,9 @@ class ProductAttributeValueAdmin(admin.ModelAdmin):
         "updated_by",
         "updated_at",
     ]
+
+
+@admin.register(ProductRecommendation)
+class ProductRecommendationAdmin(admin.ModelAdmin):
+    raw_id_fields = ("product", "recommended_product")
+    list_display = ["id", "product", "recommended_product", "score", "created_at"]
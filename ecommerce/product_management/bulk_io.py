@@ -0,0 +1,384 @@
+"""
+Streaming bulk import and export of products.
+
+Files are CSV or JSON Lines with one product per row:
+
+    name, short_description, long_description, price, quantity, category,
+    is_active, attributes, images
+
+``category`` is a category id or name. ``attributes`` maps an attribute name
+to a list of values (a JSON string in CSV files) and ``images`` lists image
+paths relative to MEDIA_ROOT (separated by "|" in CSV files).
+
+Rows are read lazily and handled in chunks. Each chunk is validated in a
+process pool, then written with ``bulk_create`` in a single transaction, so
+a 50k-row catalog never has to fit in memory or go through per-row saves.
+"""
+
+import csv
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils._os import safe_join
+
+from .models import (
+    Category,
+    Product,
+    ProductAttribute,
+    ProductAttributeValue,
+    ProductImage,
+)
+
+
+PRODUCT_FIELDS = [
+    "name",
+    "short_description",
+    "long_description",
+    "price",
+    "quantity",
+    "category",
+    "is_active",
+    "attributes",
+    "images",
+]
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n"}
+# Largest value of the quantity column (a signed 32-bit integer)
+MAX_QUANTITY = 2**31 - 1
+
+
+def detect_format(path, file_format=None):
+    """Return "csv" or "jsonl" from the explicit format or the file extension."""
+    if file_format:
+        return file_format
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_rows(file, file_format):
+    """Yield (line number, raw row dict) from a CSV or JSON Lines file."""
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, {"__error__": f"Invalid JSON: {e}"}
+            continue
+        if not isinstance(row, dict):
+            row = {"__error__": "Each line must be a JSON object"}
+        yield line_number, row
+
+
+def validate_row(item):
+    """
+    Validate and normalise one raw row. Runs in a worker process, so it must
+    not touch the database.
+
+    Returns (line number, cleaned row or None, list of errors).
+    """
+    line_number, row, media_root = item
+    if "__error__" in row:
+        return line_number, None, [row["__error__"]]
+
+    errors = []
+    cleaned = {}
+
+    for field, max_length in (("name", 200), ("short_description", 100)):
+        value = str(row.get(field) or "").strip()
+        if not value:
+            errors.append(f"{field} is required")
+        elif len(value) > max_length:
+            errors.append(f"{field} is longer than {max_length} characters")
+        cleaned[field] = value
+    cleaned["long_description"] = str(row.get("long_description") or "").strip()
+
+    try:
+        cleaned["price"] = float(row.get("price"))
+        # "nan" and "inf" parse as floats but fail the whole chunk's insert
+        if not math.isfinite(cleaned["price"]):
+            errors.append("price must be a finite number")
+        elif cleaned["price"] < 0:
+            errors.append("price cannot be negative")
+    except (TypeError, ValueError):
+        errors.append("price must be a number")
+
+    try:
+        cleaned["quantity"] = int(row.get("quantity"))
+        if cleaned["quantity"] < 0:
+            errors.append("quantity cannot be negative")
+        elif cleaned["quantity"] > MAX_QUANTITY:
+            errors.append(f"quantity cannot be more than {MAX_QUANTITY}")
+    except (TypeError, ValueError):
+        errors.append("quantity must be an integer")
+
+    category = str(row.get("category") or "").strip()
+    if not category:
+        errors.append("category is required")
+    cleaned["category"] = category
+
+    is_active = row.get("is_active", True)
+    if isinstance(is_active, str):
+        if is_active.strip().lower() in TRUE_VALUES or not is_active.strip():
+            is_active = True
+        elif is_active.strip().lower() in FALSE_VALUES:
+            is_active = False
+        else:
+            errors.append("is_active must be true or false")
+    cleaned["is_active"] = bool(is_active)
+
+    attributes = row.get("attributes") or {}
+    if isinstance(attributes, str):
+        try:
+            attributes = json.loads(attributes)
+        except ValueError:
+            attributes = None
+    if not isinstance(attributes, dict):
+        errors.append("attributes must be an object of name: [values]")
+        attributes = {}
+    cleaned["attributes"] = {}
+    for name, values in attributes.items():
+        values = values if isinstance(values, list) else [values]
+        if len(str(name)) > 50 or any(len(str(value)) > 50 for value in values):
+            errors.append(f"attribute {name!r} is longer than 50 characters")
+        cleaned["attributes"][str(name)] = [str(value) for value in values]
+
+    images = row.get("images") or []
+    if isinstance(images, str):
+        images = [image.strip() for image in images.split("|") if image.strip()]
+    cleaned["images"] = []
+    for image in images:
+        try:
+            if os.path.isabs(image):
+                raise SuspiciousFileOperation(image)
+            # Rejects "../" paths escaping MEDIA_ROOT
+            path = safe_join(media_root, image)
+        except SuspiciousFileOperation:
+            errors.append(f"image {image!r} is not a path inside MEDIA_ROOT")
+            continue
+        if not os.path.isfile(path):
+            errors.append(f"image {image!r} does not exist")
+        cleaned["images"].append(image)
+
+    return line_number, (None if errors else cleaned), errors
+
+
+def _category_map():
+    """Map category ids and (case-insensitive) names to category ids."""
+    categories = {}
+    ambiguous = set()
+    for category_id, name in Category.objects.values_list("id", "name"):
+        categories[str(category_id)] = category_id
+        key = name.strip().lower()
+        if key in categories:
+            ambiguous.add(key)
+        categories[key] = category_id
+    for key in ambiguous:
+        categories[key] = None
+    return categories
+
+
+def _created_ids(model, objects, lookup_fields):
+    """
+    Make sure bulk-created objects have their primary key set. Databases that
+    cannot return ids from a bulk insert (MySQL) are re-queried by natural key.
+    """
+    if connection.features.can_return_rows_from_bulk_insert or not objects:
+        return
+    filters = {
+        f"{field}__in": {getattr(obj, field) for obj in objects}
+        for field in lookup_fields
+    }
+    ids = {
+        tuple(values[:-1]): values[-1]
+        for values in model.objects.filter(**filters).values_list(
+            *lookup_fields, "id"
+        )
+    }
+    for obj in objects:
+        obj.id = ids[tuple(getattr(obj, field) for field in lookup_fields)]
+
+
+def _write_chunk(rows, user):
+    """Create the products of a chunk of cleaned rows with their attributes and images."""
+    audit = {"created_by": user, "updated_by": user}
+
+    with transaction.atomic():
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=row["name"],
+                    short_description=row["short_description"],
+                    long_description=row["long_description"],
+                    price=row["price"],
+                    quantity=row["quantity"],
+                    category_id=row["category_id"],
+                    is_active=row["is_active"],
+                    **audit,
+                )
+                for row in rows
+            ]
+        )
+        _created_ids(Product, products, ["name"])
+
+        attributes = []
+        attribute_values = []
+        images = []
+        for product, row in zip(products, rows):
+            for name, values in row["attributes"].items():
+                attributes.append(
+                    ProductAttribute(name=name, product_id=product.id, **audit)
+                )
+                attribute_values.append(values)
+            images.extend(
+                ProductImage(image=image, product_id=product.id, **audit)
+                for image in row["images"]
+            )
+
+        ProductAttribute.objects.bulk_create(attributes)
+        _created_ids(ProductAttribute, attributes, ["product_id", "name"])
+        ProductAttributeValue.objects.bulk_create(
+            [
+                ProductAttributeValue(
+                    product_attribute_id=attribute.id, attribute_value=value, **audit
+                )
+                for attribute, values in zip(attributes, attribute_values)
+                for value in values
+            ]
+        )
+        ProductImage.objects.bulk_create(images)
+
+
+def import_products(
+    file, file_format, user, report_error, chunk_size=1000, workers=None
+):
+    """
+    Import products from an open CSV or JSON Lines file and return how many
+    were created.
+
+    ``report_error(line_number, name, errors)`` is called for every rejected
+    row. Products whose name already exists are rejected, like in add_product.
+    ``workers=0`` validates in the current process instead of a process pool.
+    """
+    categories = _category_map()
+    existing_names = set(Product.objects.values_list("name", flat=True))
+    media_root = str(settings.MEDIA_ROOT)
+
+    items = (
+        (line_number, row, media_root)
+        for line_number, row in read_rows(file, file_format)
+    )
+
+    executor = None
+    if workers != 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+
+    imported = 0
+    try:
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+
+            if executor:
+                results = executor.map(
+                    validate_row, chunk, chunksize=max(1, len(chunk) // 16)
+                )
+            else:
+                results = map(validate_row, chunk)
+
+            valid_rows = []
+            for (line_number, row, _), (_, cleaned, errors) in zip(chunk, results):
+                if cleaned:
+                    category_id = categories.get(cleaned["category"].lower())
+                    if category_id is None:
+                        errors.append(
+                            f"category {cleaned['category']!r} is ambiguous, use its id"
+                            if cleaned["category"].lower() in categories
+                            else f"category {cleaned['category']!r} does not exist"
+                        )
+                    elif cleaned["name"] in existing_names:
+                        errors.append("a product with this name already exists")
+                    else:
+                        cleaned["category_id"] = category_id
+                        existing_names.add(cleaned["name"])
+                        valid_rows.append(cleaned)
+                if errors:
+                    report_error(line_number, row.get("name", ""), errors)
+
+            if valid_rows:
+                _write_chunk(valid_rows, user)
+                imported += len(valid_rows)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return imported
+
+
+def export_products(file, file_format, queryset=None, chunk_size=2000):
+    """Stream products with their attributes and images to an open file."""
+    queryset = queryset if queryset is not None else Product.objects.all()
+    products = (
+        queryset.order_by("id")
+        .select_related("category")
+        .prefetch_related(
+            "product_attribute__product_attribute_key",
+            Prefetch(
+                "product_images",
+                queryset=ProductImage.objects.filter(deleted_at__isnull=True),
+            ),
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    writer = None
+    if file_format == "csv":
+        writer = csv.DictWriter(file, fieldnames=PRODUCT_FIELDS)
+        writer.writeheader()
+
+    exported = 0
+    for product in products:
+        attributes = {
+            attribute.name: [
+                value.attribute_value
+                for value in attribute.product_attribute_key.all()
+            ]
+            for attribute in product.product_attribute.all()
+        }
+        images = [image.image.name for image in product.product_images.all()]
+        row = {
+            "name": product.name,
+            "short_description": product.short_description,
+            "long_description": product.long_description,
+            "price": product.price,
+            "quantity": product.quantity,
+            "category": product.category_id,
+            "is_active": product.is_active,
+        }
+        if writer:
+            writer.writerow(
+                {**row, "attributes": json.dumps(attributes), "images": "|".join(images)}
+            )
+        else:
+            file.write(
+                json.dumps({**row, "attributes": attributes, "images": images}) + "\n"
+            )
+        exported += 1
+
+    return exported
@@ -1,48 +1,52 @@
 import random
 
-from admin_panel.models import UserEventTracking
 from .models import Product, ProductImage, Category
+from .recommendations import get_recommended_products
+from django.core.cache import cache
 from django.db.models import Prefetch
 
 
-def recommended_product(request):
-    products = (
-        Product.objects.filter(is_active=True)
-        .select_related("category")
-        .prefetch_related(
-            Prefetch(
-                "product_images",
-                queryset=ProductImage.objects.filter(is_active=True)[:1],
-                to_attr="first_image",
-            )
+# Random active product ids the fallback recommendations are drawn from,
+# refreshed every RANDOM_PRODUCTS_TIMEOUT seconds
+RANDOM_PRODUCTS_KEY = "random_product_ids"
+RANDOM_PRODUCTS_POOL_SIZE = 200
+RANDOM_PRODUCTS_TIMEOUT = 10 * 60
+
+
+def get_random_product_ids():
+    product_ids = cache.get(RANDOM_PRODUCTS_KEY)
+    if product_ids is None:
+        product_ids = list(
+            Product.objects.filter(is_active=True)
+            .order_by("?")
+            .values_list("id", flat=True)[:RANDOM_PRODUCTS_POOL_SIZE]
         )
-    )
+        cache.set(RANDOM_PRODUCTS_KEY, product_ids, RANDOM_PRODUCTS_TIMEOUT)
+    return product_ids
 
-    recommended_products = random.sample(list(products), min(len(products), 6))
 
+def recommended_product(request):
+    recommended_products = []
     if request.user.is_authenticated:
-        # Get the most recent events related to product views or other relevant events
-        recent_events = UserEventTracking.objects.filter(
-            user=request.user, event_type="product_view"
-        ).order_by("-event_time")[:100]
-
-        # Extract product_ids from the object_info
-        product_ids = [
-            event.object_info for event in recent_events if event.object_info
-        ]
-        if len(product_ids) > 3:
-            # Fetch all products using a single query for the product_ids
-            recommended_products = (
-                Product.objects.filter(id__in=product_ids)
-                .prefetch_related(
-                    Prefetch(
-                        "product_images",
-                        queryset=ProductImage.objects.filter(is_active=True)[:1],
-                        to_attr="first_image",
-                    )
+        recommended_products = get_recommended_products(request.user, 9)
+
+    if len(recommended_products) <= 3:
+        # Pick random ids first so only the sampled products are loaded
+        product_ids = get_random_product_ids()
+        recommended_products = list(
+            Product.objects.filter(
+                id__in=random.sample(product_ids, min(len(product_ids), 6)),
+                is_active=True,
+            )
+            .select_related("category")
+            .prefetch_related(
+                Prefetch(
+                    "product_images",
+                    queryset=ProductImage.objects.filter(is_active=True)[:1],
+                    to_attr="first_image",
                 )
-                .distinct()
-            )[:9]
+            )
+        )
 
     chunked_products = [
         recommended_products[i : i + 3] for i in range(0, len(recommended_products), 3)
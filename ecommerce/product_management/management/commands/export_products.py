@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from product_management.bulk_io import detect_format, export_products
+from product_management.models import Product
+
+
+class Command(BaseCommand):
+    help = "Stream all products (with attributes and images) to a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file, or - for stdout")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument(
+            "--active-only", action="store_true", help="Only export active products"
+        )
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.all()
+        if options["active_only"]:
+            queryset = queryset.filter(is_active=True)
+
+        file_format = detect_format(options["path"], options["format"])
+        if options["path"] == "-":
+            exported = export_products(sys.stdout, file_format, queryset)
+        else:
+            with open(options["path"], "w", newline="", encoding="utf-8") as file:
+                exported = export_products(file, file_format, queryset)
+
+        self.stderr.write(self.style.SUCCESS(f"Exported {exported} products."))
@@ -0,0 +1,72 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product_management.bulk_io import detect_format, import_products
+from user_management.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk import products (with attributes and images) from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file to import")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument(
+            "--user",
+            help="Username recorded as creator (defaults to the first superuser)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Validation processes (0 validates in this process)",
+        )
+        parser.add_argument(
+            "--errors", help="Write rejected rows to this CSV file instead of stderr"
+        )
+
+    def handle(self, *args, **options):
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by("id").first()
+        if not user:
+            raise CommandError("No user found to record as the products' creator.")
+
+        error_file = None
+        error_writer = None
+        if options["errors"]:
+            error_file = open(options["errors"], "w", newline="", encoding="utf-8")
+            error_writer = csv.writer(error_file)
+            error_writer.writerow(["line", "name", "errors"])
+
+        rejected = 0
+
+        def report_error(line_number, name, errors):
+            nonlocal rejected
+            rejected += 1
+            if error_writer:
+                error_writer.writerow([line_number, name, "; ".join(errors)])
+            else:
+                self.stderr.write(f"Line {line_number} ({name}): {'; '.join(errors)}")
+
+        file_format = detect_format(options["path"], options["format"])
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as file:
+                imported = import_products(
+                    file,
+                    file_format,
+                    user,
+                    report_error,
+                    chunk_size=options["chunk_size"],
+                    workers=options["workers"],
+                )
+        finally:
+            if error_file:
+                error_file.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {imported} products, rejected {rejected} rows.")
+        )
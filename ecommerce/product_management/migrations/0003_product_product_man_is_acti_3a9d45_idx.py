@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-19 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0002_productattribute_deleted_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'category', 'price'], name='product_man_is_acti_3a9d45_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.14 on 2026-10-19 08:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0003_product_product_man_is_acti_3a9d45_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='product_management.product')),
+                ('recommended_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product_management.product')),
+            ],
+            options={
+                'ordering': ['product', '-score'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productrecommendation',
+            constraint=models.UniqueConstraint(fields=('product', 'recommended_product'), name='unique_product_recommendation'),
+        ),
+    ]
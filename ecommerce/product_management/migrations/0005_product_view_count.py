@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-19 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0004_productrecommendation_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='View Count'),
+        ),
+    ]
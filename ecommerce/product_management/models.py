@@ -31,6 +31,12 @@ class Product(BaseModel):
     )
     quantity = models.IntegerField()
     is_active = models.BooleanField(default=True)
+    view_count = models.PositiveIntegerField(default=0, verbose_name="View Count")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "category", "price"]),
+        ]
 
     def __str__(self):
         return f"{self.name} {self.quantity}"
@@ -44,6 +50,12 @@ class Product(BaseModel):
         self.save(using=using)
 
 
+class ProductImageQuerySet(models.QuerySet):
+    def visible(self):
+        """Images shown on the storefront: not deleted from the admin."""
+        return self.filter(deleted_at__isnull=True, is_active=True)
+
+
 class ProductImage(BaseModel):
     image = models.ImageField(upload_to="product_images/")
     product = models.ForeignKey(
@@ -54,6 +66,9 @@ class ProductImage(BaseModel):
         verbose_name="Product foreign key",
     )
     is_active = models.BooleanField(default=True)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = ProductImageQuerySet.as_manager()
 
 
 class ProductAttribute(BaseModel):
@@ -74,3 +89,28 @@ class ProductAttributeValue(BaseModel):
 
     def __str__(self):
         return f"{self.attribute_value}"
+
+
+class ProductRecommendation(models.Model):
+    """Precomputed item-to-item neighbours of a product"""
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="recommendations"
+    )
+    recommended_product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="+"
+    )
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["product", "-score"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "recommended_product"],
+                name="unique_product_recommendation",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_product_id} ({self.score:.3f})"
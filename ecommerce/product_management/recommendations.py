@@ -0,0 +1,268 @@
+"""
+Item-to-item product recommendations.
+
+``build_product_recommendations`` runs offline (see ``product_management.tasks``)
+and scores every pair of products by how often they are viewed and bought
+together. The top neighbours of each product are stored in
+``ProductRecommendation`` and served through the cache, so a page view only
+needs the user's last few viewed products and a handful of cache lookups.
+Without a shared cache, the workers would not see a rebuild, so they read
+``ProductRecommendation`` directly.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from admin_panel.models import UserEventTracking
+from ecommerce.cache import cache_is_shared
+from ecommerce.db_router import read_from_replica
+from order_management.models import OrderDetail
+from .models import Product, ProductImage, ProductRecommendation
+
+
+# Relative weight of each signal in the combined similarity score
+CO_VIEW_WEIGHT = 1.0
+CO_PURCHASE_WEIGHT = 2.0
+
+# Number of recently viewed products used to recommend for a user
+RECENT_VIEWS_LIMIT = 20
+
+RECOMMENDATIONS_VERSION_KEY = "product_recommendations:version"
+USER_RECOMMENDATIONS_TIMEOUT = 10 * 60
+
+
+def _product_view_pairs(since):
+    """Yield (visitor, product_id) pairs for product views since the given time."""
+    events = (
+        UserEventTracking.objects.filter(
+            event_type="product_view", event_time__gte=since
+        )
+        .exclude(object_info__isnull=True)
+        .values_list("user_id", "session_id", "object_info")
+    )
+    for user_id, session_id, object_info in events.iterator(chunk_size=10000):
+        # Views without a user or a session cannot be told apart
+        if not object_info.isdigit() or not (user_id or session_id):
+            continue
+        visitor = f"user:{user_id}" if user_id else f"session:{session_id}"
+        yield visitor, int(object_info)
+
+
+def _order_product_pairs(since):
+    """Yield (order_id, product_id) pairs for orders placed since the given time."""
+    details = OrderDetail.objects.filter(
+        order__created_at__gte=since, product__isnull=False
+    ).values_list("order_id", "product_id")
+    yield from details.iterator(chunk_size=10000)
+
+
+def _interaction_matrix(pairs, product_index):
+    """Build a binary sparse matrix with one row per owner and one column per product."""
+    import numpy as np
+    from scipy import sparse
+
+    owner_index = {}
+    rows = []
+    columns = []
+    for owner, product_id in pairs:
+        column = product_index.get(product_id)
+        if column is None:
+            continue
+        rows.append(owner_index.setdefault(owner, len(owner_index)))
+        columns.append(column)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(len(owner_index), len(product_index)),
+    )
+    # Repeated views of the same product by one visitor count once
+    matrix.data[:] = 1
+    return matrix
+
+
+def _cosine_similarity(matrix):
+    """Item-item cosine similarity of the columns of a binary interaction matrix."""
+    import numpy as np
+    from scipy import sparse
+
+    co_occurrence = (matrix.T @ matrix).tocsr()
+    norms = np.sqrt(co_occurrence.diagonal())
+    norms[norms == 0] = 1
+    co_occurrence.setdiag(0)
+    co_occurrence.eliminate_zeros()
+
+    inverse_norms = sparse.diags(1 / norms)
+    return (inverse_norms @ co_occurrence @ inverse_norms).tocsr()
+
+
+def _top_k_neighbours(similarity, top_k):
+    """Yield (row, column, score) for the ``top_k`` best scores of every row."""
+    import numpy as np
+
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if start == end:
+            continue
+        scores = similarity.data[start:end]
+        columns = similarity.indices[start:end]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        for position in best[np.argsort(-scores[best])]:
+            yield row, columns[position], float(scores[position])
+
+
+def build_product_recommendations(lookback_days=None, top_k=None):
+    """
+    Rebuild the stored item-to-item recommendations.
+
+    Co-view similarity comes from product views (per user, or per session for
+    anonymous visitors) and co-purchase similarity from order details, both
+    limited to the lookback window. Returns the number of stored neighbours.
+    """
+    lookback_days = lookback_days or settings.RECOMMENDATION_LOOKBACK_DAYS
+    top_k = top_k or settings.RECOMMENDATION_TOP_K
+    since = timezone.now() - timedelta(days=lookback_days)
+
+    # The event and order scans are the heaviest reads of the site
+    with read_from_replica():
+        product_ids = list(
+            Product.objects.filter(is_active=True)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        product_index = {
+            product_id: index for index, product_id in enumerate(product_ids)
+        }
+
+        co_view = _cosine_similarity(
+            _interaction_matrix(_product_view_pairs(since), product_index)
+        )
+        co_purchase = _cosine_similarity(
+            _interaction_matrix(_order_product_pairs(since), product_index)
+        )
+    similarity = (
+        CO_VIEW_WEIGHT * co_view + CO_PURCHASE_WEIGHT * co_purchase
+    ).tocsr()
+
+    recommendations = [
+        ProductRecommendation(
+            product_id=product_ids[row],
+            recommended_product_id=product_ids[column],
+            score=score,
+        )
+        for row, column, score in _top_k_neighbours(similarity, top_k)
+    ]
+
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(recommendations, batch_size=5000)
+
+    # Switch readers over to the new neighbours
+    cache.set(RECOMMENDATIONS_VERSION_KEY, timezone.now().timestamp(), None)
+    return len(recommendations)
+
+
+def _load_neighbours(product_ids):
+    neighbours = defaultdict(list)
+    rows = ProductRecommendation.objects.filter(product_id__in=product_ids).values_list(
+        "product_id", "recommended_product_id", "score"
+    )
+    for product_id, recommended_product_id, score in rows:
+        neighbours[product_id].append((recommended_product_id, score))
+    return {product_id: neighbours[product_id] for product_id in product_ids}
+
+
+def get_product_neighbours(product_ids):
+    """
+    Return {product_id: [(recommended_product_id, score), ...]} from the cache,
+    loading and caching any missing products from ProductRecommendation.
+    """
+    if not cache_is_shared():
+        return _load_neighbours(product_ids)
+
+    version = cache.get_or_set(RECOMMENDATIONS_VERSION_KEY, 0, None)
+    keys = {
+        product_id: f"product_recommendations:{version}:{product_id}"
+        for product_id in product_ids
+    }
+    cached = cache.get_many(keys.values())
+    neighbours = {
+        product_id: cached[key] for product_id, key in keys.items() if key in cached
+    }
+
+    missing = [product_id for product_id in product_ids if product_id not in neighbours]
+    if missing:
+        loaded = _load_neighbours(missing)
+        cache.set_many(
+            {keys[product_id]: loaded[product_id] for product_id in missing},
+            settings.RECOMMENDATION_CACHE_TIMEOUT,
+        )
+        neighbours.update(loaded)
+
+    return neighbours
+
+
+def recommend_product_ids(user, limit):
+    """
+    Recommend product ids for a user from the neighbours of their recently
+    viewed products, weighting more recent views higher. Falls back to the
+    recently viewed products themselves when there are no neighbours yet.
+    """
+    cache_key = None
+    if cache_is_shared():
+        version = cache.get_or_set(RECOMMENDATIONS_VERSION_KEY, 0, None)
+        cache_key = f"user_recommendations:{version}:{user.id}:{limit}"
+        product_ids = cache.get(cache_key)
+        if product_ids is not None:
+            return product_ids
+
+    recent_views = UserEventTracking.objects.filter(
+        user=user, event_type="product_view"
+    ).order_by("-event_time").values_list("object_info", flat=True)[
+        : RECENT_VIEWS_LIMIT * 5
+    ]
+    viewed_ids = list(
+        dict.fromkeys(int(value) for value in recent_views if value and value.isdigit())
+    )[:RECENT_VIEWS_LIMIT]
+
+    # Rank by viewed_ids (most recent first), not by the order of the dict,
+    # which lists the cached products before the loaded ones
+    neighbours = get_product_neighbours(viewed_ids)
+    scores = defaultdict(float)
+    for rank, product_id in enumerate(viewed_ids):
+        for recommended_product_id, score in neighbours.get(product_id, ()):
+            scores[recommended_product_id] += score / (rank + 1)
+    for product_id in viewed_ids:
+        scores.pop(product_id, None)
+
+    product_ids = sorted(scores, key=scores.get, reverse=True)[:limit]
+    if not product_ids:
+        product_ids = viewed_ids[:limit]
+
+    if cache_key:
+        cache.set(cache_key, product_ids, USER_RECOMMENDATIONS_TIMEOUT)
+    return product_ids
+
+
+@read_from_replica()
+def get_recommended_products(user, limit):
+    """Return the recommended active products for a user, best first."""
+    product_ids = recommend_product_ids(user, limit)
+    products = Product.objects.filter(
+        id__in=product_ids, is_active=True
+    ).prefetch_related(
+        Prefetch(
+            "product_images",
+            queryset=ProductImage.objects.filter(is_active=True)[:1],
+            to_attr="first_image",
+        )
+    )
+    return sorted(products, key=lambda product: product_ids.index(product.id))
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from product_management.recommendations import build_product_recommendations
+
+
+@shared_task(name="product_management.tasks.build_product_recommendations")
+def build_product_recommendations_task(lookback_days=None, top_k=None):
+    """Rebuild the item-to-item recommendations from recent views and orders."""
+    return build_product_recommendations(lookback_days, top_k)
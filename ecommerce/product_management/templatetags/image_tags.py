@@ -0,0 +1,21 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def image_url(image, size):
+    """
+    URL of the named derivative (e.g. "thumb", "card") of a ProductImage or
+    Banner, falling back to the original until the derivatives of the
+    current image exist (those of a replaced image are stale).
+    """
+    if not image or not image.image:
+        return ""
+    derivatives = image.derivatives or {}
+    path = None
+    if derivatives.get("source") == image.image.name:
+        path = derivatives.get(size)
+    if path:
+        return image.image.storage.url(path)
+    return image.image.url
@@ -1,3 +1,364 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from admin_panel.models import UserEventTracking
+from product_management.bulk_io import export_products, import_products
+from product_management.models import (
+    Category,
+    Product,
+    ProductImage,
+    ProductRecommendation,
+)
+from product_management.recommendations import (
+    build_product_recommendations,
+    get_product_neighbours,
+    recommend_product_ids,
+)
+from product_management.templatetags.image_tags import image_url
+from user_management.models import User
+
+
+@override_settings(MEDIA_URL="/media/")
+class ImageUrlTests(SimpleTestCase):
+    def test_derivative_of_current_image(self):
+        image = ProductImage(
+            image="product_images/mug.jpg",
+            derivatives={
+                "source": "product_images/mug.jpg",
+                "thumb": "product_images/derivatives/mug_thumb.webp",
+            },
+        )
+        self.assertEqual(
+            image_url(image, "thumb"),
+            "/media/product_images/derivatives/mug_thumb.webp",
+        )
+        # Not generated yet
+        self.assertEqual(image_url(image, "card"), "/media/product_images/mug.jpg")
+
+    def test_replaced_image_falls_back_to_original(self):
+        image = ProductImage(
+            image="product_images/new.jpg",
+            derivatives={
+                "source": "product_images/old.jpg",
+                "thumb": "product_images/derivatives/old_thumb.webp",
+            },
+        )
+        self.assertEqual(image_url(image, "thumb"), "/media/product_images/new.jpg")
+
+    def test_no_image(self):
+        self.assertEqual(image_url(None, "thumb"), "")
+        self.assertEqual(image_url(ProductImage(), "thumb"), "")
+
+
+class BulkImportExportTests(TestCase):
+    """Import of product files, with the rejected rows, and export."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="importer", password="x")
+        cls.category = Category.objects.create(
+            name="Mugs", description="Mugs", created_by=cls.user, updated_by=cls.user
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        os.makedirs(os.path.join(media_root, "product_images"))
+        with open(os.path.join(media_root, "product_images", "mug.jpg"), "wb"):
+            pass
+        # A file that exists, but outside MEDIA_ROOT
+        outside = tempfile.NamedTemporaryFile(suffix=".jpg")
+        self.addCleanup(outside.close)
+        self.outside = outside.name
+
+    def import_rows(self, rows):
+        file = io.StringIO("".join(json.dumps(row) + "\n" for row in rows))
+        errors = {}
+
+        def report_error(line_number, name, row_errors):
+            errors[line_number] = row_errors
+
+        imported = import_products(
+            file, "jsonl", self.user, report_error, chunk_size=2, workers=0
+        )
+        return imported, errors
+
+    def row(self, **fields):
+        return {
+            "name": "Mug",
+            "short_description": "A mug",
+            "long_description": "A large mug",
+            "price": "9.50",
+            "quantity": "3",
+            "category": "mugs",
+            **fields,
+        }
+
+    def test_import(self):
+        imported, errors = self.import_rows(
+            [
+                self.row(
+                    attributes={"colour": ["red", "blue"]},
+                    images=["product_images/mug.jpg"],
+                ),
+                self.row(name="Cup", category=str(self.category.id), is_active="no"),
+            ]
+        )
+        self.assertEqual((imported, errors), (2, {}))
+
+        mug = Product.objects.get(name="Mug")
+        self.assertEqual((mug.price, mug.quantity), (9.5, 3))
+        self.assertEqual((mug.category, mug.created_by), (self.category, self.user))
+        self.assertEqual(
+            list(
+                ProductImage.objects.filter(product=mug).values_list("image", flat=True)
+            ),
+            ["product_images/mug.jpg"],
+        )
+        attribute = mug.product_attribute.get()
+        self.assertEqual(attribute.name, "colour")
+        self.assertEqual(
+            sorted(
+                attribute.product_attribute_key.values_list(
+                    "attribute_value", flat=True
+                )
+            ),
+            ["blue", "red"],
+        )
+        self.assertFalse(Product.objects.get(name="Cup").is_active)
+
+    def test_invalid_rows_are_reported(self):
+        imported, errors = self.import_rows(
+            [
+                self.row(),
+                self.row(),
+                self.row(name="", price="nan", quantity="-1"),
+                self.row(name="Bowl", category="bowls"),
+                self.row(name="Jug", images=["product_images/missing.jpg"]),
+            ]
+        )
+        self.assertEqual(imported, 1)
+        self.assertEqual(
+            errors,
+            {
+                2: ["a product with this name already exists"],
+                3: [
+                    "name is required",
+                    "price must be a finite number",
+                    "quantity cannot be negative",
+                ],
+                4: ["category 'bowls' does not exist"],
+                5: ["image 'product_images/missing.jpg' does not exist"],
+            },
+        )
+
+    def test_images_outside_media_root_are_rejected(self):
+        imported, errors = self.import_rows(
+            [
+                self.row(images=[self.outside]),
+                self.row(name="Jug", images=["product_images/../../secret.jpg"]),
+                self.row(name="Cup", images=[os.path.relpath(self.outside)]),
+            ]
+        )
+        self.assertEqual(imported, 0)
+        self.assertEqual(
+            [error for row_errors in errors.values() for error in row_errors],
+            [
+                f"image {self.outside!r} is not a path inside MEDIA_ROOT",
+                "image 'product_images/../../secret.jpg' is not a path inside "
+                "MEDIA_ROOT",
+                f"image {os.path.relpath(self.outside)!r} is not a path inside "
+                "MEDIA_ROOT",
+            ],
+        )
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_export(self):
+        self.import_rows(
+            [
+                self.row(
+                    attributes={"colour": ["red"]}, images=["product_images/mug.jpg"]
+                )
+            ]
+        )
+        file = io.StringIO()
+        self.assertEqual(export_products(file, "jsonl"), 1)
+        self.assertEqual(
+            json.loads(file.getvalue()),
+            {
+                "name": "Mug",
+                "short_description": "A mug",
+                "long_description": "A large mug",
+                "price": 9.5,
+                "quantity": 3,
+                "category": self.category.id,
+                "is_active": True,
+                "attributes": {"colour": ["red"]},
+                "images": ["product_images/mug.jpg"],
+            },
+        )
+
+        # The exported file imports again
+        Product.objects.all().delete()
+        file.seek(0)
+        self.assertEqual(
+            import_products(file, "jsonl", self.user, self.fail, workers=0), 1
+        )
+
+
+class RecommendationTests(TestCase):
+    """Recommendations built from product views, and how they are served."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="viewer", password="x")
+        cls.other_user = User.objects.create_user(username="other", password="x")
+        audit = {"created_by": cls.user, "updated_by": cls.user}
+        category = Category.objects.create(name="Mugs", description="Mugs", **audit)
+        cls.products = [
+            Product.objects.create(
+                name=f"Mug {index}",
+                short_description="Mug",
+                long_description="Mug",
+                price=10,
+                category=category,
+                quantity=100,
+                **audit,
+            ).id
+            for index in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def view(self, product_id, user=None, session_id=None):
+        UserEventTracking.objects.create(
+            user=user,
+            session_id=session_id,
+            event_type="product_view",
+            object_info=str(product_id),
+            requested_url=f"/product/{product_id}",
+            ip_address="127.0.0.1",
+            device_type="desktop",
+        )
+
+    def test_views_without_visitor_are_skipped(self):
+        first, second, third, _ = self.products
+        for visitor in ({"user": self.other_user}, {"session_id": "session-1"}):
+            self.view(first, **visitor)
+            self.view(second, **visitor)
+        # Unrelated visitors that were not tracked by user or session
+        self.view(first)
+        self.view(third)
+
+        build_product_recommendations()
+        self.assertEqual(
+            [
+                recommended_id
+                for recommended_id, _ in get_product_neighbours([first])[first]
+            ],
+            [second],
+        )
+        self.assertFalse(
+            ProductRecommendation.objects.filter(recommended_product=third).exists()
+        )
+
+        self.view(first, user=self.user)
+        self.assertEqual(recommend_product_ids(self.user, 5), [second])
+
+    def replace_recommendations(self, product_id, recommended_product_id):
+        # A rebuild by another process, which bumps the version in its own cache
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.create(
+            product_id=product_id,
+            recommended_product_id=recommended_product_id,
+            score=1,
+        )
+
+    def test_process_local_cache_reads_the_database(self):
+        first, second, _, fourth = self.products
+        self.view(first, user=self.user)
+        self.replace_recommendations(first, second)
+        self.assertEqual(recommend_product_ids(self.user, 5), [second])
+
+        self.replace_recommendations(first, fourth)
+        self.assertEqual(recommend_product_ids(self.user, 5), [fourth])
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": os.path.join(
+                    tempfile.gettempdir(), "recommendation-cache-tests"
+                ),
+            }
+        }
+    )
+    def test_shared_cache_serves_until_rebuild(self):
+        cache.clear()
+        first, second, _, fourth = self.products
+        self.view(first, user=self.user)
+        self.replace_recommendations(first, second)
+        self.assertEqual(recommend_product_ids(self.user, 5), [second])
+
+        self.replace_recommendations(first, fourth)
+        self.assertEqual(recommend_product_ids(self.user, 5), [second])
+
+        # The rebuild publishes a new version through the shared cache
+        self.view(first, user=self.other_user)
+        self.view(fourth, user=self.other_user)
+        build_product_recommendations()
+        self.assertEqual(recommend_product_ids(self.user, 5), [fourth])
+
+
+class ProductsByCategoryTests(TestCase):
+    """The async view filling the category tabs of the home page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="seller", password="x")
+        audit = {"created_by": user, "updated_by": user}
+        mugs, cups = (
+            Category.objects.create(name=name, description=name, **audit)
+            for name in ("Mugs", "Cups")
+        )
+        for name, category, is_active in (
+            ("Mug 1", mugs, True),
+            ("Mug 2", mugs, True),
+            ("Hidden mug", mugs, False),
+            ("Cup 1", cups, True),
+        ):
+            Product.objects.create(
+                name=name,
+                short_description=name,
+                long_description=name,
+                price=10,
+                category=category,
+                quantity=100,
+                is_active=is_active,
+                **audit,
+            )
+
+    async def test_active_products_of_the_category(self):
+        response = await self.async_client.get("/fetch-products/", {"category": "Mugs"})
+        html = response.json()["html"]
+        self.assertIn("Mug 1", html)
+        self.assertIn("Mug 2", html)
+        self.assertNotIn("Hidden mug", html)
+        self.assertNotIn("Cup 1", html)
+
+        response = await self.async_client.get(
+            "/fetch-products/", {"category": "Bowls"}
+        )
+        self.assertIn("No products available", response.json()["html"])
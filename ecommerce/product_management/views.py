@@ -1,6 +1,7 @@
 # Django imports
 import json
 from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.http import HttpResponse, JsonResponse
 from django.db.models import Prefetch, Count
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
@@ -9,6 +10,7 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 import random
 
 # Local app imports
+from admin_panel.counters import increment
 from admin_panel.views import fetch_sub_cat
 from user_management.models import User
 from product_management.models import (
@@ -18,8 +20,9 @@ from product_management.models import (
     ProductImage,
     Category,
 )
-from admin_panel.models import Banner, UserEventTracking
+from admin_panel.models import Banner
 from order_management.models import UserWishList
+from product_management.recommendations import get_recommended_products
 
 
 def home_page(request):
@@ -107,12 +110,14 @@ def home_page(request):
     return render(request, "customer_portal/index.html", context)
 
 
-def get_products_by_category(request):
+async def get_products_by_category(request):
     """
     Fetches products by category and returns them in a paginated HTML response.
 
     Filters products based on the category name and returns a snippet of HTML
-    for the product list within the category.
+    for the product list within the category. The snippet is rendered without
+    the request, so the context processors (cart and wishlist counts, footer
+    categories) are not run for it.
 
     Args:
         request (HttpRequest): The HTTP request object containing the 'category' parameter.
@@ -122,23 +127,24 @@ def get_products_by_category(request):
     """
     category = request.GET.get("category")
 
-    products = (
-        Product.objects.filter(category__name=category, is_active=True)
-        .select_related("category")
-        .prefetch_related(
-            Prefetch(
-                "product_images",
-                queryset=ProductImage.objects.filter(is_active=True)[:1],
-                to_attr="first_image",
+    products = [
+        product
+        async for product in (
+            Product.objects.filter(category__name=category, is_active=True)
+            .select_related("category")
+            .prefetch_related(
+                Prefetch(
+                    "product_images",
+                    queryset=ProductImage.objects.filter(is_active=True)[:1],
+                    to_attr="first_image",
+                )
             )
-        )
-    )[:4]
+        )[:4]
+    ]
 
-    html = render(
-        request,
-        "customer_portal/category_wise_products.html",
-        {"products": products},
-    ).content.decode("utf-8")
+    html = render_to_string(
+        "customer_portal/category_wise_products.html", {"products": products}
+    )
 
     return JsonResponse({"html": html})
 
@@ -153,7 +159,13 @@ def product_details(request, id):
     Returns:
         HttpResponse: Renders the 'product_detail.html' template with product details.
     """
-    product = get_object_or_404(Product, id=id)
+    product = get_object_or_404(
+        Product.objects.prefetch_related(
+            Prefetch("product_images", queryset=ProductImage.objects.visible())
+        ),
+        id=id,
+    )
+    increment(Product, "view_count", product.id)
     in_wishlist = (
         UserWishList.objects.filter(user=request.user, product=product).exists()
         if request.user.is_authenticated
@@ -273,33 +285,7 @@ def product_list(request):
 def recommended_products(request):
     """Product Recommendations"""
     if request.user.is_authenticated:
-        user = request.user
-        # Get the most recent events related to product views or other relevant events
-        recent_events = UserEventTracking.objects.filter(
-            user=user, event_type="product_view"
-        ).order_by("-event_time")[:50]
-
-        # Extract product_ids from the object_info
-        product_ids = [
-            event.object_info for event in recent_events if event.object_info
-        ]
-
-        # Fetch all products using a single query for the product_ids
-        recommended_products = (
-            Product.objects.filter(id__in=product_ids)
-            .prefetch_related(
-                Prefetch(
-                    "product_images",
-                    queryset=ProductImage.objects.filter(is_active=True)[:1],
-                    to_attr="first_image",
-                )
-            )
-            .distinct()
-        )
-
-        # Remove duplicates and limit the number of recommended products
-        recommended_products = list(set(recommended_products))[:8]
-
+        recommended_products = get_recommended_products(request.user, 8)
     else:
         recommended_products = []
 
@@ -0,0 +1,18 @@
+"""
+Google sign-in.
+
+The google-auth stack (JWT, RSA and the requests transport) is only needed
+by the Google login endpoint, so it is imported on the first login instead
+of with the views.
+"""
+
+
+def verify_google_id_token(token, client_id):
+    """
+    Verify a Google ID token and return its claims. Raises ValueError when
+    the token is invalid, expired or issued for another client.
+    """
+    from google.auth.transport import requests
+    from google.oauth2 import id_token
+
+    return id_token.verify_oauth2_token(token, requests.Request(), client_id)
@@ -12,8 +12,6 @@ from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django.db import IntegrityError
 from django.views.decorators.csrf import csrf_exempt
-from google.oauth2 import id_token
-from google.auth.transport import requests
 
 
 # Local app imports
@@ -25,6 +23,7 @@ from admin_panel.utils import (
 )
 from order_management.models import UserOrder
 from user_management.forms import AddressForm, UpdateUserForm
+from .google_auth import verify_google_id_token
 from .models import User
 from django.contrib.auth.forms import PasswordChangeForm
 from .forms import ContactUsForm, NewsLetterForm
@@ -196,10 +195,7 @@ def logout_page(request):
     Returns:
         HttpResponse: Redirects to the login page after logging out the user.
     """
-    cart = request.session.get("cart", {})
     logout(request)
-    # Restore cart data
-    request.session["cart"] = cart
     return redirect("login_page")
 
 
@@ -489,9 +485,7 @@ def google_login(request):
         token = data.get("token")
         try:
             # Verify the token with Google
-            idinfo = id_token.verify_oauth2_token(
-                token, requests.Request(), os.environ.get("CLIENT_ID")
-            )
+            idinfo = verify_google_id_token(token, os.environ.get("CLIENT_ID"))
             # Extract user information
             email = idinfo["email"]
             username = idinfo["email"].split("@")[0]